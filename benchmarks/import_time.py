@@ -0,0 +1,59 @@
+import os
+import sys
+# Adding project path into the sys paths for scanning all the modules
+script_dir = os.path.dirname(os.path.realpath(__file__))
+project_path = os.path.join(script_dir, "..")
+if project_path not in sys.path:
+    sys.path.append(project_path)
+
+import argparse
+import subprocess
+
+# Heavy dependencies which must only be imported by the code paths using them
+DEFERRED_MODULES = ["pandas", "paramiko", "couchbase", "requests"]
+
+# Budget in milliseconds of cumulative import time for the modules imported by main.py
+IMPORT_BUDGETS_MS = {
+    "tasks.task_builder" : 60,
+    "tasks.task_manager" : 60,
+    "tasks.result_sink" : 20,
+}
+
+def measure_import_times(main_args):
+    """
+        Runs main.py with -X importtime and returns {module: cumulative import time in ms}
+    """
+    command = [sys.executable, "-X", "importtime", os.path.join(project_path, "main.py")] + main_args
+    process = subprocess.run(command, cwd=project_path, capture_output=True, text=True)
+    import_times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        import_times[module.strip()] = int(cumulative) / 1000
+    return import_times
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the import time of main.py against a per module budget")
+    parser.add_argument("--task", default="disconnect_slaves_task", help="The task passed to main.py")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier applied to the budgets, for slower machines")
+    args = parser.parse_args()
+
+    import_times = measure_import_times([args.task, "--help"])
+    violations = []
+    for module in DEFERRED_MODULES:
+        if module in import_times:
+            violations.append(f"{module} is imported at startup ({import_times[module]:.1f}ms)")
+
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        import_time = import_times.get(module, 0)
+        print(f"{module} : {import_time:.1f}ms (budget {budget * args.scale:.0f}ms)")
+        if import_time > budget * args.scale:
+            violations.append(f"{module} took {import_time:.1f}ms, over its budget of {budget * args.scale:.0f}ms")
+
+    for violation in violations:
+        print(f"FAIL : {violation}")
+    sys.exit(1 if violations else 0)
+
+if __name__ == "__main__":
+    main()
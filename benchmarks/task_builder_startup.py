@@ -0,0 +1,52 @@
+import os
+import sys
+# Adding project path into the sys paths for scanning all the modules
+script_dir = os.path.dirname(os.path.realpath(__file__))
+project_path = os.path.join(script_dir, "..")
+if project_path not in sys.path:
+    sys.path.append(project_path)
+
+import argparse
+import importlib.util
+import time
+import yaml
+from tasks.task_registry import TaskRegistry
+
+def legacy_fetch_task_class(task_name):
+    """
+        Resolves the task class the way TaskBuilder.fetch_task did before the registry:
+        tasks.yml is parsed and the task module executed again on every call
+    """
+    tasks_file_path = os.path.join(project_path, "tasks", "tasks.yml")
+    with open(tasks_file_path, 'r') as file:
+        tasks_data = yaml.safe_load(file)
+    task = tasks_data[task_name]
+    path = os.path.join(project_path, task["path"])
+    spec = importlib.util.spec_from_file_location(task["class"], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, task["class"])
+
+def run(fetch_task_class, task_names):
+    start_time = time.perf_counter()
+    for task_name in task_names:
+        fetch_task_class(task_name)
+    return time.perf_counter() - start_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Time spent resolving task classes for one main.py run")
+    parser.add_argument("--task", default="remove_nodes_task", help="The main task of the run")
+    args = parser.parse_args()
+
+    # Task classes fetched by one main.py run : pre reports, the task, post reports
+    task_names = ["get_csv_task", "get_json_task", args.task, "get_csv_task", "get_json_task"]
+
+    # Shared third party imports are paid by both, load them once up front
+    legacy_fetch_task_class("get_csv_task")
+
+    legacy_time = run(legacy_fetch_task_class, task_names)
+    registry_time = run(TaskRegistry().get_task_class, task_names)
+    print(f"legacy={legacy_time * 1000:.1f}ms registry={registry_time * 1000:.1f}ms for {len(task_names)} fetches")
+
+if __name__ == "__main__":
+    main()
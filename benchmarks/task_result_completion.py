@@ -0,0 +1,59 @@
+import os
+import sys
+# Adding project path into the sys paths for scanning all the modules
+script_dir = os.path.dirname(os.path.realpath(__file__))
+project_path = os.path.join(script_dir, "..")
+if project_path not in sys.path:
+    sys.path.append(project_path)
+
+import argparse
+import concurrent.futures
+import random
+import time
+from tasks.task_result import TaskResult
+
+def run_sub_task(task_result, work_time):
+    time.sleep(work_time)
+    task_result.result_json = {"slept" : work_time}
+    task_result.complete_task(result=True)
+
+def run(num_subtasks, max_workers, max_work_time):
+    """
+        Runs num_subtasks fake subtasks on a thread pool and serializes each result
+        as soon as generate_json_result allows it. Returns the end to end wall time.
+    """
+    executor_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    parent_result = TaskResult()
+    parent_result.start_task()
+
+    start_time = time.perf_counter()
+    for count in range(num_subtasks):
+        task_result = TaskResult()
+        task_result.start_task()
+        executor_pool.submit(run_sub_task, task_result, random.uniform(0, max_work_time))
+        parent_result.subtasks[f"subtask_{count}"] = task_result
+
+    result_json = {}
+    for sub_task in parent_result.subtasks:
+        result_json[sub_task] = TaskResult.generate_json_result(parent_result.subtasks[sub_task])
+    parent_result.result_json = result_json
+    parent_result.complete_task(result=True)
+    TaskResult.generate_json_result(parent_result)
+    wall_time = time.perf_counter() - start_time
+
+    executor_pool.shutdown()
+    return wall_time
+
+def main():
+    parser = argparse.ArgumentParser(description="End to end wall time for generating results of a large fan-out")
+    parser.add_argument("--subtasks", type=int, default=1000)
+    parser.add_argument("--max_workers", type=int, default=100)
+    parser.add_argument("--max_work_time", type=float, default=0.05,
+                        help="Upper bound in seconds of the simulated work done by each subtask")
+    args = parser.parse_args()
+
+    wall_time = run(args.subtasks, args.max_workers, args.max_work_time)
+    print(f"subtasks={args.subtasks} max_workers={args.max_workers} wall_time={wall_time:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+# Adding project path into the sys paths for scanning all the modules
+script_dir = os.path.dirname(os.path.realpath(__file__))
+project_path = os.path.join(script_dir, "..")
+if project_path not in sys.path:
+    sys.path.append(project_path)
+
+import argparse
+import concurrent.futures
+import gc
+import itertools
+import threading
+import time
+import tracemalloc
+import uuid
+from tasks.task_result import TaskResult
+from constants.task_states import TaskStates
+
+class LegacyTaskResult:
+    """
+        The TaskResult representation before it was slotted, kept to compare against
+    """
+    def __init__(self) -> None:
+        self.exception = None
+        self.start_time = None
+        self.end_time = None
+        self.result = False
+        self.state = TaskStates.CREATED
+        self.subtasks = {}
+        self.result_json = None
+        self._completed = threading.Event()
+
+    def start_task(self):
+        self.start_time = time.time()
+        self.state = TaskStates.RUNNING
+
+    def complete_task(self, result):
+        self.state = TaskStates.COMPLETED
+        self.end_time = time.time()
+        self.result = result
+        self._completed.set()
+
+def legacy_subtask_ids(name):
+    while True:
+        yield f'{name}_{uuid.uuid4()}'
+
+def subtask_ids(name):
+    counter = itertools.count()
+    while True:
+        yield f'{name}_{next(counter)}'
+
+def measure(result_class, id_generator, num_subtasks):
+    """
+        Creates num_subtasks completed subtask entries, as Task.add_sub_task and get_sub_task_result do,
+        and returns the memory held by them in bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    subtasks = {}
+    ids = id_generator("check_vm_network")
+    for _ in range(num_subtasks):
+        task_result = result_class()
+        task_result.start_task()
+        task_result.result_json = {}
+        task_result.complete_task(result=True)
+        future_instance = concurrent.futures.Future()
+        subtasks[next(ids)] = (future_instance, task_result)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del subtasks
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory held per subtask by the current and the legacy TaskResult")
+    parser.add_argument("--subtasks", type=int, nargs="+", default=[10000, 100000], help="Number of subtasks")
+    args = parser.parse_args()
+
+    for num_subtasks in args.subtasks:
+        legacy = measure(LegacyTaskResult, legacy_subtask_ids, num_subtasks)
+        current = measure(TaskResult, subtask_ids, num_subtasks)
+        print(f"{num_subtasks} subtasks : legacy {legacy / 2**20:.1f} MiB ({legacy // num_subtasks} B/subtask), "
+              f"current {current / 2**20:.1f} MiB ({current // num_subtasks} B/subtask), "
+              f"saved {(1 - current / legacy) * 100:.0f}%")
+
+if __name__ == "__main__":
+    main()
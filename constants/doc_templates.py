@@ -81,9 +81,31 @@ TASK_TEMPLATE = {
     "end_time": "",
     "state": "",
     "result": False,
+    "task_key": "",
+    "params": {}
 }
 
 TASK_RESULT_TEMPLATE = {
     "task_id" : "",
     "result": {}
-}
\ No newline at end of file
+}
+
+TASK_RESULT_MANIFEST_TEMPLATE = {
+    "task_id" : "",
+    "format" : "",
+    "chunks" : 0,
+    "size" : 0,
+    "compressed_size" : 0
+}
+
+TASK_RESULT_CHUNK_TEMPLATE = {
+    "task_id" : "",
+    "chunk" : 0,
+    "data" : ""
+}
+
+TASK_CHECKPOINT_TEMPLATE = {
+    "task_id" : "",
+    "seq" : 0,
+    "completed" : {}
+}
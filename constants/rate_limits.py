@@ -0,0 +1,9 @@
+# Token bucket rate limits per endpoint : rate is the sustained number of requests per second and burst the number
+# of requests which can be made at once after an idle period.
+# A limit on an endpoint class applies separately to each of its endpoints, e.g. jenkins applies to every
+# jenkins:<url>, unless jenkins:<url> has a limit of its own. Endpoints without a limit are not rate limited.
+RATE_LIMITS = {
+    "jenkins" : {"rate" : 5, "burst" : 10},
+    "xo" : {"rate" : 2, "burst" : 4},
+    "sdk_query" : {"rate" : 50, "burst" : 50}
+}
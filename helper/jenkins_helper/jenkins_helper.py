@@ -15,7 +15,8 @@ class JenkinsHelper:
         self.username = username
         self.rest_client = RestClient(base_url=url,
                                       username=username,
-                                      password=password)
+                                      password=password,
+                                      rate_limit_key=f"jenkins:{url}")
 
     def get_all_slaves_info(self):
         endpoint = "/computer/api/json"
@@ -199,11 +200,15 @@ class JenkinsHelper:
 
 class SingeltonMetaClass(type):
     _instances = {}
+    _instance_locks = {}
     _cls_lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
+            # One lock per class, so that singletons of different classes are created concurrently
             with cls._cls_lock:
+                instance_lock = cls._instance_locks.setdefault(cls, threading.Lock())
+            with instance_lock:
                 if cls not in cls._instances:
                     cls._instances[cls] = super(SingeltonMetaClass, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+
+class AsyncSDKHelper:
+    """
+        asyncio counterpart of SDKHelper, for helpers built on AsyncSDKClient
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("helper")
+
+    async def fetch_all_docs(self, client, bucket_name, scope, collection):
+        query = f"SELECT META().id,* FROM `{bucket_name}`.`{scope}`.`{collection}`"
+        self.logger.info(f"Running query {query}")
+        return await client.query(query, retries=5)
+
+    async def upsert_doc(self, client, key, doc, bucket_name, scope, collection):
+        res = await client.upsert(key, doc, retries=5)
+        if res:
+            self.logger.info(f"Document with key {key} successfully upserted into {bucket_name}.{scope}.{collection}")
+        else:
+            self.logger.error(f"Upsert into {bucket_name}.{scope}.{collection} failed for document with key {key}")
+        return res
+
+    async def get_doc(self, client, key):
+        self.logger.info(f"Fetching doc with key {key}")
+        return await client.get(key, retries=5)
+
+    async def delete_doc(self, client, key, bucket_name, scope, collection):
+        self.logger.info(f"Deleting doc with key {key}")
+        res = await client.delete_doc(key, retries=5)
+        if res:
+            self.logger.info(f"Document with key {key} successfully deleted from {bucket_name}.{scope}.{collection}")
+        else:
+            self.logger.error(f"Delete from {bucket_name}.{scope}.{collection} failed for document with key {key}")
+        return res
+
+    async def _gather_by_key(self, keys, operation, max_in_flight):
+        """
+            Awaits operation(key) for all the keys, at most max_in_flight at a time, and returns
+            ({key: result}, {key: exception})
+        """
+        semaphore = asyncio.Semaphore(max_in_flight)
+        async def _run(key):
+            async with semaphore:
+                return await operation(key)
+        outcomes = await asyncio.gather(*[_run(key) for key in keys], return_exceptions=True)
+        results = {}
+        errors = {}
+        for key, outcome in zip(keys, outcomes):
+            if isinstance(outcome, Exception):
+                errors[key] = outcome
+            else:
+                results[key] = outcome
+        return results, errors
+
+    async def upsert_docs(self, client, docs, bucket_name, scope, collection, max_in_flight=500):
+        """
+            Upserts the documents, given by key, concurrently and returns ({key: True}, {key: exception})
+        """
+        results, errors = await self._gather_by_key(list(docs), lambda key: client.upsert(key, docs[key], retries=5),
+                                                    max_in_flight)
+        self.logger.info(f"{len(results)} documents successfully upserted into {bucket_name}.{scope}.{collection}")
+        for key in errors:
+            self.logger.error(f"Upsert into {bucket_name}.{scope}.{collection} failed for document with key {key} : {errors[key]}")
+        return results, errors
+
+    async def get_docs(self, client, keys, max_in_flight=500):
+        """
+            Fetches the documents with the given keys concurrently and returns ({key: doc as str}, {key: exception})
+        """
+        self.logger.info(f"Fetching {len(keys)} docs")
+        return await self._gather_by_key(list(keys), lambda key: client.get(key, retries=5), max_in_flight)
+
+    async def delete_docs(self, client, keys, bucket_name, scope, collection, max_in_flight=500):
+        """
+            Deletes the documents with the given keys concurrently and returns ({key: True}, {key: exception})
+        """
+        async def _delete_doc(key):
+            # delete_doc returns the error of the last attempt instead of raising it
+            res = await client.delete_doc(key, retries=5)
+            if isinstance(res, Exception):
+                raise res
+            return res
+        results, errors = await self._gather_by_key(list(keys), _delete_doc, max_in_flight)
+        self.logger.info(f"{len(results)} documents successfully deleted from {bucket_name}.{scope}.{collection}")
+        for key in errors:
+            self.logger.error(f"Delete from {bucket_name}.{scope}.{collection} failed for document with key {key} : {errors[key]}")
+        return results, errors
@@ -1,5 +1,9 @@
+import ast
+import copy
 import logging
 import threading
+import contextvars
+from util.sdk_util.sdk_client import CAS_RETRY_POLICY
 
 class SDKHelper:
 
@@ -32,13 +36,128 @@ class SDKHelper:
             self.logger.error(f"Delete from {bucket_name}.{scope}.{collection} failed for document with key {key}")
         return res
 
+    def update_doc(self, client, key, update, bucket_name, scope, collection):
+        """
+            Reads the document, applies update to it and replaces it if it is unchanged since it was read.
+            When another writer got in between, the update is applied again to the new document.
+            Returns the updated document
+            Args:
+            update (callable, required) : Called with the document, as a dict, which it changes in place
+        """
+        def _update_doc():
+            doc, cas = client.get_with_cas(key, retries=5)
+            doc = ast.literal_eval(doc)
+            update(doc)
+            client.replace(key, doc, cas, retries=5)
+            return doc
+
+        doc = CAS_RETRY_POLICY.run(_update_doc)
+        self.logger.info(f"Document with key {key} successfully updated in {bucket_name}.{scope}.{collection}")
+        return doc
+
+    def _merge_tags(self, tags, details, tags_added, tags_removed):
+        tags = copy.deepcopy(tags) if tags else {}
+        tags.setdefault("details", {}).update(details)
+        tags_list = [tag for tag in tags.get("list", []) if tag not in tags_removed]
+        tags_list.extend(tag for tag in tags_added if tag not in tags_list)
+        tags["list"] = tags_list
+        return tags
+
+    def _update_doc_tags(self, client, key, details, tags_added, tags_removed):
+        """
+            Reads the tags of the document with its CAS and writes the merged tags.details and tags.list with
+            mutate_in if the document is unchanged since, reading and merging again otherwise.
+            Returns False, without writing, when the merge leaves the tags unchanged
+        """
+        def _update_tags():
+            values, cas = client.lookup_in(key, ["tags"], retries=5)
+            tags = self._merge_tags(values["tags"], details, tags_added, tags_removed)
+            if tags == values["tags"]:
+                return False
+            mutations = [("upsert", f"tags.details.{name}", value) for name, value in details.items()]
+            mutations.append(("upsert", "tags.list", tags["list"]))
+            return client.mutate_in(key, mutations, retries=5, cas=cas)
+
+        return CAS_RETRY_POLICY.run(_update_tags)
+
+    def update_tags_multi(self, client, updates, bucket_name, scope, collection):
+        """
+            Sets tags.details.<name> for every name in details, adds tags_added to and removes tags_removed from
+            tags.list of every document, without rewriting the rest of the document.
+            One read and one write per document, both sub-document : the tags of each document are read with
+            lookup_in and its CAS, the tag updates merged in, and only the changed tags.details and tags.list written
+            with mutate_in if the document is unchanged since. A document changed by another writer in between is
+            read and merged again, without affecting the other documents.
+            The documents are updated in parallel on the TaskScheduler, and documents whose tags are unchanged by the
+            merge are not written.
+            Returns ({key: True if written, False if unchanged}, {key: exception})
+            Args:
+            updates (dict, required) : (details, tags_added, tags_removed) of the documents, by key
+        """
+        # The scheduler is only needed by the tasks buffering their tag updates
+        from tasks.task_scheduler import TaskScheduler
+
+        results = {}
+        errors = {}
+        if len(updates) == 0:
+            return results, errors
+        # The SDK has no bulk sub-document operations, the per document lookup_in and mutate_in are pipelined on the
+        # shared scheduler instead, each one in the context, and so under the deadline, of the caller. Waiting from a
+        # scheduler worker runs the queued updates on the waiting thread
+        scheduler = TaskScheduler()
+        futures = {key: scheduler.submit(contextvars.copy_context().run, self._update_doc_tags, client, key, *updates[key])
+                   for key in updates}
+        for key, future in futures.items():
+            scheduler.wait(future)
+            if future.exception() is not None:
+                errors[key] = future.exception()
+            else:
+                results[key] = future.result()
+        unchanged = len([key for key in results if not results[key]])
+        self.logger.info(f"Tags of {len(results) - unchanged} documents successfully updated in {bucket_name}.{scope}.{collection}, "
+                         f"{unchanged} documents unchanged")
+        for key in errors:
+            self.logger.error(f"Tags update in {bucket_name}.{scope}.{collection} failed for document with key {key} : {errors[key]}")
+        return results, errors
+
+    def upsert_docs(self, client, docs, bucket_name, scope, collection):
+        """
+            Upserts the documents, given by key, in bulk and returns ({key: True}, {key: exception})
+        """
+        results, errors = client.upsert_multi(docs, retries=5)
+        self.logger.info(f"{len(results)} documents successfully upserted into {bucket_name}.{scope}.{collection}")
+        for key in errors:
+            self.logger.error(f"Upsert into {bucket_name}.{scope}.{collection} failed for document with key {key} : {errors[key]}")
+        return results, errors
+
+    def get_docs(self, client, keys):
+        """
+            Fetches the documents with the given keys in bulk and returns ({key: doc as str}, {key: exception})
+        """
+        self.logger.info(f"Fetching {len(keys)} docs")
+        return client.get_multi(keys, retries=5)
+
+    def delete_docs(self, client, keys, bucket_name, scope, collection):
+        """
+            Deletes the documents with the given keys in bulk and returns ({key: True}, {key: exception})
+        """
+        results, errors = client.remove_multi(keys, retries=5)
+        self.logger.info(f"{len(results)} documents successfully deleted from {bucket_name}.{scope}.{collection}")
+        for key in errors:
+            self.logger.error(f"Delete from {bucket_name}.{scope}.{collection} failed for document with key {key} : {errors[key]}")
+        return results, errors
+
 class SingeltonMetaClass(type):
     _instances = {}
+    _instance_locks = {}
     _cls_lock = threading.Lock()
 
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
+            # One lock per class, so that singletons of different classes are created concurrently
             with cls._cls_lock:
+                instance_lock = cls._instance_locks.setdefault(cls, threading.Lock())
+            with instance_lock:
                 if cls not in cls._instances:
                     cls._instances[cls] = super(SingeltonMetaClass, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
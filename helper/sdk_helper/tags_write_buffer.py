@@ -0,0 +1,112 @@
+import logging
+import threading
+
+class TagsWriteBuffer:
+    """
+        Write-behind buffer for the tag updates of the checks of a task run. The checks of a document add their
+        outcome to the buffer instead of writing it, the outcomes of a document are merged, and the document is
+        written once its checks are done, in one write batched with the other documents done at the same time.
+        flush writes every buffered document, done or not, and is called when the task completes.
+        Args:
+        write_multi (callable, required) : Called with {key: (details, tags_added, tags_removed)}, writes the
+            documents and returns ({key: True if written, False if unchanged}, {key: exception}),
+            e.g. ServerPoolSDKHelper.update_nodes_tags
+        batch_size (int, optional) : Number of done documents written together
+    """
+
+    def __init__(self, write_multi, batch_size=50):
+        self.logger = logging.getLogger("helper")
+        self.write_multi = write_multi
+        self.batch_size = batch_size
+        self._pending = {}
+        self._done = {}
+        self._lock = threading.Lock()
+        self._updates = 0
+        self._documents = 0
+        self._writes = 0
+        self._skipped = 0
+        self._batches = 0
+        self._errors = {}
+
+    def add(self, key, details, tags_added, tags_removed):
+        """
+            Merges the outcome of a check into the buffered update of the document.
+            Tags added or removed by a later check of the document win over earlier ones
+        """
+        with self._lock:
+            pending = self._done.get(key) or self._pending.setdefault(key, ({}, [], []))
+            pending_details, pending_tags_added, pending_tags_removed = pending
+            pending_details.update(details)
+            for tag in tags_added:
+                while tag in pending_tags_removed:
+                    pending_tags_removed.remove(tag)
+                if tag not in pending_tags_added:
+                    pending_tags_added.append(tag)
+            for tag in tags_removed:
+                while tag in pending_tags_added:
+                    pending_tags_added.remove(tag)
+                if tag not in pending_tags_removed:
+                    pending_tags_removed.append(tag)
+            self._updates += 1
+        return True
+
+    def done(self, key):
+        """
+            Marks the checks of the document as done. The document is written with the next batch
+        """
+        batch = None
+        with self._lock:
+            if key in self._pending:
+                self._done[key] = self._pending.pop(key)
+            if len(self._done) >= self.batch_size:
+                batch = self._done
+                self._done = {}
+        if batch:
+            self._write(batch)
+
+    def flush(self):
+        """
+            Writes every buffered document and returns the errors of the writes of the run, by key
+        """
+        with self._lock:
+            batch = {**self._pending, **self._done}
+            self._pending = {}
+            self._done = {}
+        if batch:
+            self._write(batch)
+        with self._lock:
+            return dict(self._errors)
+
+    def _write(self, batch):
+        try:
+            results, errors = self.write_multi(batch)
+        except Exception as e:
+            self.logger.error(f"Buffered write of {len(batch)} documents failed : {e}")
+            results, errors = {}, {key: e for key in batch}
+        with self._lock:
+            self._documents += len(batch)
+            self._writes += len([key for key in results if results[key]])
+            self._skipped += len([key for key in results if not results[key]])
+            self._batches += 1
+            self._errors.update(errors)
+            for key in results:
+                self._errors.pop(key, None)
+
+    def errors(self):
+        """
+            Returns the errors of the documents whose write failed and was not retried successfully since, by key
+        """
+        with self._lock:
+            return {key: str(error) for key, error in self._errors.items()}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "updates" : self._updates,
+                "documents" : self._documents,
+                "writes" : self._writes,
+                "skipped" : self._skipped,
+                "batches" : self._batches,
+                "pending" : len(self._pending) + len(self._done),
+                "errors" : len(self._errors)
+            }
@@ -0,0 +1,113 @@
+import os
+import asyncio
+from util.sdk_util.async_sdk_client import AsyncSDKClient
+from helper.sdk_helper.testdb_helper.async_test_db_helper import AsyncTestDBSDKHelper
+
+class AsyncHostSDKHelper(AsyncTestDBSDKHelper):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.host_pool_bucket_name =  os.environ.get("TESTDB_HOST_POOL_BUCKET")
+        self.host_scope_name = os.environ.get("TESTDB_HOST_POOL_HOST_SCOPE")
+        self.host_collection_name = os.environ.get("TESTDB_HOST_POOL_HOST_COLLECTION")
+        self.vm_scope_name = os.environ.get("TESTDB_HOST_POOL_VM_SCOPE")
+        self.vm_collection_name = os.environ.get("TESTDB_HOST_POOL_VM_COLLECTION")
+
+    async def _connect(self):
+        self.host_connection, self.vm_connection = await asyncio.gather(
+            AsyncSDKClient.connect(ip_addr=self.cluster_ipaddr,
+                                   username=self.cluster_username,
+                                   password=self.cluster_password,
+                                   bucket=self.host_pool_bucket_name,
+                                   scope=self.host_scope_name,
+                                   collection=self.host_collection_name),
+            AsyncSDKClient.connect(ip_addr=self.cluster_ipaddr,
+                                   username=self.cluster_username,
+                                   password=self.cluster_password,
+                                   bucket=self.host_pool_bucket_name,
+                                   scope=self.vm_scope_name,
+                                   collection=self.vm_collection_name))
+        self.logger.info(f"Async SDK Client created for {self.host_pool_bucket_name}.{self.host_scope_name}.{self.host_collection_name}")
+        self.logger.info(f"Async SDK Client created for {self.host_pool_bucket_name}.{self.vm_scope_name}.{self.vm_collection_name}")
+        return self
+
+    async def update_host(self, doc):
+        key = doc["name"]
+        return await self.upsert_doc(client=self.host_connection,
+                                     key=key,
+                                     doc=doc,
+                                     bucket_name=self.host_pool_bucket_name,
+                                     scope=self.host_scope_name,
+                                     collection=self.host_collection_name)
+
+    async def update_vm(self, doc):
+        key = doc["name_label"]
+        return await self.upsert_doc(client=self.vm_connection,
+                                     key=key,
+                                     doc=doc,
+                                     bucket_name=self.host_pool_bucket_name,
+                                     scope=self.vm_scope_name,
+                                     collection=self.vm_collection_name)
+
+    async def update_vms(self, docs):
+        return await self.upsert_docs(client=self.vm_connection,
+                                      docs={doc["name_label"]: doc for doc in docs},
+                                      bucket_name=self.host_pool_bucket_name,
+                                      scope=self.vm_scope_name,
+                                      collection=self.vm_collection_name)
+
+    async def fetch_all_vms(self):
+        return await self.fetch_all_docs(client=self.vm_connection,
+                                         bucket_name=self.host_pool_bucket_name,
+                                         scope=self.vm_scope_name,
+                                         collection=self.vm_collection_name)
+
+    async def fetch_host(self, host):
+        return await self.get_doc(client=self.host_connection,
+                                  key=host)
+
+    async def fetch_hosts(self, hosts):
+        return await self.get_docs(client=self.host_connection,
+                                   keys=hosts)
+
+    async def fetch_all_host(self):
+        return await self.fetch_all_docs(client=self.host_connection,
+                                         bucket_name=self.host_pool_bucket_name,
+                                         scope=self.host_scope_name,
+                                         collection=self.host_collection_name)
+
+    async def fetch_vms_by_host(self, host):
+        query = f"SELECT META().id, * FROM `{self.host_pool_bucket_name}`.`{self.vm_scope_name}`.`{self.vm_collection_name}` WHERE host='{host}'"
+        self.logger.info(f"Running query {query}")
+        return await self.vm_connection.query(query, retries=5)
+
+    async def fetch_hosts_by_group(self, group):
+        query = f"SELECT META().id,*  FROM `{self.host_pool_bucket_name}`.`{self.host_scope_name}`.`{self.host_collection_name}` WHERE `group` IN {group}"
+        self.logger.info(f"Running query {query}")
+        return await self.host_connection.query(query, retries=5)
+
+    async def fetch_vms_by_group(self, group):
+        query = f"SELECT META().id,* FROM `{self.host_pool_bucket_name}`.`{self.vm_scope_name}`.`{self.vm_collection_name}` WHERE `group` IN {group}"
+        self.logger.info(f"Running query {query}")
+        return await self.vm_connection.query(query, retries=5)
+
+    async def remove_vm(self, key):
+        return await self.delete_doc(client=self.vm_connection,
+                                     key=key,
+                                     bucket_name=self.host_pool_bucket_name,
+                                     scope=self.vm_scope_name,
+                                     collection=self.vm_collection_name)
+
+    async def remove_vms(self, keys):
+        return await self.delete_docs(client=self.vm_connection,
+                                      keys=keys,
+                                      bucket_name=self.host_pool_bucket_name,
+                                      scope=self.vm_scope_name,
+                                      collection=self.vm_collection_name)
+
+    async def remove_host(self, key):
+        return await self.delete_doc(client=self.host_connection,
+                                     key=key,
+                                     bucket_name=self.host_pool_bucket_name,
+                                     scope=self.host_scope_name,
+                                     collection=self.host_collection_name)
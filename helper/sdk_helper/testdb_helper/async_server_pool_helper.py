@@ -0,0 +1,74 @@
+import os
+from util.sdk_util.async_sdk_client import AsyncSDKClient
+from helper.sdk_helper.testdb_helper.async_test_db_helper import AsyncTestDBSDKHelper
+
+class AsyncServerPoolSDKHelper(AsyncTestDBSDKHelper):
+
+    def __init__(self):
+        super().__init__()
+        self.server_pool_bucket_name =  os.environ.get("TESTDB_SERVER_POOL_BUCKET")
+        self.server_pool_scope = os.environ.get("TESTDB_SERVER_POOL_SCOPE")
+        self.server_pool_collection = os.environ.get("TESTDB_SERVER_POOL_COLLECTION")
+
+    async def _connect(self):
+        self.server_pool_client = await AsyncSDKClient.connect(ip_addr=self.cluster_ipaddr,
+                                                               username=self.cluster_username,
+                                                               password=self.cluster_password,
+                                                               bucket=self.server_pool_bucket_name)
+        self.logger.info(f"Async SDK Client created for {self.server_pool_bucket_name}.{self.server_pool_scope}.{self.server_pool_collection}")
+        return self
+
+    async def upsert_node_to_server_pool(self, doc):
+        key = doc["doc_key"]
+        return await self.upsert_doc(client=self.server_pool_client,
+                                     key=key,
+                                     doc=doc,
+                                     bucket_name=self.server_pool_bucket_name,
+                                     scope=self.server_pool_scope,
+                                     collection=self.server_pool_collection)
+
+    async def upsert_nodes_to_server_pool(self, docs):
+        return await self.upsert_docs(client=self.server_pool_client,
+                                      docs={doc["doc_key"]: doc for doc in docs},
+                                      bucket_name=self.server_pool_bucket_name,
+                                      scope=self.server_pool_scope,
+                                      collection=self.server_pool_collection)
+
+    async def fetch_all_nodes(self):
+        return await self.fetch_all_docs(client=self.server_pool_client,
+                                         bucket_name=self.server_pool_bucket_name,
+                                         scope=self.server_pool_scope,
+                                         collection=self.server_pool_collection)
+
+    async def get_node(self, ipaddr):
+        return await self.get_doc(client=self.server_pool_client,
+                                  key=ipaddr)
+
+    async def get_nodes(self, ipaddrs):
+        return await self.get_docs(client=self.server_pool_client,
+                                   keys=ipaddrs)
+
+    async def delete_node(self, ipaddr):
+        key = ipaddr
+        return await self.delete_doc(client=self.server_pool_client,
+                                     key=key,
+                                     bucket_name=self.server_pool_bucket_name,
+                                     scope=self.server_pool_scope,
+                                     collection=self.server_pool_collection)
+
+    async def delete_nodes(self, ipaddrs):
+        return await self.delete_docs(client=self.server_pool_client,
+                                      keys=ipaddrs,
+                                      bucket_name=self.server_pool_bucket_name,
+                                      scope=self.server_pool_scope,
+                                      collection=self.server_pool_collection)
+
+    async def fetch_nodes_by_poolId(self, poolId : list):
+        query = f"SELECT META().id,* FROM `{self.server_pool_bucket_name}`.`{self.server_pool_scope}`.`{self.server_pool_collection}` WHERE ANY v IN poolId SATISFIES v IN {poolId} END;"
+        self.logger.info(f"Running query {query}")
+        return await self.server_pool_client.query(query, retries=5)
+
+    async def fetch_node_by_ipaddr(self, ipaddr : list):
+        query = f"SELECT META().id,* FROM `{self.server_pool_bucket_name}`.`{self.server_pool_scope}`.`{self.server_pool_collection}` WHERE ipaddr in {ipaddr}"
+        self.logger.info(f"Running query {query}")
+        return await self.server_pool_client.query(query, retries=5)
@@ -0,0 +1,83 @@
+import os
+import asyncio
+from util.sdk_util.async_sdk_client import AsyncSDKClient
+from helper.sdk_helper.testdb_helper.async_test_db_helper import AsyncTestDBSDKHelper
+
+class AsyncSlavePoolSDKHelper(AsyncTestDBSDKHelper):
+
+    def __init__(self):
+        super().__init__()
+        self.slave_pool_bucket_name =  os.environ.get("TESTDB_SLAVE_POOL_BUCKET")
+        self.slave_doc_scope_name = os.environ.get("TESTDB_SLAVE_POOL_SLAVE_DOC_SCOPE")
+        self.slave_doc_collection_name = os.environ.get("TESTDB_SLAVE_POOL_SLAVE_DOC_COLLECTION")
+        self.jenkins_doc_scope_name = os.environ.get("TESTDB_SLAVE_POOL_JENKINS_DOC_SCOPE")
+        self.jenkins_doc_collection_name = os.environ.get("TESTDB_SLAVE_POOL_JENKINS_DOC_COLLECTION")
+
+    async def _connect(self):
+        self.slave_doc_connection, self.jenkins_doc_connection = await asyncio.gather(
+            AsyncSDKClient.connect(ip_addr=self.cluster_ipaddr,
+                                   username=self.cluster_username,
+                                   password=self.cluster_password,
+                                   bucket=self.slave_pool_bucket_name,
+                                   scope=self.slave_doc_scope_name,
+                                   collection=self.slave_doc_collection_name),
+            AsyncSDKClient.connect(ip_addr=self.cluster_ipaddr,
+                                   username=self.cluster_username,
+                                   password=self.cluster_password,
+                                   bucket=self.slave_pool_bucket_name,
+                                   scope=self.jenkins_doc_scope_name,
+                                   collection=self.jenkins_doc_collection_name))
+        self.logger.info(f"Async SDK Client created for {self.slave_pool_bucket_name}.{self.slave_doc_scope_name}.{self.slave_doc_collection_name}")
+        self.logger.info(f"Async SDK Client created for {self.slave_pool_bucket_name}.{self.jenkins_doc_scope_name}.{self.jenkins_doc_collection_name}")
+        return self
+
+    async def upsert_slave_to_slave_pool(self, doc):
+        key = doc["doc_key"]
+        return await self.upsert_doc(client=self.slave_doc_connection,
+                                     key=key,
+                                     doc=doc,
+                                     bucket_name=self.slave_pool_bucket_name,
+                                     scope=self.slave_doc_scope_name,
+                                     collection=self.slave_doc_collection_name)
+
+    async def upsert_slaves_to_slave_pool(self, docs):
+        return await self.upsert_docs(client=self.slave_doc_connection,
+                                      docs={doc["doc_key"]: doc for doc in docs},
+                                      bucket_name=self.slave_pool_bucket_name,
+                                      scope=self.slave_doc_scope_name,
+                                      collection=self.slave_doc_collection_name)
+
+    async def get_slave_pool_doc(self, name):
+        return await self.get_doc(client=self.slave_doc_connection,
+                                  key=name)
+
+    async def get_slave_pool_docs(self, names):
+        return await self.get_docs(client=self.slave_doc_connection,
+                                   keys=names)
+
+    async def delete_slave_pool_doc(self, name):
+        key = name
+        return await self.delete_doc(client=self.slave_doc_connection,
+                                     key=key,
+                                     bucket_name=self.slave_pool_bucket_name,
+                                     scope=self.slave_doc_scope_name,
+                                     collection=self.slave_doc_collection_name)
+
+    async def delete_slave_pool_docs(self, names):
+        return await self.delete_docs(client=self.slave_doc_connection,
+                                      keys=names,
+                                      bucket_name=self.slave_pool_bucket_name,
+                                      scope=self.slave_doc_scope_name,
+                                      collection=self.slave_doc_collection_name)
+
+    async def fetch_all_slaves(self):
+        return await self.fetch_all_docs(client=self.slave_doc_connection,
+                                         bucket_name=self.slave_pool_bucket_name,
+                                         scope=self.slave_doc_scope_name,
+                                         collection=self.slave_doc_collection_name)
+
+    async def fetch_all_jenkins_slaves(self):
+        return await self.fetch_all_docs(client=self.jenkins_doc_connection,
+                                         bucket_name=self.slave_pool_bucket_name,
+                                         scope=self.jenkins_doc_scope_name,
+                                         collection=self.jenkins_doc_collection_name)
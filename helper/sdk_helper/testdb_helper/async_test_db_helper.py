@@ -0,0 +1,36 @@
+import os
+import asyncio
+import weakref
+from helper.sdk_helper.async_sdk_helper import AsyncSDKHelper
+
+class AsyncTestDBSDKHelper(AsyncSDKHelper):
+    """
+        Base of the asyncio testdb helpers. SDK connections are bound to an event loop, so there is one helper
+        per pool and per event loop instead of one per process : get it with await <Helper>.connect(), which
+        connects the helper on the first call on a loop and returns the same helper afterwards.
+        Subclasses create their AsyncSDKClients in _connect.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cluster_ipaddr = os.environ.get("TESTDB_CLUSTER_IPADDR")
+        self.cluster_username = os.environ.get("TESTDB_CLUSTER_USERNAME")
+        self.cluster_password = os.environ.get("TESTDB_CLUSTER_PASSWORD")
+
+    @classmethod
+    async def connect(cls):
+        loop = asyncio.get_running_loop()
+        if "_connections" not in cls.__dict__:
+            cls._connections = weakref.WeakKeyDictionary()
+        if loop not in cls._connections:
+            cls._connections[loop] = asyncio.ensure_future(cls()._connect())
+        try:
+            return await asyncio.shield(cls._connections[loop])
+        except Exception:
+            # A failed connection is not cached, the next call connects again
+            if cls._connections.get(loop) is not None and cls._connections[loop].done():
+                cls._connections.pop(loop, None)
+            raise
+
+    async def _connect(self):
+        raise NotImplementedError("The _connect for the helper is not implemented")
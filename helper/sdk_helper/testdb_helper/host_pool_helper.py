@@ -58,6 +58,34 @@ class HostSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                scope=self.vm_scope_name,
                                collection=self.vm_collection_name)
 
+    def update_hosts_tags(self, updates):
+        return self.update_tags_multi(client=self.host_connection,
+                                      updates=updates,
+                                      bucket_name=self.host_pool_bucket_name,
+                                      scope=self.host_scope_name,
+                                      collection=self.host_collection_name)
+
+    def update_vms_tags(self, updates):
+        return self.update_tags_multi(client=self.vm_connection,
+                                      updates=updates,
+                                      bucket_name=self.host_pool_bucket_name,
+                                      scope=self.vm_scope_name,
+                                      collection=self.vm_collection_name)
+
+    def update_hosts(self, docs):
+        return self.upsert_docs(client=self.host_connection,
+                                docs={doc["name"]: doc for doc in docs},
+                                bucket_name=self.host_pool_bucket_name,
+                                scope=self.host_scope_name,
+                                collection=self.host_collection_name)
+
+    def update_vms(self, docs):
+        return self.upsert_docs(client=self.vm_connection,
+                                docs={doc["name_label"]: doc for doc in docs},
+                                bucket_name=self.host_pool_bucket_name,
+                                scope=self.vm_scope_name,
+                                collection=self.vm_collection_name)
+
     def fetch_all_vms(self):
         return self.fetch_all_docs(client=self.vm_connection,
                                    bucket_name=self.host_pool_bucket_name,
@@ -68,6 +96,10 @@ class HostSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
         return self.get_doc(client=self.host_connection,
                             key=host)
     
+    def fetch_hosts(self, hosts):
+        return self.get_docs(client=self.host_connection,
+                             keys=hosts)
+
     def fetch_vm(self, ipaddr):
         query = f"SELECT * FROM `QE-host-pool`.`_default`.`vms` WHERE ANY v IN OBJECT_VALUES(addresses) SATISFIES v = '{ipaddr}' END OR mainIpAddress = '{ipaddr}';"
         self.logger.info(f"Running query {query}")
@@ -107,3 +139,17 @@ class HostSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                bucket_name=self.host_pool_bucket_name,
                                scope=self.host_scope_name,
                                collection=self.host_collection_name)
+
+    def remove_vms(self, keys):
+        return self.delete_docs(client=self.vm_connection,
+                                keys=keys,
+                                bucket_name=self.host_pool_bucket_name,
+                                scope=self.vm_scope_name,
+                                collection=self.vm_collection_name)
+
+    def remove_hosts(self, keys):
+        return self.delete_docs(client=self.host_connection,
+                                keys=keys,
+                                bucket_name=self.host_pool_bucket_name,
+                                scope=self.host_scope_name,
+                                collection=self.host_collection_name)
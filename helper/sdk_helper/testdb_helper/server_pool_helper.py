@@ -34,6 +34,20 @@ class ServerPoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                scope=self.server_pool_scope,
                                collection=self.server_pool_collection)
 
+    def upsert_nodes_to_server_pool(self, docs):
+        return self.upsert_docs(client=self.server_pool_client,
+                                docs={doc["doc_key"]: doc for doc in docs},
+                                bucket_name=self.server_pool_bucket_name,
+                                scope=self.server_pool_scope,
+                                collection=self.server_pool_collection)
+
+    def update_nodes_tags(self, updates):
+        return self.update_tags_multi(client=self.server_pool_client,
+                                      updates=updates,
+                                      bucket_name=self.server_pool_bucket_name,
+                                      scope=self.server_pool_scope,
+                                      collection=self.server_pool_collection)
+
     def fetch_all_nodes(self):
         return self.fetch_all_docs(client=self.server_pool_client,
                                    bucket_name=self.server_pool_bucket_name,
@@ -44,6 +58,10 @@ class ServerPoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
         return self.get_doc(client=self.server_pool_client,
                             key=ipaddr)
 
+    def get_nodes(self, ipaddrs):
+        return self.get_docs(client=self.server_pool_client,
+                             keys=ipaddrs)
+
     def delete_node(self, ipaddr):
         key = ipaddr
         return self.delete_doc(client=self.server_pool_client,
@@ -52,6 +70,13 @@ class ServerPoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                scope=self.server_pool_scope,
                                collection=self.server_pool_collection)
 
+    def delete_nodes(self, ipaddrs):
+        return self.delete_docs(client=self.server_pool_client,
+                                keys=ipaddrs,
+                                bucket_name=self.server_pool_bucket_name,
+                                scope=self.server_pool_scope,
+                                collection=self.server_pool_collection)
+
     def fetch_nodes_by_poolId(self, poolId : list):
         query = f"SELECT META().id,* FROM `{self.server_pool_bucket_name}`.`{self.server_pool_scope}`.`{self.server_pool_collection}` WHERE ANY v IN poolId SATISFIES v IN {poolId} END;"
         self.logger.info(f"Running query {query}")
@@ -1,4 +1,6 @@
 import os
+import ast
+import logging
 import threading
 from util.sdk_util.sdk_client import SDKClient
 from helper.sdk_helper.testdb_helper.test_db_helper import TestDBSDKHelper
@@ -49,10 +51,46 @@ class SlavePoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                scope=self.slave_doc_scope_name,
                                collection=self.slave_doc_collection_name)
 
+    def upsert_slaves_to_slave_pool(self, docs):
+        return self.upsert_docs(client=self.slave_doc_connection,
+                                docs={doc["doc_key"]: doc for doc in docs},
+                                bucket_name=self.slave_pool_bucket_name,
+                                scope=self.slave_doc_scope_name,
+                                collection=self.slave_doc_collection_name)
+
+    def update_slave_pool_doc(self, name, update):
+        return self.update_doc(client=self.slave_doc_connection,
+                               key=name,
+                               update=update,
+                               bucket_name=self.slave_pool_bucket_name,
+                               scope=self.slave_doc_scope_name,
+                               collection=self.slave_doc_collection_name)
+
     def get_slave_pool_doc(self, name):
         return self.get_doc(client=self.slave_doc_connection,
                             key=name)
 
+    def get_slave_pool_docs(self, names):
+        return self.get_docs(client=self.slave_doc_connection,
+                             keys=names)
+
+    @staticmethod
+    def fetch_jenkins_hosts(names):
+        """
+            Fetches the docs of the slaves in bulk and returns {name: jenkins_host} for the slaves whose doc was read,
+            for the tasks to key the jenkins limit of the sub tasks of a slave on its Jenkins master. Returns an empty dict when slave-pool cannot be reached, the jenkins_host of a slave is then not known
+            before its sub tasks run
+        """
+        logger = logging.getLogger("helper")
+        try:
+            results, errors = SlavePoolSDKHelper().get_slave_pool_docs(names)
+        except Exception as e:
+            logger.warning(f"Cannot fetch the jenkins hosts of the slaves from slave-pool : {e}")
+            return {}
+        for name in errors:
+            logger.warning(f"Cannot fetch the jenkins host of slave {name} from slave-pool : {errors[name]}")
+        return {name: ast.literal_eval(slave_doc).get("jenkins_host") for name, slave_doc in results.items()}
+
     def delete_slave_pool_doc(self, name):
         key = name
         return self.delete_doc(client=self.slave_doc_connection,
@@ -61,6 +99,13 @@ class SlavePoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                scope=self.slave_doc_scope_name,
                                collection=self.slave_doc_collection_name)
 
+    def delete_slave_pool_docs(self, names):
+        return self.delete_docs(client=self.slave_doc_connection,
+                                keys=names,
+                                bucket_name=self.slave_pool_bucket_name,
+                                scope=self.slave_doc_scope_name,
+                                collection=self.slave_doc_collection_name)
+
     def fetch_all_slaves(self):
         return self.fetch_all_docs(client=self.slave_doc_connection,
                                    bucket_name=self.slave_pool_bucket_name,
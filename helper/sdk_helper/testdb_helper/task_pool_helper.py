@@ -1,13 +1,24 @@
 import os
+import ast
+import json
+import zlib
+import base64
 import threading
 import copy
 from datetime import datetime
 from util.sdk_util.sdk_client import SDKClient
 from helper.sdk_helper.testdb_helper.test_db_helper import TestDBSDKHelper
 from helper.sdk_helper.sdk_helper import SingeltonMetaClass
-from constants.doc_templates import TASK_TEMPLATE, TASK_RESULT_TEMPLATE
+from constants.doc_templates import TASK_TEMPLATE, TASK_RESULT_TEMPLATE, TASK_CHECKPOINT_TEMPLATE, \
+    TASK_RESULT_MANIFEST_TEMPLATE, TASK_RESULT_CHUNK_TEMPLATE
 from constants.task_states import TaskStates
 
+# Results up to this size, in bytes of json, are stored inline in the result document
+RESULT_INLINE_MAX_SIZE = 256 * 1024
+# Size of the base64 data of a result chunk document
+RESULT_CHUNK_SIZE = 1024 * 1024
+RESULT_CHUNKED_FORMAT = "zlib+base64"
+
 class TaskPoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
 
     _initialized = threading.Event()
@@ -61,15 +72,26 @@ class TaskPoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                scope=self.tasks_doc_scope_name,
                                collection=self.tasks_doc_collection_name)
 
-    def update_task_started(self, task_id, start_time):
+    def fetch_task_doc(self, task_id):
         try:
-            task_doc = eval(self.get_doc(client=self.tasks_doc_connection,
-                                         key=str(task_id)))
+            return ast.literal_eval(self.get_doc(client=self.tasks_doc_connection,
+                                                 key=str(task_id)))
         except Exception as e:
             msg = f"Error fetching document from task with id {str(task_id)} : {e}"
             self.logger.error(msg)
             raise Exception(msg)
 
+    def fetch_task_docs(self, task_ids):
+        """
+            Fetches the documents of the tasks in bulk and returns ({task_id: task doc}, {task_id: exception})
+        """
+        results, errors = self.get_docs(client=self.tasks_doc_connection,
+                                        keys=[str(task_id) for task_id in task_ids])
+        return {task_id: ast.literal_eval(task_doc) for task_id, task_doc in results.items()}, errors
+
+    def update_task_started(self, task_id, start_time):
+        task_doc = self.fetch_task_doc(task_id)
+
         task_doc["start_time"] = datetime.fromtimestamp(start_time).strftime('%Y-%m-%d %H:%M:%S')
         task_doc["state"] = TaskStates.RUNNING
 
@@ -81,13 +103,7 @@ class TaskPoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                collection=self.tasks_doc_collection_name)
 
     def update_task_completed(self, task_id, end_time, result):
-        try:
-            task_doc = eval(self.get_doc(client=self.tasks_doc_connection,
-                                         key=str(task_id)))
-        except Exception as e:
-            msg = f"Error fetching document from task with id {str(task_id)} : {e}"
-            self.logger.error(msg)
-            raise Exception(msg)
+        task_doc = self.fetch_task_doc(task_id)
 
         task_doc["end_time"] = datetime.fromtimestamp(end_time).strftime('%Y-%m-%d %H:%M:%S')
         task_doc["state"] = TaskStates.COMPLETED
@@ -100,15 +116,115 @@ class TaskPoolSDKHelper(TestDBSDKHelper, metaclass=SingeltonMetaClass):
                                scope=self.tasks_doc_scope_name,
                                collection=self.tasks_doc_collection_name)
 
-    def add_results_to_task(self, task_id, result):
-        result_doc = copy.deepcopy(TASK_RESULT_TEMPLATE)
-        result_doc["task_id"] = str(task_id)
-        result_doc["result"] = result
+    def update_task_params(self, task_id, task_key, params):
+        task_doc = self.fetch_task_doc(task_id)
+        task_doc["task_key"] = task_key
+        task_doc["params"] = params
 
-        key = str(task_id)
+        return self.upsert_doc(client=self.tasks_doc_connection,
+                               key=str(task_id),
+                               doc=task_doc,
+                               bucket_name=self.task_pool_bucket_name,
+                               scope=self.tasks_doc_scope_name,
+                               collection=self.tasks_doc_collection_name)
+
+    def add_checkpoint_to_task(self, task_id, seq, completed):
+        checkpoint_doc = copy.deepcopy(TASK_CHECKPOINT_TEMPLATE)
+        checkpoint_doc["task_id"] = str(task_id)
+        checkpoint_doc["seq"] = seq
+        checkpoint_doc["completed"] = completed
+
+        key = f"{str(task_id)}_checkpoint_{seq}"
+        return self.upsert_doc(client=self.results_doc_connection,
+                               key=key,
+                               doc=checkpoint_doc,
+                               bucket_name=self.task_pool_bucket_name,
+                               scope=self.results_doc_scope_name,
+                               collection=self.results_doc_collection_name)
+
+    def fetch_task_checkpoints(self, task_id):
+        query = f"SELECT * FROM `{self.task_pool_bucket_name}`.`{self.results_doc_scope_name}`.`{self.results_doc_collection_name}` WHERE task_id = $task_id AND seq IS NOT MISSING"
+        self.logger.info(f"Running query {query} with task_id {str(task_id)}")
+        checkpoints = []
+        for row in self.results_doc_connection.query(query, retries=5, named_parameters={"task_id" : str(task_id)}):
+            checkpoints.append(row[self.results_doc_collection_name])
+        return checkpoints
+
+    def add_results_to_task(self, task_id, result):
+        """
+            Stores the result of the task. Results larger than RESULT_INLINE_MAX_SIZE are compressed and split into
+            chunk documents, and the result document holds the manifest of the chunks. The manifest is written last,
+            so a reader never sees a partially written result.
+        """
+        serialized_result = json.dumps(result, separators=(",", ":"), default=str).encode()
+        if len(serialized_result) <= RESULT_INLINE_MAX_SIZE:
+            result_doc = copy.deepcopy(TASK_RESULT_TEMPLATE)
+            result_doc["task_id"] = str(task_id)
+            result_doc["result"] = result
+            return self._upsert_result_doc(str(task_id), result_doc)
+
+        data = base64.b64encode(zlib.compress(serialized_result)).decode()
+        chunks = [data[start:start + RESULT_CHUNK_SIZE] for start in range(0, len(data), RESULT_CHUNK_SIZE)]
+        chunk_docs = {}
+        for chunk, chunk_data in enumerate(chunks):
+            chunk_doc = copy.deepcopy(TASK_RESULT_CHUNK_TEMPLATE)
+            chunk_doc["task_id"] = str(task_id)
+            chunk_doc["chunk"] = chunk
+            chunk_doc["data"] = chunk_data
+            chunk_docs[f"{str(task_id)}_result_chunk_{chunk}"] = chunk_doc
+        _, errors = self.upsert_docs(client=self.results_doc_connection,
+                                     docs=chunk_docs,
+                                     bucket_name=self.task_pool_bucket_name,
+                                     scope=self.results_doc_scope_name,
+                                     collection=self.results_doc_collection_name)
+        if len(errors) > 0:
+            raise Exception(f"Cannot add chunks {sorted(errors)} of the result of task {str(task_id)} to task pool")
+
+        manifest_doc = copy.deepcopy(TASK_RESULT_MANIFEST_TEMPLATE)
+        manifest_doc["task_id"] = str(task_id)
+        manifest_doc["format"] = RESULT_CHUNKED_FORMAT
+        manifest_doc["chunks"] = len(chunks)
+        manifest_doc["size"] = len(serialized_result)
+        manifest_doc["compressed_size"] = len(data)
+        self.logger.info(f"Result of task {str(task_id)} of {len(serialized_result)} bytes stored in {len(chunks)} chunks of {len(data)} bytes in total")
+        return self._upsert_result_doc(str(task_id), manifest_doc)
+
+    def _upsert_result_doc(self, key, doc):
         return self.upsert_doc(client=self.results_doc_connection,
                                key=key,
-                               doc=result_doc,
+                               doc=doc,
                                bucket_name=self.task_pool_bucket_name,
                                scope=self.results_doc_scope_name,
                                collection=self.results_doc_collection_name)
+
+    def fetch_task_result_doc(self, task_id):
+        try:
+            return ast.literal_eval(self.get_doc(client=self.results_doc_connection,
+                                                 key=str(task_id)))
+        except Exception as e:
+            msg = f"Error fetching result document of task with id {str(task_id)} : {e}"
+            self.logger.error(msg)
+            raise Exception(msg)
+
+    def stream_task_result(self, task_id):
+        """
+            Yields the json of the result of the task in blocks of bytes, fetching and decompressing one chunk at a time.
+            Results stored inline, including the ones stored before results were chunked, are yielded in one block.
+        """
+        result_doc = self.fetch_task_result_doc(task_id)
+        if result_doc.get("format") != RESULT_CHUNKED_FORMAT:
+            yield json.dumps(result_doc["result"]).encode()
+            return
+
+        decompressor = zlib.decompressobj()
+        for chunk in range(result_doc["chunks"]):
+            chunk_doc = ast.literal_eval(self.get_doc(client=self.results_doc_connection,
+                                                      key=f"{str(task_id)}_result_chunk_{chunk}"))
+            yield decompressor.decompress(base64.b64decode(chunk_doc["data"]))
+        yield decompressor.flush()
+
+    def fetch_task_result(self, task_id):
+        """
+            Returns the result of the task, whether it is stored inline or in chunks
+        """
+        return json.loads(b"".join(self.stream_task_result(task_id)))
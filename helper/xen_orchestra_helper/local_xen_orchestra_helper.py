@@ -5,6 +5,9 @@ import datetime
 import os
 import logging
 import threading
+from util.deadline_util.deadline import remaining_time
+from util.trace_util.tracer import traced
+from util.rate_limit_util.rate_limiter import RateLimiter
 
 class LocalXenOrchestraHelper(XenOrchestraHelper):
 
@@ -25,9 +28,12 @@ class LocalXenOrchestraHelper(XenOrchestraHelper):
                 if not self._initialized.is_set():
                     super().__init__()
                     self.logger = logging.getLogger("helper")
+                    self.rate_limiter = RateLimiter()
                     self._initialized.set()
 
+    @traced("xo")
     def add_host(self, label, host, username, password):
+        self.rate_limiter.acquire("xo")
         with self._lock:
             command = self.get_add_host_command(label=label,
                                             host=host,
@@ -35,7 +41,7 @@ class LocalXenOrchestraHelper(XenOrchestraHelper):
                                             password=password)
             command =  command.split()
             self.logger.info(f"Executing command on XenServer : {' '.join(command)}")
-            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=remaining_time())
         if process.returncode != 0:
             msg = f"Command {' '.join(command)} failed with error {process.stderr.strip()}"
             self.logger.error(msg)
@@ -44,13 +50,15 @@ class LocalXenOrchestraHelper(XenOrchestraHelper):
         id = process.stdout.strip()
         return id
 
+    @traced("xo")
     def remove_host(self, label, host):
         server_info = self.get_server_status(label, host)
+        self.rate_limiter.acquire("xo")
         with self._lock:
             command = self.get_remove_host_command(id=server_info['id'])
             command =  command.split()
             self.logger.info(f"Executing command on XenServer : {' '.join(command)}")
-            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=remaining_time())
         if process.returncode != 0:
             msg = f"Command {' '.join(command)} failed with error {process.stderr.strip()}"
             self.logger.error(msg)
@@ -59,17 +67,19 @@ class LocalXenOrchestraHelper(XenOrchestraHelper):
         status = process.stdout.strip()
         return bool(status)
 
+    @traced("xo")
     def get_server_status(self, label, host):
         command = self.get_servers_status_command()
         command = command.split()
 
+        self.rate_limiter.acquire("xo")
         with self._lock:
             current_time = datetime.datetime.now()
             timestamp_string = current_time.strftime('%Y_%m_%d_%H_%M_%S_%f')
             output_file_path = f"/tmp/server_info_{timestamp_string}.json"
             output_file = open(output_file_path, "w")
             self.logger.info(f"Running command {' '.join(command)} and output is piped to {output_file_path}")
-            process = subprocess.run(command, stdout=output_file, stderr=subprocess.PIPE, universal_newlines=True)
+            process = subprocess.run(command, stdout=output_file, stderr=subprocess.PIPE, universal_newlines=True, timeout=remaining_time())
             output_file.close()
 
         if process.returncode != 0:
@@ -99,19 +109,21 @@ class LocalXenOrchestraHelper(XenOrchestraHelper):
 
         raise Exception(f"Host with label {label} and host {host} not found")
 
+    @traced("xo")
     def fetch_list_vms(self, label, host):
 
         poolId = self.get_server_status(label, host)["poolId"]
 
         command = self.get_fetch_list_vms_command()
         command = command.split()
+        self.rate_limiter.acquire("xo")
         with self._lock:
             current_time = datetime.datetime.now()
             timestamp_string = current_time.strftime('%Y_%m_%d_%H_%M_%S_%f')
             output_file_path = f"/tmp/list_vms_{timestamp_string}.json"
             output_file = open(output_file_path, "w")
             self.logger.info(f"Running command {' '.join(command)} and output is piped to {output_file_path}")
-            process = subprocess.run(command, stdout=output_file, stderr=subprocess.PIPE, universal_newlines=True)
+            process = subprocess.run(command, stdout=output_file, stderr=subprocess.PIPE, universal_newlines=True, timeout=remaining_time())
             output_file.close()
 
         if process.returncode != 0:
@@ -142,11 +154,13 @@ class LocalXenOrchestraHelper(XenOrchestraHelper):
 
         return target_vms
 
+    @traced("xo")
     def fetch_list_hosts(self, label, host):
         poolId = self.get_server_status(label, host)["poolId"]
 
         command = self.get_fetch_list_hosts_command()
         command = command.split()
+        self.rate_limiter.acquire("xo")
         with self._lock:
             current_time = datetime.datetime.now()
             timestamp_string = current_time.strftime('%Y_%m_%d_%H_%M_%S_%f')
@@ -154,7 +168,7 @@ class LocalXenOrchestraHelper(XenOrchestraHelper):
             output_file_path = f"/tmp/list_vms_{timestamp_string}.json"
             output_file = open(output_file_path, "w")
             self.logger.info(f"Running command {' '.join(command)} and output is piped to {output_file_path}")
-            process = subprocess.run(command, stdout=output_file, stderr=subprocess.PIPE, universal_newlines=True)
+            process = subprocess.run(command, stdout=output_file, stderr=subprocess.PIPE, universal_newlines=True, timeout=remaining_time())
             output_file.close()
 
         if process.returncode != 0:
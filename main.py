@@ -9,14 +9,62 @@ for project_path in project_paths:
     if project_path not in sys.path:
         sys.path.append(project_path)
 
-import yaml
 import logging.config
 import datetime
 import argparse
 import json
 from tasks.task_builder import TaskBuilder
+from tasks.task_registry import TaskRegistry
+from tasks.task_manager import TaskManager, DEFAULT_PRIORITY
+from tasks.result_sink import JSONLResultSink
+from tasks.task_progress import ProgressReporter
+from tasks.task_profiler import TaskProfiler
+from util.deadline_util.deadline import Deadline, set_deadline, reset_deadline
+from util.retry_util.retry_policy import RetryMetrics
+from util.rate_limit_util.rate_limiter import RateLimiter
+from util.sdk_util.cluster_registry import ClusterRegistry
+from util.trace_util.tracer import Tracer
 
-def create_csv_json_reports(state, output_directory):
+def run_task(task_name, params, submit=False, priority=DEFAULT_PRIORITY, results_file=None, deadline=None):
+    """
+        Runs the task in this process, or in the running task manager when submit is set, and returns its json result
+        When results_file is given the results of the sub tasks are streamed to it as JSON lines
+        When deadline is given the task and its sub tasks are bounded to that many seconds
+    """
+    if submit:
+        task_id = TaskManager.send_request({
+            "action" : "submit",
+            "task_name" : task_name,
+            "params" : params,
+            "priority" : priority,
+            "results_file" : results_file,
+            "deadline" : deadline
+        })["task_id"]
+        print(f"Task {task_name} submitted to task manager with id {task_id}")
+        return TaskManager.send_request({"action" : "result", "task_id" : task_id})["result"]
+
+    token = set_deadline(Deadline(deadline) if deadline is not None else None)
+    try:
+        task = TaskBuilder.fetch_task(task_name, params)
+        return execute_task(task, results_file)
+    finally:
+        reset_deadline(token)
+
+def execute_task(task, results_file=None):
+    if results_file is None:
+        task.execute()
+        return task.generate_json_result()
+
+    result_sink = JSONLResultSink(results_file)
+    print(f"Streaming results of task {task.task_name} to {results_file}")
+    try:
+        task.set_result_sink(result_sink)
+        task.execute()
+        return task.generate_json_result()
+    finally:
+        result_sink.close()
+
+def create_csv_json_reports(state, output_directory, submit=False):
 
     output_dir =  os.path.join(output_directory, state)
     if not os.path.exists(output_dir):
@@ -34,22 +82,63 @@ def create_csv_json_reports(state, output_directory):
         "results_dir" : output_dir
     }
 
-    task = TaskBuilder.fetch_task("get_csv_task", params=params)
-    task.execute()
-    json_result = task.generate_json_result()
-    
+    json_result = run_task("get_csv_task", params, submit)
+
     local_file_path = os.path.join(output_dir, f"result_csv_task.json")
     with open(local_file_path, "w") as json_file:
         json.dump(json_result, json_file)
 
-    task = TaskBuilder.fetch_task("get_json_task", params=params)
-    task.execute()
-    json_result = task.generate_json_result()
+    json_result = run_task("get_json_task", params, submit)
 
     local_file_path = os.path.join(output_dir, f"result_json_task.json")
     with open(local_file_path, "w") as json_file:
         json.dump(json_result, json_file)
 
+def start_progress_reporter(output_directory, progress_port=None):
+    """
+        Starts rewriting progress.json in the output directory with the progress of the running tasks,
+        and serving it on progress_port when given
+    """
+    progress_reporter = ProgressReporter(os.path.join(output_directory, "progress.json"), progress_port)
+    progress_reporter.start()
+    return progress_reporter
+
+def write_metrics(output_directory, submit=False):
+    """
+        Writes the retry counts, rate limiting and SDK connections of the run to metrics.json. Tasks submitted to the task manager
+        run in it, the metrics are then the ones of the task manager since it started.
+    """
+    if submit:
+        metrics = TaskManager.send_request({"action" : "metrics"})
+        metrics.pop("status", None)
+    else:
+        metrics = {
+            "retries" : RetryMetrics().snapshot(),
+            "rate_limits" : RateLimiter().stats(),
+            "sdk_connections" : ClusterRegistry().stats()
+        }
+    with open(os.path.join(output_directory, "metrics.json"), "w") as metrics_file:
+        json.dump(metrics, metrics_file, indent=2)
+
+def write_profile(output_directory):
+    """
+        Writes the cProfile data of the task run to profile.pstats, its top functions to profile.txt and the
+        wall and CPU times per sub task function to subtask_profile.json. Submitted tasks are not profiled.
+    """
+    TaskProfiler().write(os.path.join(output_directory, "profile.pstats"),
+                         os.path.join(output_directory, "profile.txt"),
+                         os.path.join(output_directory, "subtask_profile.json"))
+    print(f"Profile of the run written to {output_directory}")
+
+def write_trace(output_directory):
+    """
+        Writes the spans recorded in this process to trace.json, to be opened in Perfetto or chrome://tracing.
+        Tasks submitted to the task manager run in it and are not part of the trace.
+    """
+    trace_file_path = os.path.join(output_directory, "trace.json")
+    Tracer().write(trace_file_path)
+    print(f"Trace of the run written to {trace_file_path}")
+
 def create_log_file(output_directory):
     logging_conf_path = os.path.join(script_dir, "logging.conf")
     logging_conf = open(logging_conf_path)
@@ -72,12 +161,9 @@ def parse_arguments():
         print("Usage: python main.py <task_name>")
         sys.exit(1)
 
-    tasks_file_path = os.path.join(script_dir, "tasks", "tasks.yml")
+    tasks_data = TaskRegistry().tasks_data
 
-    with open(tasks_file_path, 'r') as file:
-        tasks_data = yaml.safe_load(file)
-
-    if sys.argv[1] not in tasks_data:
+    if sys.argv[1] not in tasks_data or "class" not in tasks_data[sys.argv[1]]:
         print("Usage: python main.py <task_name>")
         raise ValueError(f"Given task {sys.argv[1]} not found")
 
@@ -86,7 +172,21 @@ def parse_arguments():
 
     parser = argparse.ArgumentParser(description="A tool to run a task")
     parser.add_argument("task_name", help="Name of the task")
-    
+    parser.add_argument("--submit", dest="submit", action="store_true",
+                        help="Submit the task to the running task manager instead of running it in this process")
+    parser.add_argument("--priority", dest="priority", type=int, default=DEFAULT_PRIORITY,
+                        help="Priority of the submitted task, lower values run first")
+    parser.add_argument("--stream_results", dest="stream_results", action="store_true",
+                        help="Stream the results of the sub tasks to result.jsonl as they complete, result.json then holds a summary")
+    parser.add_argument("--deadline", dest="deadline", type=float, default=None,
+                        help="Time in seconds by which the task has to finish. Sub tasks not done by then are marked as failed")
+    parser.add_argument("--progress_port", dest="progress_port", type=int, default=None,
+                        help="Serve the progress of the run as json on this local port, in addition to progress.json")
+    parser.add_argument("--trace", dest="trace", action="store_true",
+                        help="Record spans of the tasks, sub tasks and helper calls of the run to trace.json")
+    parser.add_argument("--profile", dest="profile", action="store_true",
+                        help="Profile the run, writing cProfile data and wall and CPU times per sub task function next to result.json")
+
     argument_data = tasks_data[task_name]
 
     params = argument_data["params"]
@@ -109,26 +209,109 @@ def parse_arguments():
     return task_name, vars(args)
 
 def fetch_and_run_task(task_name, params, output_dir):
+    submit = params.pop("submit", False)
+    priority = params.pop("priority", DEFAULT_PRIORITY)
+    results_file = os.path.join(output_dir, "result.jsonl") if params.pop("stream_results", False) else None
+    deadline = params.pop("deadline", None)
+    progress_port = params.pop("progress_port", None)
+    trace = params.pop("trace", False)
+    if trace:
+        Tracer().enable()
+    profile = params.pop("profile", False)
+
+    create_csv_json_reports("pre", output_dir, submit)
+
+    # Submitted tasks report their progress in the task manager
+    progress_reporter = None if submit else start_progress_reporter(output_dir, progress_port)
+    if profile:
+        TaskProfiler().start()
+    try:
+        json_result = run_task(task_name, params, submit, priority, results_file, deadline)
+    finally:
+        if profile:
+            write_profile(output_dir)
+        if progress_reporter is not None:
+            progress_reporter.stop()
+
+    local_file_path = os.path.join(output_dir, f"result.json")
+    with open(local_file_path, "w") as json_file:
+        json.dump(json_result, json_file)
+
+    create_csv_json_reports("post", output_dir, submit)
+
+    write_metrics(output_dir, submit)
+    if trace:
+        write_trace(output_dir)
+
+def resume_and_run_task(task_id, output_dir, stream_results=False, deadline=None, progress_port=None, trace=False,
+                        profile=False):
+    results_file = os.path.join(output_dir, "result.jsonl") if stream_results else None
+    if trace:
+        Tracer().enable()
 
     create_csv_json_reports("pre", output_dir)
 
-    task = TaskBuilder.fetch_task(task_name, params)
-    task.execute()
-    json_result = task.generate_json_result()
-    
+    progress_reporter = start_progress_reporter(output_dir, progress_port)
+    if profile:
+        TaskProfiler().start()
+    token = set_deadline(Deadline(deadline) if deadline is not None else None)
+    try:
+        task = TaskBuilder.resume_task(task_id)
+        json_result = execute_task(task, results_file)
+    finally:
+        reset_deadline(token)
+        if profile:
+            write_profile(output_dir)
+        progress_reporter.stop()
+
     local_file_path = os.path.join(output_dir, f"result.json")
     with open(local_file_path, "w") as json_file:
         json.dump(json_result, json_file)
 
     create_csv_json_reports("post", output_dir)
 
-def main():
+    write_metrics(output_dir)
+    if trace:
+        write_trace(output_dir)
 
-    task_name, params = parse_arguments()
+def parse_resume_arguments():
+    parser = argparse.ArgumentParser(description="Resumes a task which did not finish, skipping its completed sub tasks. "
+                                                 "The secret params of the task are not stored and are taken from the "
+                                                 "environment, e.g. SSH_PASSWORD for ssh_password")
+    parser.add_argument("--resume", dest="task_id", required=True, help="Id of the task to be resumed")
+    parser.add_argument("--stream_results", action="store_true",
+                        help="Stream the results of the sub tasks to result.jsonl as they complete")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Time in seconds by which the task has to finish. Sub tasks not done by then are marked as failed")
+    parser.add_argument("--progress_port", type=int, default=None,
+                        help="Serve the progress of the run as json on this local port, in addition to progress.json")
+    parser.add_argument("--trace", action="store_true",
+                        help="Record spans of the tasks, sub tasks and helper calls of the run to trace.json")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the run, writing cProfile data and wall and CPU times per sub task function next to result.json")
+    return parser.parse_args()
 
+def parse_task_manager_arguments():
+    parser = argparse.ArgumentParser(description="Runs the task manager serving task submissions on a local Unix socket")
+    parser.add_argument("--task_manager", action="store_true", help="Run the task manager")
+    parser.add_argument("--max_workers", type=int, default=10, help="Number of tasks run concurrently")
+    parser.add_argument("--progress_port", type=int, default=None,
+                        help="Serve the progress of the tasks run by the task manager as json on this local port")
+    return parser.parse_args()
+
+def run_task_manager(max_workers, output_dir, progress_port=None):
+    task_manager = TaskManager(max_workers)
+    task_manager.warm_up()
+    progress_reporter = start_progress_reporter(output_dir, progress_port)
+    try:
+        task_manager.serve()
+    finally:
+        progress_reporter.stop()
+
+def create_output_dir(prefix="results"):
     current_time = datetime.datetime.now()
     timestamp_string = current_time.strftime('%Y_%m_%d_%H_%M_%S_%f')
-    output_dir_name = f"results_{timestamp_string}"
+    output_dir_name = f"{prefix}_{timestamp_string}"
     output_dir = os.path.join(script_dir, output_dir_name)
 
     if not os.path.exists(output_dir):
@@ -137,9 +320,35 @@ def main():
             os.makedirs(output_dir)
         except Exception as e:
             print(f"Error creating directory {output_dir} : {e}")
-            return
+            return None
 
     create_log_file(output_dir)
+    return output_dir
+
+def main():
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--task_manager":
+        args = parse_task_manager_arguments()
+        output_dir = create_output_dir("task_manager")
+        if output_dir is None:
+            return
+        run_task_manager(args.max_workers, output_dir, args.progress_port)
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--resume":
+        args = parse_resume_arguments()
+        output_dir = create_output_dir()
+        if output_dir is None:
+            return
+        resume_and_run_task(args.task_id, output_dir, args.stream_results, args.deadline, args.progress_port,
+                            args.trace, args.profile)
+        return
+
+    task_name, params = parse_arguments()
+
+    output_dir = create_output_dir()
+    if output_dir is None:
+        return
 
     fetch_and_run_task(task_name, params, output_dir)
 
@@ -0,0 +1,134 @@
+import asyncio
+import time
+import inspect
+from tasks.task import Task
+from tasks.task_result import TaskResult
+from tasks.resource_limiter import get_resource_class
+from util.deadline_util.deadline import DeadlineExceeded, set_deadline
+from util.trace_util.tracer import traced
+
+class AsyncTask(Task):
+    """
+        asyncio counterpart of Task for I/O bound fleets.
+        Subtasks are coroutine functions called with (task_result, params) and run as asyncio tasks on one event loop,
+        with at most max_concurrency of them in flight. Plain functions are also accepted as subtasks, and blocking
+        helper calls can be awaited through run_sync, both of which run on the shared TaskScheduler limited to
+        max_workers threads. The testdb pools have asyncio helpers, e.g. AsyncServerPoolSDKHelper, which need no
+        thread at all.
+        Subclasses implement execute_async instead of execute.
+    """
+    def __init__(self, task_name, max_concurrency, max_workers=100, store_results=False):
+        super().__init__(task_name, max_workers, store_results=store_results)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._resource_semaphores = {}
+
+    def execute(self):
+        asyncio.run(self._execute())
+
+    async def _execute(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._resource_semaphores = {}
+        if self.deadline is not None:
+            set_deadline(self.deadline)
+        await self.execute_async()
+
+    async def execute_async(self):
+        raise NotImplementedError("The execute_async for the task is not implemented")
+
+    async def run_sync(self, fn, *args):
+        """
+            Runs a blocking function, typically a sync helper call, on the shared TaskScheduler
+            without blocking the event loop
+        """
+        return await asyncio.wrap_future(self.scheduler.submit(fn, *args))
+
+    @traced("task", "add_sub_task")
+    def add_sub_task(self, subtask, params, depends_on=None, resource_class=None):
+        """
+            Adds a sub task for execution on the running event loop and returns its subtask id
+            Args:
+            subtask (callable, required) : The coroutine function or function to be run, called with (task_result, params)
+            params (dict, required) : The params passed to the subtask
+            depends_on (list, optional) : List of subtask ids which have to finish before this subtask starts
+            resource_class (str, optional) : The resource class whose concurrency limit applies to the subtask.
+                Defaults to the one declared on the subtask with uses_resource
+        """
+        self.logger.debug(f"Sub task {subtask.__name__} added for execution")
+        subtask_id = f'{subtask.__name__}_{next(self._subtask_counter)}'
+        task_result = TaskResult()
+        task_result.start_task()
+
+        dependencies = []
+        if depends_on:
+            for dependency_id in depends_on:
+                if dependency_id not in self.subtasks:
+                    raise ValueError(f"Dependency {dependency_id} of {subtask_id} is not a pending sub task")
+                dependencies.append(self.subtasks[dependency_id][0])
+
+        resource_class = get_resource_class(subtask, params, resource_class)
+        self.progress.subtask_submitted()
+        future_instance = asyncio.ensure_future(self._run_sub_task(subtask, task_result, params, dependencies, resource_class))
+        self.subtasks[subtask_id] = (future_instance, task_result)
+        return subtask_id
+
+    def _get_resource_semaphore(self, resource_class):
+        limit = self.resource_limiter.get_limit(resource_class)
+        if limit is None:
+            return None
+        if resource_class not in self._resource_semaphores:
+            self._resource_semaphores[resource_class] = asyncio.Semaphore(limit)
+        return self._resource_semaphores[resource_class]
+
+    async def _run_sub_task(self, subtask, task_result, params, dependencies, resource_class):
+        if len(dependencies) > 0:
+            await asyncio.wait(dependencies)
+        if self.deadline is not None and self.deadline.expired():
+            self.progress.subtask_abandoned()
+            self.deadline.check()
+        resource_semaphore = self._get_resource_semaphore(resource_class)
+        async with self._semaphore:
+            if resource_semaphore is None:
+                return await self._call_sub_task(subtask, task_result, params)
+            async with resource_semaphore:
+                return await self._call_sub_task(subtask, task_result, params)
+
+    async def _call_sub_task(self, subtask, task_result, params):
+        if inspect.iscoroutinefunction(subtask):
+            start_time = self.progress.subtask_started()
+            body_start_time = time.time()
+            self.tracer.add_span(f"{subtask.__name__} queued", "queue", task_result.start_time, body_start_time)
+            try:
+                result = await subtask(task_result, params)
+            except BaseException:
+                self.progress.subtask_finished(start_time, failed=True)
+                raise
+            finally:
+                self.tracer.add_span(subtask.__name__, "subtask", body_start_time, time.time(), {"task" : self.task_name})
+            self.progress.subtask_finished(start_time)
+            return result
+        return await self.run_sync(self._call_with_deadline, subtask, task_result, params)
+
+    async def get_sub_task_result(self, subtask_id):
+        future_instance = self.subtasks[subtask_id][0]
+        try:
+            timeout = self.deadline.remaining() if self.deadline is not None else None
+            done, _ = await asyncio.wait([future_instance], timeout=timeout)
+            if len(done) == 0:
+                future_instance.cancel()
+                raise DeadlineExceeded(f"{subtask_id} did not complete before the deadline of task {self.task_name}_{self.id}")
+            exception = future_instance.exception()
+            if exception:
+                self.logger.critical(f"Exception in {subtask_id}: {exception}")
+                self.subtasks[subtask_id][1].set_exception(exception)
+            else:
+                future_instance.result()
+                self.subtasks[subtask_id][1].complete_task(result=True)
+        except Exception as e:
+            self.logger.warning(f"{subtask_id} has not run properly and has ended abruptly : {e}")
+            self.subtasks[subtask_id][1].set_exception(e)
+
+        task_result = self.subtasks[subtask_id][1]
+        TaskResult.generate_json_result(task_result)
+        self.subtasks.pop(subtask_id, None)
+        return task_result
@@ -1,11 +1,14 @@
 import time
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from tasks.host_maintenance.host_operations.update_hosts import UpdateHostsTask
 from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
 from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
+from helper.sdk_helper.tags_write_buffer import TagsWriteBuffer
 from constants.doc_templates import VM_TEMPLATE
+from util.deadline_util.deadline import remaining_time
 
 # TODO tasks
 '''
@@ -24,10 +27,20 @@ class HostHealthMonitorTask(Task):
             doc["tags"]["details"] = {}
 
     def _flush_tags_list(self, doc: dict, tags: list):
+        # In place, checks running concurrently on the doc append their own tags to the same list
         for tag in tags:
-            if tag in doc["tags"]["list"]:
-                doc["tags"]["list"] = list(filter(lambda x: x !=tag, doc["tags"]["list"]))
+            while tag in doc["tags"]["list"]:
+                doc["tags"]["list"].remove(tag)
 
+    def _tags_details(self, doc: dict, names: list):
+        return {name: doc["tags"]["details"][name] for name in names if name in doc["tags"]["details"]}
+
+    def _tags_changes(self, doc: dict, tags: list):
+        tags_added = [tag for tag in tags if tag in doc["tags"]["list"]]
+        tags_removed = [tag for tag in tags if tag not in doc["tags"]["list"]]
+        return tags_added, tags_removed
+
+    @uses_resource("sdk_kv")
     def check_for_vms_state(self, task_result: TaskResult, params: dict) -> None:
         if "host_doc" not in params:
             self.set_subtask_exception(ValueError(f"host_doc key is missing in params {params}"))
@@ -38,13 +51,6 @@ class HostHealthMonitorTask(Task):
         host = host_doc["name"]
         vm_docs = params["vm_docs"]
 
-        try:
-            host_pool_helper = HostSDKHelper()
-            self.logger.info(f"Connection to Host Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Host Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         self._initialize_tags(host_doc)
 
         host_doc["tags"]["details"]["vm_states"] = {}
@@ -53,18 +59,14 @@ class HostHealthMonitorTask(Task):
                 host_doc["tags"]["details"]["vm_states"][vm["state"]] = 0
             host_doc["tags"]["details"]["vm_states"][vm["state"]] += 1
 
-        try:
-            res = host_pool_helper.update_host(host_doc)
-            if not res:
-                exception = f"Cannot upsert host {host} with halted-vm checks to host pool"
-            self.logger.info(f"Document for host {host} with halted-vm checks upserted to host pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert host {host} with halted-vm checks to host pool : {e}"
-            self.set_subtask_exception(exception)
+        self.host_tags_buffer.add(host_doc["name"],
+                                  self._tags_details(host_doc, ["vm_states"]),
+                                  [], [])
 
         task_result.result_json = {}
         task_result.result_json["vm_states"] = host_doc["tags"]["details"]["vm_states"]
 
+    @uses_resource("sdk_kv")
     def check_for_cpu_usage(self, task_result: TaskResult, params: dict) -> None:
         if "host_doc" not in params:
             self.set_subtask_exception(ValueError(f"host_doc key is missing in params {params}"))
@@ -75,13 +77,6 @@ class HostHealthMonitorTask(Task):
         host = host_doc["name"]
         vm_docs = params["vm_docs"]
 
-        try:
-            host_pool_helper = HostSDKHelper()
-            self.logger.info(f"Connection to Host Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Host Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         cpu = 0
         for vm in vm_docs:
             if vm["state"] == "Running":
@@ -105,19 +100,15 @@ class HostHealthMonitorTask(Task):
         elif host_doc["tags"]["details"]["cpu_provision_percent"] == 0:
             host_doc["tags"]["list"].append("cpu_not_provisioned")
 
-        try:
-            res = host_pool_helper.update_host(host_doc)
-            if not res:
-                exception = f"Cannot upsert host {host} with cpu-utilization checks to host pool"
-                self.set_subtask_exception(exception)
-            self.logger.info(f"Document for host {host} with cpu-utilization checks upserted to host pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert host {host} with cpu-utilization checks to host pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(host_doc, tags)
+        self.host_tags_buffer.add(host_doc["name"],
+                                  self._tags_details(host_doc, ["cpu_provision_percent"]),
+                                  tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["cpu_provision_percent"] = host_doc["tags"]["details"]["cpu_provision_percent"]
 
+    @uses_resource("sdk_kv")
     def check_for_mem_usage(self, task_result: TaskResult, params: dict) -> None:
         if "host_doc" not in params:
             self.set_subtask_exception(ValueError(f"host_doc key is missing in params {params}"))
@@ -128,13 +119,6 @@ class HostHealthMonitorTask(Task):
         host = host_doc["name"]
         vm_docs = params["vm_docs"]
 
-        try:
-            host_pool_helper = HostSDKHelper()
-            self.logger.info(f"Connection to Host Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Host Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         memory = 0
         for vm in vm_docs:
             if vm["state"] == "Running":
@@ -158,32 +142,21 @@ class HostHealthMonitorTask(Task):
         elif host_doc["tags"]["details"]["memory_provision_percent"] == 0:
             host_doc["tags"]["list"].append("memory_not_provisioned")
 
-        try:
-            res = host_pool_helper.update_host(host_doc)
-            if not res:
-                exception = f"Cannot upsert host {host} with memory-utilization checks to host pool"
-                self.set_subtask_exception(exception)
-            self.logger.info(f"Document for host {host} with memory-utilization checks upserted to host pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert host {host} with memory-utilization checks to host pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(host_doc, tags)
+        self.host_tags_buffer.add(host_doc["name"],
+                                  self._tags_details(host_doc, ["memory_provision_percent"]),
+                                  tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["memory_provision_percent"] = host_doc["tags"]["details"]["memory_provision_percent"]
 
+    @uses_resource("sdk_kv")
     def check_vm_network(self, task_result: TaskResult, params: dict) -> None:
         if "vm_doc" not in params:
             self.set_subtask_exception(ValueError(f"vm_doc key is missing in params {params}"))
 
         vm_doc = params["vm_doc"]
 
-        try:
-            host_sdk_helper = HostSDKHelper()
-            self.logger.info(f"Connection to Host Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Host Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         self._initialize_tags(vm_doc)
         tags = ["addresses_unavailable", "addresses_ipv4_unavailable", "mainIpAddress_unavailable", "mainIpAddress_ipv4_unavailable"]
         self._flush_tags_list(vm_doc, tags)
@@ -210,33 +183,22 @@ class HostHealthMonitorTask(Task):
             else:
                 vm_doc["tags"]["details"]["mainIpAddress_available"] = True
 
-        try:
-            res = host_sdk_helper.update_vm(vm_doc)
-            if not res:
-                exception = f"Cannot upsert vm {vm_doc['name_label']} with network-consistency checks to host pool"
-                self.set_subtask_exception(exception)
-            self.logger.info(f"Document for vm {vm_doc['name_label']} with network-consistency checks upserted to host pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert vm {vm_doc['name_label']} with network-consistency checks to host pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(vm_doc, tags)
+        self.vm_tags_buffer.add(vm_doc["name_label"],
+                                self._tags_details(vm_doc, ["addresses_available", "mainIpAddress_available"]),
+                                tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["addresses_available"] = vm_doc["tags"]["details"]["addresses_available"]
         task_result.result_json["mainIpAddress_available"] = vm_doc["tags"]["details"]["mainIpAddress_available"]
 
+    @uses_resource("sdk_kv")
     def check_vm_os_version(self, task_result: TaskResult, params: dict) -> None:
         if "vm_doc" not in params:
             self.set_subtask_exception(ValueError(f"vm_doc key is missing in params {params}"))
 
         vm_doc = params["vm_doc"]
 
-        try:
-            host_sdk_helper = HostSDKHelper()
-            self.logger.info(f"Connection to Host Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Host Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         self._initialize_tags(vm_doc)
         tags = ["os_version_unavailable"]
         self._flush_tags_list(vm_doc, tags)
@@ -251,31 +213,21 @@ class HostHealthMonitorTask(Task):
         if not vm_doc["tags"]["details"]["os_version_available"]:
             vm_doc["tags"]["list"].append("os_version_unavailable")
 
-        try:
-            res = host_sdk_helper.update_vm(vm_doc)
-            if not res:
-                exception = f"Cannot upsert vm {vm_doc['name_label']} with os-version-consistency checks to host pool"
-                self.set_subtask_exception(exception)
-            self.logger.info(f"Document for vm {vm_doc['name_label']} with os-version-consistency checks upserted to host pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert vm {vm_doc['name_label']} with os-version-consistency checks to host pool : {e}"
+        tags_added, tags_removed = self._tags_changes(vm_doc, tags)
+        self.vm_tags_buffer.add(vm_doc["name_label"],
+                                self._tags_details(vm_doc, ["os_version_available"]),
+                                tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["os_version_available"] = vm_doc["tags"]["details"]["os_version_available"]
 
+    @uses_resource("sdk_query")
     def check_vms_in_server_pool(self, task_result: TaskResult, params: dict) -> None:
         if "vm_doc" not in params:
             self.set_subtask_exception(ValueError(f"vm_doc key is missing in params {params}"))
 
         vm_doc = params["vm_doc"]
 
-        try:
-            host_sdk_helper = HostSDKHelper()
-            self.logger.info(f"Connection to Host Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Host Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         try:
             server_pool_helper = ServerPoolSDKHelper()
             self.logger.info(f"Connection to Server Pool successful")
@@ -305,32 +257,21 @@ class HostHealthMonitorTask(Task):
         if not ip_present:
             vm_doc["tags"]["list"].append("vm_not_in_server_pool")
 
-        try:
-            res = host_sdk_helper.update_vm(vm_doc)
-            if not res:
-                exception = f"Cannot upsert vm {vm_doc['name_label']} with server-pool-consistency checks to host pool"
-                self.set_subtask_exception(exception)
-            self.logger.info(f"Document for vm {vm_doc['name_label']} with server-pool-consistency checks upserted to host pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert vm {vm_doc['name_label']} with server-pool-consistency checks to host pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(vm_doc, tags)
+        self.vm_tags_buffer.add(vm_doc["name_label"],
+                                self._tags_details(vm_doc, ["vm_in_server_pool"]),
+                                tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json ["vm_in_server_pool"] = vm_doc["tags"]["details"]["vm_in_server_pool"]
 
+    @uses_resource("sdk_kv")
     def check_vm_field_consistency(self, task_result: TaskResult, params: dict) -> None:
         if "vm_doc" not in params:
             self.set_subtask_exception(ValueError(f"vm_doc key is missing in params {params}"))
 
         vm_doc = params["vm_doc"]
 
-        try:
-            host_sdk_helper = HostSDKHelper()
-            self.logger.info(f"Connection to Host Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Host Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         fields_required = list(VM_TEMPLATE.keys())
 
         fields_absent = []
@@ -361,14 +302,10 @@ class HostHealthMonitorTask(Task):
             if len(fields_extra) > 0:
                 vm_doc["tags"]["details"]["field_consistency"]["fields_extra"] = fields_extra
 
-        try:
-            res = host_sdk_helper.update_vm(vm_doc)
-            if not res:
-                exception = f"Cannot upsert vm {vm_doc['name_label']} with field-consistency checks to host pool"
-                self.set_subtask_exception(exception)
-            self.logger.info(f"Document for vm {vm_doc['name_label']} with field-consistency checks upserted to host pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert vm {vm_doc['name_label']} with field-consistency checks to host pool : {e}"
+        tags_added, tags_removed = self._tags_changes(vm_doc, tags)
+        self.vm_tags_buffer.add(vm_doc["name_label"],
+                                self._tags_details(vm_doc, ["field_consistency"]),
+                                tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["field_consistency"] = vm_doc["tags"]["details"]["field_consistency"]
@@ -396,19 +333,21 @@ class HostHealthMonitorTask(Task):
         if "vm_docs" not in params:
             self.set_subtask_exception(ValueError(f"vm_docs key is missing in params {params}"))
 
-        for task in self.host_sub_task_names:
-            subtask_id = self.add_sub_task(self.host_sub_task_names[task], params)
-            sub_task_result = self.get_sub_task_result(subtask_id)
-            task_result.subtasks[task] = sub_task_result
+        # The checks of a host own distinct tags and details of the host doc, they run concurrently
+        subtask_ids = {task: self.add_sub_task(self.host_sub_task_names[task], params) for task in self.host_sub_task_names}
+        for task, subtask_id in subtask_ids.items():
+            task_result.subtasks[task] = self.get_sub_task_result(subtask_id)
+        self.host_tags_buffer.done(params["host_doc"]["name"])
 
     def vm_sub_tasks(self, task_result: TaskResult, params: dict) -> None:
         if "vm_doc" not in params:
             self.set_subtask_exception(ValueError(f"vm_doc key is missing in params {params}"))
 
-        for task in self.vm_sub_task_names:
-            subtask_id = self.add_sub_task(self.vm_sub_task_names[task], params)
-            sub_task_result = self.get_sub_task_result(subtask_id)
-            task_result.subtasks[task] = sub_task_result
+        # The checks of a vm own distinct tags and details of the vm doc, they run concurrently
+        subtask_ids = {task: self.add_sub_task(self.vm_sub_task_names[task], params) for task in self.vm_sub_task_names}
+        for task, subtask_id in subtask_ids.items():
+            task_result.subtasks[task] = self.get_sub_task_result(subtask_id)
+        self.vm_tags_buffer.done(params["vm_doc"]["name_label"])
     
     def __init__(self, params:dict, max_workers: Optional[int]=None):
         """
@@ -519,12 +458,13 @@ class HostHealthMonitorTask(Task):
                 }
                 params["data"].append(host_info)
             self.update_task = UpdateHostsTask(params)
+            self.update_task.set_result_sink(self.result_sink)
             self.update_task.execute()
             self.update_task.generate_json_result()
             self.task_result.subtasks["update_docs_task"] = self.update_task.task_result
 
             # Waiting for a while to let the cluster catch up with the latest updates
-            time.sleep(60)
+            time.sleep(remaining_time(60))
 
             # Need to fetch fresh updated data
             try:
@@ -541,51 +481,64 @@ class HostHealthMonitorTask(Task):
                 row[host_pool_helper.host_collection_name]["doc_key"] = row["id"]
                 host_docs.append(row[host_pool_helper.host_collection_name])
 
-        host_sub_task_ids = []
-        vm_sub_tasks_ids = []
-        for host_doc in host_docs:
-            try:
-                query_result = host_pool_helper.fetch_vms_by_host(host_doc["name"])
-            except Exception as e:
-                exception = f"Cannot fetch vms by host from host-pool : {e}"
-                self.set_exception(exception)
+        # The outcomes of the checks of a host or a vm are buffered and the doc is written once its checks are done,
+        # in batches with the other docs, instead of once per check
+        self.host_tags_buffer = TagsWriteBuffer(host_pool_helper.update_hosts_tags)
+        self.vm_tags_buffer = TagsWriteBuffer(host_pool_helper.update_vms_tags)
+        self.write_buffers.extend([self.host_tags_buffer, self.vm_tags_buffer])
 
-            vm_docs = []
-            try:
-                for row in query_result:
-                    row[host_pool_helper.vm_collection_name]["doc_key"] = row["id"]
-                    vm_docs.append(row[host_pool_helper.vm_collection_name])
-            except Exception as e:
-                exception = f"Cannot fetch vms by host from host-pool : {e}"
-                self.set_exception(exception)
+        try:
+            host_sub_task_ids = []
+            vm_sub_tasks_ids = []
+            for host_doc in host_docs:
+                try:
+                    query_result = host_pool_helper.fetch_vms_by_host(host_doc["name"])
+                except Exception as e:
+                    exception = f"Cannot fetch vms by host from host-pool : {e}"
+                    self.set_exception(exception)
+
+                vm_docs = []
+                try:
+                    for row in query_result:
+                        row[host_pool_helper.vm_collection_name]["doc_key"] = row["id"]
+                        vm_docs.append(row[host_pool_helper.vm_collection_name])
+                except Exception as e:
+                    exception = f"Cannot fetch vms by host from host-pool : {e}"
+                    self.set_exception(exception)
 
-            params = {
-                "host_doc" : host_doc,
-                "vm_docs" : vm_docs
-            }
-            host_sub_task_id = self.add_sub_task(self.host_sub_tasks, params)
-            host_sub_task_ids.append([host_doc["name"], host_sub_task_id])
-            
-            for vm_doc in vm_docs:
                 params = {
-                    "vm_doc" : vm_doc
+                    "host_doc" : host_doc,
+                    "vm_docs" : vm_docs
                 }
-                vm_sub_task_id = self.add_sub_task(self.vm_sub_tasks, params)
-                vm_sub_tasks_ids.append([host_doc["name"],vm_doc["name_label"],vm_sub_task_id])
-
-        self.task_result.subtasks["host_tasks"] = {}
-        for host, subtask_id in host_sub_task_ids:
-            self.task_result.subtasks["host_tasks"][host] = self.get_sub_task_result(subtask_id)
+                host_sub_task_id = self.add_sub_task(self.host_sub_tasks, params,
+                                                     checkpoint_key=f"host::{host_doc['name']}",
+                                                     result_path=["host_tasks", host_doc["name"]])
+                host_sub_task_ids.append(host_sub_task_id)
+            
+                for vm_doc in vm_docs:
+                    params = {
+                        "vm_doc" : vm_doc
+                    }
+                    vm_sub_task_id = self.add_sub_task(self.vm_sub_tasks, params,
+                                                       checkpoint_key=f"vm::{host_doc['name']}::{vm_doc['name_label']}",
+                                                       result_path=["vm_tasks", host_doc["name"], vm_doc["name_label"]])
+                    vm_sub_tasks_ids.append(vm_sub_task_id)
+
+            self.task_result.subtasks["host_tasks"] = {}
+            for subtask_id in host_sub_task_ids:
+                self.get_sub_task_result(subtask_id)
         
-        self.task_result.subtasks["vm_tasks"] = {}
-        for host, vm, subtask_id in vm_sub_tasks_ids:
-            if host not in self.task_result.subtasks["vm_tasks"]:
-                self.task_result.subtasks["vm_tasks"][host] = {}
-            self.task_result.subtasks["vm_tasks"][host][vm] = self.get_sub_task_result(subtask_id)
+            self.task_result.subtasks["vm_tasks"] = {}
+            for subtask_id in vm_sub_tasks_ids:
+                self.get_sub_task_result(subtask_id)
+        finally:
+            self.flush_write_buffers()
 
         self.complete_task(result=True)
     
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return super().generate_json_result(timeout=timeout)
         TaskResult.generate_json_result(self.task_result)
         result_json = {}
         if self.update_docs:
@@ -598,6 +551,7 @@ class HostHealthMonitorTask(Task):
             for vm in self.task_result.subtasks["vm_tasks"][host]:
                 result_json["monitor_task"][host]["vm_tasks"][vm] = TaskResult.generate_json_result(self.task_result.subtasks["vm_tasks"][host][vm])
         self.task_result.result_json = result_json
+        self.add_write_results(self.task_result.result_json)
 
         if self.store_results:
             self.add_task_result_to_db()
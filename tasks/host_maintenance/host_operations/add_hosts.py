@@ -2,13 +2,16 @@ import time
 import copy
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
 from helper.xen_orchestra_helper.xen_orchestra_factory import XenOrchestraObjectFactory
 from constants.doc_templates import VM_TEMPLATE, HOST_TEMPLATE
+from util.deadline_util.deadline import remaining_time
 
 class AddHostTask(Task):
 
+    @uses_resource("sdk_kv")
     def add_host_on_testdb(self, task_result: TaskResult, params: dict) -> None:
         if "label" not in params:
             self.set_subtask_exception(ValueError(f"label key is missing for the host {params}"))
@@ -79,6 +82,7 @@ class AddHostTask(Task):
         task_result.result_json = {}
         task_result.result_json["host_doc"] = host_doc
 
+    @uses_resource("sdk_kv")
     def add_vms_on_testdb(self, task_result: TaskResult, params: dict) -> None:
         required_fields = ["label", "group", "vms_data"]
         for key in required_fields:
@@ -101,6 +105,7 @@ class AddHostTask(Task):
 
         task_result.result_json = {}
 
+        vm_docs = []
         for vm in vms_data:
             vm_doc = copy.deepcopy(VM_TEMPLATE)
 
@@ -139,17 +144,23 @@ class AddHostTask(Task):
             vm_doc["group"] = group
             vm_doc["host"] = host
             vm_doc["tags"] = {"list" : [], "details" : {}}
-            task_result.result_json[vm_doc["name_label"]] = {}
-            try:
-                res = host_pool_helper.update_vm(doc=vm_doc)
-                if not res:
-                    exception = f"Cannot add vm {vm_doc['name_label']} to host pool"
-                    self.set_subtask_exception(exception)
-                self.logger.info(f"Document for vm {vm_doc['name_label']} added to host pool successfuly")
-            except Exception as e:
-                exception = f"Cannot add vm {vm_doc['name_label']} to host pool : {e}"
-                self.set_subtask_exception(exception)
+            vm_docs.append(vm_doc)
+
+        try:
+            results, errors = host_pool_helper.update_vms(docs=vm_docs)
+        except Exception as e:
+            exception = f"Cannot add vms of host {host} to host pool : {e}"
+            self.set_subtask_exception(exception)
+
+        if len(errors) > 0:
+            exception = f"Cannot add vms {sorted(errors)} to host pool : {errors}"
+            self.set_subtask_exception(exception)
 
+        for vm_doc in vm_docs:
+            if not results.get(vm_doc["name_label"]):
+                exception = f"Cannot add vm {vm_doc['name_label']} to host pool"
+                self.set_subtask_exception(exception)
+            task_result.result_json[vm_doc["name_label"]] = {}
             task_result.result_json[vm_doc["name_label"]]["vm_doc"] = vm_doc
 
     def _remove_host_from_xen_orchestra(self, host):
@@ -174,6 +185,7 @@ class AddHostTask(Task):
             exception = f"Cannot remove host {label} from XenOrchestra"
             self.set_subtask_exception(exception)
 
+    @uses_resource("xo")
     def add_hosts_sub_task(self, task_result: TaskResult, params: dict) -> None:
         if "host" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -231,7 +243,7 @@ class AddHostTask(Task):
             exception = f"Cannot add server to XenOrchestra : {e}"
             self.set_subtask_exception(exception)
 
-        time.sleep(10)
+        time.sleep(remaining_time(10))
 
         try:
             server_status = xen_orchestra_helper.get_server_status(label=label,
@@ -317,10 +329,9 @@ class AddHostTask(Task):
         for host in self.data:
             params = {"host" : host}
             subtask = self.add_hosts_sub_task
-            subtaskid = self.add_sub_task(subtask, params)
-            sub_tasks.append([host["label"], subtaskid])
-        for host, subtask_id in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            self.task_result.subtasks[host] = task_result
+            subtaskid = self.add_sub_task(subtask, params, result_path=[host["label"]])
+            sub_tasks.append(subtaskid)
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
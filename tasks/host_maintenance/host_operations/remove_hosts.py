@@ -1,10 +1,12 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
 
 class RemoveHostsTask(Task):
 
+    @uses_resource("sdk_kv")
     def remove_host_doc(self, task_result: TaskResult, params: dict) -> None:
         if "host" not in params:
             exception = ValueError(f"host field not present for host {params}")
@@ -37,6 +39,7 @@ class RemoveHostsTask(Task):
 
         task_result.result_json = str(True)
 
+    @uses_resource("sdk_query")
     def remove_vm_docs(self, task_result: TaskResult, params: dict) -> None:
         if "host" not in params:
             exception = ValueError(f"host field not present for host {params}")
@@ -69,19 +72,21 @@ class RemoveHostsTask(Task):
             vm_docs.append(row[host_sdk_helper.vm_collection_name])
 
         task_result.result_json = {}
-        for doc in vm_docs:
-            doc_key = doc["doc_key"]
-            try:
-                res = host_sdk_helper.remove_vm(doc_key)
-                if not res:
-                    exception = f"Cannot remove vm {doc_key} from host pool"
-                    task_result.result_json[doc_key] = exception
-                else:
-                    self.logger.info(f"Document for vm {doc_key} removed from host pool successfuly")
-                    task_result.result_json[doc_key] = str(True)
-            except Exception as e:
-                exception = f"Cannot remove vm {doc_key} from host pool : {e}"
+        doc_keys = [doc["doc_key"] for doc in vm_docs]
+        try:
+            results, errors = host_sdk_helper.remove_vms(doc_keys)
+        except Exception as e:
+            results, errors = {}, dict.fromkeys(doc_keys, e)
+
+        for doc_key in doc_keys:
+            if doc_key in errors:
+                exception = f"Cannot remove vm {doc_key} from host pool : {errors[doc_key]}"
+                task_result.result_json[doc_key] = exception
+            elif not results.get(doc_key):
+                exception = f"Cannot remove vm {doc_key} from host pool"
                 task_result.result_json[doc_key] = exception
+            else:
+                task_result.result_json[doc_key] = str(True)
 
     def remove_host_vm_docs(self, task_result: TaskResult, params: dict) -> None:
 
@@ -146,10 +151,9 @@ class RemoveHostsTask(Task):
         for host in self.data:
             params = {"host" : host}
             subtask = self.remove_host_vm_docs
-            subtaskid = self.add_sub_task(subtask, params)
-            sub_tasks.append([host["label"], subtaskid])
-        for host, subtask_id in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            self.task_result.subtasks[host] = task_result
+            subtaskid = self.add_sub_task(subtask, params, result_path=[host["label"]])
+            sub_tasks.append(subtaskid)
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
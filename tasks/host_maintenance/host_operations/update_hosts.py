@@ -1,11 +1,13 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from tasks.host_maintenance.host_operations.add_hosts import AddHostTask
 from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
 from constants.task_states import TaskStates
 
 class UpdateHostsTask(Task):
+    @uses_resource("sdk_query")
     def delete_host_vm_docs(self, task_result: TaskResult, params: dict) -> None:
         if self.add_host_task.task_result.state != TaskStates.COMPLETED:
             self.set_subtask_exception("Cannot delete host/vm docs before updation of docs")
@@ -55,7 +57,7 @@ class UpdateHostsTask(Task):
                     exception = f"Cannot remove vm {vm['name_label']} from host pool : {e}"
                     task_result.result_json[vm["name_label"]] = exception
 
-    def _fetch_host_doc(self, host_label):
+    def _fetch_host_docs(self, host_labels):
         try:
             host_sdk_helper = HostSDKHelper()
             self.logger.info(f"Connection to Host Pool successful")
@@ -64,12 +66,20 @@ class UpdateHostsTask(Task):
             self.set_exception(exception)
 
         try:
-            host_doc = eval(host_sdk_helper.fetch_host(host_label))
+            results, errors = host_sdk_helper.fetch_hosts(host_labels)
         except Exception as e:
-            exception = f"Cannot fetch host doc for {host_label} from host-pool : {e}"
+            exception = f"Cannot fetch host docs for {host_labels} from host-pool : {e}"
             self.set_exception(exception)
 
-        return host_doc
+        if len(errors) > 0:
+            exception = f"Cannot fetch host docs from host-pool : {errors}"
+            self.set_exception(exception)
+
+        host_docs = {}
+        for host_label in results:
+            host_docs[host_label] = eval(results[host_label])
+
+        return host_docs
 
     def __init__(self, params:dict, max_workers: Optional[int]=None):
         """
@@ -101,8 +111,9 @@ class UpdateHostsTask(Task):
 
         params = {}
         params["data"] = []
+        host_docs = self._fetch_host_docs([host["label"] for host in self.data])
         for host in self.data:
-            host_doc = self._fetch_host_doc(host["label"])
+            host_doc = host_docs[host["label"]]
             host_info = {
                 "username" : host_doc["xen_username"],
                 "password" : host_doc["xen_password"],
@@ -116,6 +127,7 @@ class UpdateHostsTask(Task):
     def execute(self):
         self.start_task()
 
+        self.add_host_task.set_result_sink(self.result_sink)
         self.add_host_task.execute()
         self.task_result.subtasks["update_host_data"] = self.add_host_task.task_result
 
@@ -123,17 +135,16 @@ class UpdateHostsTask(Task):
         for host in self.data:
             params = {"host" : host}
             subtask = self.delete_host_vm_docs
-            subtaskid = self.add_sub_task(subtask, params)
-            sub_tasks.append([host["label"], subtaskid])
-        for host, subtask_id in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            if "delete_vms_data" not in self.task_result.subtasks:
-                self.task_result.subtasks["delete_vms_data"] = {}
-            self.task_result.subtasks["delete_vms_data"][host] = task_result
+            subtaskid = self.add_sub_task(subtask, params, result_path=["delete_vms_data", host["label"]])
+            sub_tasks.append(subtaskid)
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
 
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return super().generate_json_result(timeout=timeout)
         TaskResult.generate_json_result(self.task_result)
         TaskResult.generate_json_result(self.add_host_task.task_result)
         
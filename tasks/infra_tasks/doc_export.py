@@ -0,0 +1,59 @@
+"""
+    Export stages of GetCSVTask and GetJSONTask, run in the worker processes of TaskProcessPool.
+    The module is imported by every worker, so it must stay cheap to import : pandas is imported on use.
+"""
+import json
+
+def convert_tags_details_to_fields(prefix, tags_details, result):
+    if prefix:
+        prefix = prefix + "-"
+    for tag in tags_details:
+        if isinstance(tags_details[tag], dict):
+            convert_tags_details_to_fields(tag, tags_details[tag], result)
+        else:
+            result[f'{prefix}{tag}'] = tags_details[tag]
+
+def convert_tags_to_fields(tags, result):
+    if "list" in tags:
+        result["tags_list"] = tags["list"]
+    if "details" in tags:
+        convert_tags_details_to_fields("", tags["details"], result)
+
+def convert_query_result_to_list(query_result, collection_name, flatten_tags=False):
+    results_list = []
+    for row in query_result:
+
+        doc = row[collection_name]
+        doc["doc_key"] = row["id"]
+
+        if flatten_tags and "tags" in doc:
+            tags_result = {}
+            convert_tags_to_fields(doc["tags"], tags_result)
+            for tag in tags_result:
+                doc[tag] = tags_result[tag]
+            doc.pop("tags", None)
+
+        results_list.append(doc)
+    return results_list
+
+def write_docs_csv(query_result, collection_name, path):
+    """
+        Writes the documents of the query result to the csv file path, one column per field and per tag.
+        Returns the number of documents written
+    """
+    import pandas as pd
+
+    docs = convert_query_result_to_list(query_result, collection_name, flatten_tags=True)
+    df = pd.DataFrame(docs)
+    df.to_csv(path, index=False)
+    return len(docs)
+
+def write_docs_json(query_result, collection_name, path):
+    """
+        Writes the documents of the query result to the json file path.
+        Returns the number of documents written
+    """
+    docs = convert_query_result_to_list(query_result, collection_name)
+    with open(path, 'w') as json_file:
+        json.dump(docs, json_file, indent=4)
+    return len(docs)
@@ -1,48 +1,32 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
 from helper.sdk_helper.testdb_helper.slave_pool_helper import SlavePoolSDKHelper
 from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
+from tasks.process_pool import TaskProcessPool
+from tasks.infra_tasks.doc_export import write_docs_csv
 
-import pandas as pd
 import os
 
 class GetCSVTask(Task):
 
-    def _convert_query_result_to_list(query_result, collection_name):
-        results_list = []
-        for row in query_result:
-
-            doc = row[collection_name]
-            doc["doc_key"] = row["id"]
-
-            if "tags" in doc:
-                tags =  doc["tags"]
-                tags_result = {}
-                GetCSVTask._convert_tags_to_fields(tags, tags_result)
-                for tag in tags_result:
-                    doc[tag] = tags_result[tag]
-                doc.pop("tags", None)
-
-            results_list.append(doc)
-        return results_list
-
-    def _convert_tags_details_to_fields(prefix, tags_details, result):
-        if prefix:
-            prefix = prefix + "-"
-        for tag in tags_details:
-            if isinstance(tags_details[tag], dict):
-                GetCSVTask._convert_tags_details_to_fields(tag, tags_details[tag], result)
-            else:
-                result[f'{prefix}{tag}'] = tags_details[tag]
-
-    def _convert_tags_to_fields(tags, result):
-        if "list" in tags:
-            result["tags_list"] = tags["list"]
-        if "details" in tags:
-            GetCSVTask._convert_tags_details_to_fields("", tags["details"], result)
-
+    def _write_csv_files(self, exports):
+        """
+            Writes the csv files of the exports, a list of [query result, collection name, path], in parallel
+            in the process pool
+        """
+        process_pool = TaskProcessPool()
+        # A query result streams its rows over the live SDK connection and cannot be pickled, so its rows are
+        # fetched here and only the rows are sent to the worker processes
+        futures = [process_pool.submit(write_docs_csv, list(query_result), collection_name, path)
+                   for query_result, collection_name, path in exports]
+        for future, (_, _, path) in zip(futures, exports):
+            num_docs = process_pool.result(future)
+            self.logger.info(f"Successfully wrote {num_docs} documents to {path}")
+
+    @uses_resource("sdk_query")
     def get_hosts_csv(self, task_result: TaskResult, params: dict) -> None:
         if "results_dir" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -67,8 +51,8 @@ class GetCSVTask(Task):
             exception = f"Cannot fetch all hosts from host-pool : {e}"
             self.set_subtask_exception(exception)
 
-        host_docs = GetCSVTask._convert_query_result_to_list(query_result, host_pool_helper.host_collection_name)
         path_to_hosts_csv = os.path.join(results_dir, "all_hosts.csv")
+        exports = [[query_result, host_pool_helper.host_collection_name, path_to_hosts_csv]]
 
         try:
             query_result = host_pool_helper.fetch_all_vms()
@@ -77,17 +61,13 @@ class GetCSVTask(Task):
             exception = f"Cannot fetch all vms from host-pool : {e}"
             self.set_subtask_exception(exception)
 
-        vm_docs = GetCSVTask._convert_query_result_to_list(query_result, host_pool_helper.vm_collection_name)
         path_to_vms_csv = os.path.join(results_dir, "all_vms.csv")
+        exports.append([query_result, host_pool_helper.vm_collection_name, path_to_vms_csv])
 
         try:
-            df = pd.DataFrame(host_docs)
-            df.to_csv(path_to_hosts_csv, index=False)
-
-            df = pd.DataFrame(vm_docs)
-            df.to_csv(path_to_vms_csv, index=False)
+            self._write_csv_files(exports)
             self.logger.info(f"Successfully created csv file with all documents from host pool")
-        except:
+        except Exception as e:
             exception = f"Cannot create csv file with all documents from host-pool : {e}"
             self.set_subtask_exception(exception)
 
@@ -96,6 +76,7 @@ class GetCSVTask(Task):
         task_result.result_json["hosts_csv"] = path_to_hosts_csv
         task_result.result_json["vms_csv"] = path_to_vms_csv
 
+    @uses_resource("sdk_query")
     def get_nodes_csv(self, task_result: TaskResult, params: dict) -> None:
         if "results_dir" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -120,14 +101,12 @@ class GetCSVTask(Task):
             exception = f"Cannot fetch docs from server-pool : {e}"
             self.set_subtask_exception(exception)
 
-        docs = GetCSVTask._convert_query_result_to_list(query_result, server_pool_helper.server_pool_collection)
         path_to_csv = os.path.join(results_dir, "all_nodes.csv")
 
         try:
-            df = pd.DataFrame(docs)
-            df.to_csv(path_to_csv, index=False)
+            self._write_csv_files([[query_result, server_pool_helper.server_pool_collection, path_to_csv]])
             self.logger.info(f"Successfully created csv file with all documents from server pool")
-        except:
+        except Exception as e:
             exception = f"Cannot create csv file with all documents from server-pool : {e}"
             self.set_subtask_exception(exception)
 
@@ -135,6 +114,7 @@ class GetCSVTask(Task):
         task_result.result_json["get_nodes_csv"] = True
         task_result.result_json["nodes_csv"] = path_to_csv
 
+    @uses_resource("sdk_query")
     def get_slaves_csv(self, task_result: TaskResult, params: dict) -> None:
         if "results_dir" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -159,8 +139,8 @@ class GetCSVTask(Task):
             exception = f"Cannot fetch docs from slave-pool : {e}"
             self.set_subtask_exception(exception)
 
-        slave_docs = GetCSVTask._convert_query_result_to_list(query_result, slave_pool_helper.slave_doc_collection_name)
         path_to_slaves_csv = os.path.join(results_dir, "all_slaves.csv")
+        exports = [[query_result, slave_pool_helper.slave_doc_collection_name, path_to_slaves_csv]]
 
         try:
             query_result = slave_pool_helper.fetch_all_jenkins_slaves()
@@ -169,17 +149,13 @@ class GetCSVTask(Task):
             exception = f"Cannot fetch docs from slave-pool : {e}"
             self.set_subtask_exception(exception)
 
-        jenkins_docs = GetCSVTask._convert_query_result_to_list(query_result, slave_pool_helper.jenkins_doc_collection_name)
         path_to_jenkins_csv = os.path.join(results_dir, "all_jenkins_slaves.csv")
+        exports.append([query_result, slave_pool_helper.jenkins_doc_collection_name, path_to_jenkins_csv])
 
         try:
-            df = pd.DataFrame(slave_docs)
-            df.to_csv(path_to_slaves_csv, index=False)
-
-            df = pd.DataFrame(jenkins_docs)
-            df.to_csv(path_to_jenkins_csv, index=False)
+            self._write_csv_files(exports)
             self.logger.info(f"Successfully created csv file with all documents from slave pool")
-        except:
+        except Exception as e:
             exception = f"Cannot create csv file with all documents from slave-pool : {e}"
             self.set_subtask_exception(exception)
 
@@ -261,11 +237,10 @@ class GetCSVTask(Task):
         sub_tasks = []
         for sub_task_function in self.sub_task_functions:
             params = {"results_dir" : self.results_dir}
-            subtaskid = self.add_sub_task(sub_task_function, params)
-            sub_tasks.append([subtaskid, sub_task_function])
+            subtaskid = self.add_sub_task(sub_task_function, params, result_path=[sub_task_function.__name__])
+            sub_tasks.append(subtaskid)
 
-        for subtask_id, sub_task_function in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            self.task_result.subtasks[sub_task_function.__name__] = task_result
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
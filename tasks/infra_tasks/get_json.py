@@ -1,25 +1,32 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
 from helper.sdk_helper.testdb_helper.slave_pool_helper import SlavePoolSDKHelper
 from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
+from tasks.process_pool import TaskProcessPool
+from tasks.infra_tasks.doc_export import write_docs_json
 
-import json
 import os
 
 class GetJSONTask(Task):
 
-    def _convert_query_result_to_list(query_result, collection_name):
-        results_list = []
-        for row in query_result:
-
-            doc = row[collection_name]
-            doc["doc_key"] = row["id"]
-
-            results_list.append(doc)
-        return results_list
-
+    def _write_json_files(self, exports):
+        """
+            Writes the json files of the exports, a list of [query result, collection name, path], in parallel
+            in the process pool
+        """
+        process_pool = TaskProcessPool()
+        # A query result streams its rows over the live SDK connection and cannot be pickled, so its rows are
+        # fetched here and only the rows are sent to the worker processes
+        futures = [process_pool.submit(write_docs_json, list(query_result), collection_name, path)
+                   for query_result, collection_name, path in exports]
+        for future, (_, _, path) in zip(futures, exports):
+            num_docs = process_pool.result(future)
+            self.logger.info(f"Successfully wrote {num_docs} documents to {path}")
+
+    @uses_resource("sdk_query")
     def get_hosts_json(self, task_result: TaskResult, params: dict) -> None:
         if "results_dir" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -44,8 +51,8 @@ class GetJSONTask(Task):
             exception = f"Cannot fetch all hosts from host-pool : {e}"
             self.set_subtask_exception(exception)
 
-        host_docs = GetJSONTask._convert_query_result_to_list(query_result, host_pool_helper.host_collection_name)
         path_to_hosts_json = os.path.join(results_dir, "all_hosts.json")
+        exports = [[query_result, host_pool_helper.host_collection_name, path_to_hosts_json]]
 
         try:
             query_result = host_pool_helper.fetch_all_vms()
@@ -54,18 +61,13 @@ class GetJSONTask(Task):
             exception = f"Cannot fetch all vms from host-pool : {e}"
             self.set_subtask_exception(exception)
 
-        vm_docs = GetJSONTask._convert_query_result_to_list(query_result, host_pool_helper.vm_collection_name)
         path_to_vms_json = os.path.join(results_dir, "all_vms.json")
+        exports.append([query_result, host_pool_helper.vm_collection_name, path_to_vms_json])
 
         try:
-            with open(path_to_hosts_json, 'w') as json_file:
-                json.dump(host_docs, json_file, indent=4) 
-            
-            with open(path_to_vms_json, 'w') as json_file:
-                json.dump(vm_docs, json_file, indent=4) 
-
+            self._write_json_files(exports)
             self.logger.info(f"Successfully created json file with all documents from host pool")
-        except:
+        except Exception as e:
             exception = f"Cannot create json file with all documents from host-pool : {e}"
             self.set_subtask_exception(exception)
 
@@ -74,6 +76,7 @@ class GetJSONTask(Task):
         task_result.result_json["hosts_json"] = path_to_hosts_json
         task_result.result_json["vms_json"] = path_to_vms_json
 
+    @uses_resource("sdk_query")
     def get_nodes_json(self, task_result: TaskResult, params: dict) -> None:
         if "results_dir" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -98,14 +101,12 @@ class GetJSONTask(Task):
             exception = f"Cannot fetch docs from server-pool : {e}"
             self.set_subtask_exception(exception)
 
-        docs = GetJSONTask._convert_query_result_to_list(query_result, server_pool_helper.server_pool_collection)
         path_to_json = os.path.join(results_dir, "all_nodes.json")
 
         try:
-            with open(path_to_json, 'w') as json_file:
-                json.dump(docs, json_file, indent=4)
+            self._write_json_files([[query_result, server_pool_helper.server_pool_collection, path_to_json]])
             self.logger.info(f"Successfully created json file with all documents from server pool")
-        except:
+        except Exception as e:
             exception = f"Cannot create json file with all documents from server-pool : {e}"
             self.set_subtask_exception(exception)
 
@@ -113,6 +114,7 @@ class GetJSONTask(Task):
         task_result.result_json["get_nodes_json"] = True
         task_result.result_json["nodes_json"] = path_to_json
 
+    @uses_resource("sdk_query")
     def get_slaves_json(self, task_result: TaskResult, params: dict) -> None:
         if "results_dir" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -137,8 +139,8 @@ class GetJSONTask(Task):
             exception = f"Cannot fetch docs from slave-pool : {e}"
             self.set_subtask_exception(exception)
 
-        slave_docs = GetJSONTask._convert_query_result_to_list(query_result, slave_pool_helper.slave_doc_collection_name)
         path_to_slaves_json = os.path.join(results_dir, "all_slaves.json")
+        exports = [[query_result, slave_pool_helper.slave_doc_collection_name, path_to_slaves_json]]
 
         try:
             query_result = slave_pool_helper.fetch_all_jenkins_slaves()
@@ -147,18 +149,13 @@ class GetJSONTask(Task):
             exception = f"Cannot fetch docs from slave-pool : {e}"
             self.set_subtask_exception(exception)
 
-        jenkins_docs = GetJSONTask._convert_query_result_to_list(query_result, slave_pool_helper.jenkins_doc_collection_name)
         path_to_jenkins_json = os.path.join(results_dir, "all_jenkins_slaves.json")
+        exports.append([query_result, slave_pool_helper.jenkins_doc_collection_name, path_to_jenkins_json])
 
         try:
-            with open(path_to_slaves_json, 'w') as json_file:
-                json.dump(slave_docs, json_file, indent=4)
-
-            with open(path_to_jenkins_json, 'w') as json_file:
-                json.dump(jenkins_docs, json_file, indent=4)
-
+            self._write_json_files(exports)
             self.logger.info(f"Successfully created json file with all documents from slave pool")
-        except:
+        except Exception as e:
             exception = f"Cannot create json file with all documents from slave-pool : {e}"
             self.set_subtask_exception(exception)
 
@@ -240,11 +237,10 @@ class GetJSONTask(Task):
         sub_tasks = []
         for sub_task_function in self.sub_task_functions:
             params = {"results_dir" : self.results_dir}
-            subtaskid = self.add_sub_task(sub_task_function, params)
-            sub_tasks.append([subtaskid, sub_task_function])
+            subtaskid = self.add_sub_task(sub_task_function, params, result_path=[sub_task_function.__name__])
+            sub_tasks.append(subtaskid)
 
-        for subtask_id, sub_task_function in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            self.task_result.subtasks[sub_task_function.__name__] = task_result
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
@@ -1,11 +1,16 @@
-import paramiko, paramiko.ssh_exception
 import socket
+import threading
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
 from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
+from helper.sdk_helper.tags_write_buffer import TagsWriteBuffer
 from util.ssh_util.node_infra_helper.remote_connection_factory import RemoteConnectionObjectFactory
 from constants.doc_templates import NODE_TEMPLATE
+from util.deadline_util.deadline import DeadlineExceeded, remaining_time
+from util.retry_util.retry_policy import RetryPolicy, RetryBudget
+from util.trace_util.tracer import Tracer
 
 
 # TODO tasks
@@ -16,6 +21,53 @@ from constants.doc_templates import NODE_TEMPLATE
 4. Checking status of reserved nodes
 '''
 
+def ssh_connection_error_name(exception):
+    import paramiko, paramiko.ssh_exception
+    # Ordered from the most specific error, the first match names the error
+    connection_errors = [
+        (paramiko.PasswordRequiredException, "paramiko.PasswordRequiredException"),
+        (paramiko.BadAuthenticationType, "paramiko.BadAuthenticationType"),
+        (paramiko.AuthenticationException, "paramiko.AuthenticationException"),
+        (paramiko.BadHostKeyException, "paramiko.BadHostKeyException"),
+        (paramiko.ChannelException, "paramiko.ChannelException"),
+        (paramiko.ProxyCommandFailure, "paramiko.ProxyCommandFailure"),
+        (paramiko.ConfigParseError, "paramiko.ConfigParseError"),
+        (paramiko.CouldNotCanonicalize, "paramiko.CouldNotCanonicalize"),
+        (paramiko.ssh_exception.NoValidConnectionsError, "paramiko.NoValidConnectionsError"),
+        (socket.timeout, "socket.timeout"),
+        (paramiko.SSHException, "paramiko.SSHException"),
+        (socket.error, "socket.error"),
+    ]
+    for error_class, error_name in connection_errors:
+        if isinstance(exception, error_class):
+            return error_name
+    return "generic.Exception"
+
+def is_retryable_ssh_error(exception):
+    """
+        Authentication, host key and configuration errors fail the same way on every attempt
+    """
+    return ssh_connection_error_name(exception) not in ("paramiko.PasswordRequiredException",
+                                                        "paramiko.BadAuthenticationType",
+                                                        "paramiko.AuthenticationException",
+                                                        "paramiko.BadHostKeyException",
+                                                        "paramiko.ConfigParseError",
+                                                        "paramiko.CouldNotCanonicalize")
+
+_ssh_retry_policies = {}
+_ssh_retry_policies_lock = threading.Lock()
+
+def ssh_retry_policy(ipaddr):
+    """
+        Returns the retry policy of the SSH connections to the node. Every node has a retry budget of its own,
+        so that dead nodes exhausting theirs do not take the retries of the other nodes away
+    """
+    with _ssh_retry_policies_lock:
+        if ipaddr not in _ssh_retry_policies:
+            _ssh_retry_policies[ipaddr] = RetryPolicy("ssh", max_attempts=5, base_delay=1, max_delay=15,
+                                                      classifier=is_retryable_ssh_error, budget=RetryBudget())
+        return _ssh_retry_policies[ipaddr]
+
 class NodeHealthMonitorTask(Task):
 
     def _initialize_tags(self, doc: dict):
@@ -27,28 +79,33 @@ class NodeHealthMonitorTask(Task):
             doc["tags"]["details"] = {}
 
     def _flush_tags_list(self, doc: dict, tags: list):
+        # In place, checks running concurrently on the doc append their own tags to the same list
         for tag in tags:
-            if tag in doc["tags"]["list"]:
-                doc["tags"]["list"] = list(filter(lambda x: x !=tag, doc["tags"]["list"]))
+            while tag in doc["tags"]["list"]:
+                doc["tags"]["list"].remove(tag)
+
+    def _tags_details(self, doc: dict, names: list):
+        return {name: doc["tags"]["details"][name] for name in names if name in doc["tags"]["details"]}
+
+    def _tags_changes(self, doc: dict, tags: list):
+        tags_added = [tag for tag in tags if tag in doc["tags"]["list"]]
+        tags_removed = [tag for tag in tags if tag not in doc["tags"]["list"]]
+        return tags_added, tags_removed
 
+    @uses_resource("ssh")
     def check_connectivity_sub_task(self, task_result, params):
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
         node_doc = params["node"]
         ipaddr = node_doc["ipaddr"]
-        try:
-            server_pool_helper = ServerPoolSDKHelper()
-            self.logger.info(f"Connection to Server Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Server Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         self._initialize_tags(node_doc)
         tags = ["unreachable"]
         self._flush_tags_list(node_doc, tags)
 
         try:
-            RemoteConnectionObjectFactory.fetch_helper(ipaddr,"root","couchbase")
+            with Tracer().span("RemoteConnectionObjectFactory.fetch_helper", "ssh", host=ipaddr):
+                ssh_retry_policy(ipaddr).run(lambda: RemoteConnectionObjectFactory.fetch_helper(ipaddr,"root","couchbase"),
+                                             max_attempts=1)
             node_doc["tags"]["details"]["connection_check"] = True
             # node_doc["state"] = "available" \
             #     if node_doc["state"] == "unreachable"\
@@ -58,101 +115,51 @@ class NodeHealthMonitorTask(Task):
             node_doc["tags"]["list"].append("unreachable")
             # node_doc["state"] = "unreachable"
 
-        try:
-            res = server_pool_helper.upsert_node_to_server_pool(node_doc)
-            if not res:
-                exception = f"Cannot upsert node {ipaddr} with node-connectivity checks to server pool"
-                self.set_subtask_exception(exception)
-            self.logger.info(f"Document for node {ipaddr} with node-connectivity checks upserted to server pool successfuly")
-        except Exception as e:
-            exception = f"Cannot upsert node {ipaddr} with node-connectivity checks to server pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(node_doc, tags)
+        self.tags_buffer.add(node_doc["doc_key"],
+                             self._tags_details(node_doc, ["connection_check"]),
+                             tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["connection_check"] = node_doc["tags"]["details"]["connection_check"]
 
+    @uses_resource("ssh")
     def check_connectivity2_sub_task(self, task_result, params):
+        # paramiko is only imported by the tasks which connect to nodes with it
+        import paramiko
+
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
         node_doc = params["node"]
 
         ipaddr = node_doc["ipaddr"]
 
-        try:
-            server_pool_helper = ServerPoolSDKHelper()
-            self.logger.info(f"Connection to Server Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Server Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
-        retries = 5
-        connection = False
-        connection_errors = set()
-        for retry in range(retries):
-            self.logger.info(f'Checking ssh connectivity for node {ipaddr} retry {retry + 1} / {retries}')
-            try:
+        def _connect():
+            with Tracer().span("SSHClient.connect", "ssh", host=ipaddr):
                 ssh.connect(ipaddr,
                             username="root",
-                            password="couchbase")
+                            password="couchbase",
+                            timeout=remaining_time(),
+                            banner_timeout=remaining_time(),
+                            auth_timeout=remaining_time())
                 ssh.close()
-                connection = True
-                connection_errors.add(None)
-                break
-            except paramiko.PasswordRequiredException as e:
-                connection = False
-                connection_errors.add("paramiko.PasswordRequiredException")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.BadAuthenticationType as e:
-                connection = False
-                connection_errors.add("paramiko.BadAuthenticationType")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.AuthenticationException as e:
-                connection = False
-                connection_errors.add("paramiko.AuthenticationException")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.BadHostKeyException as e:
-                connection = False
-                connection_errors.add("paramiko.BadHostKeyException")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.ChannelException as e:
-                connection = False
-                connection_errors.add("paramiko.ChannelException")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.ProxyCommandFailure as e:
-                connection = False
-                connection_errors.add("paramiko.ProxyCommandFailure")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.ConfigParseError as e:
-                connection = False
-                connection_errors.add("paramiko.ConfigParseError")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.CouldNotCanonicalize as e:
-                connection = False
-                connection_errors.add("paramiko.CouldNotCanonicalize")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.ssh_exception.NoValidConnectionsError as e:
-                connection = False
-                connection_errors.add("paramiko.NoValidConnectionsError")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except socket.timeout as e:
-                connection = False
-                connection_errors.add("socket.timeout")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except paramiko.SSHException as e:
-                connection = False
-                connection_errors.add("paramiko.SSHException")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except socket.error as e:
-                connection = False
-                connection_errors.add("socket.error")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
-            except Exception as e:
-                connection = False
-                connection_errors.add("generic.Exception")
-                self.logger.error(f'Unable to connect to {ipaddr} : {e}')
+
+        connection_errors = set()
+        def _add_connection_error(exception, attempt):
+            self.logger.error(f'Unable to connect to {ipaddr} on attempt {attempt} : {exception}')
+            connection_errors.add(ssh_connection_error_name(exception))
+
+        try:
+            ssh_retry_policy(ipaddr).run(_connect, on_error=_add_connection_error)
+            connection = True
+            connection_errors.add(None)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            connection = False
 
         self._initialize_tags(node_doc)
         tags = ["unreachable"]
@@ -166,23 +173,17 @@ class NodeHealthMonitorTask(Task):
         if len(connection_errors) > 1:
             node_doc["tags"]["details"]["connection_check_err"] = ' '.join(str(item) for item in connection_errors)
 
-        try:
-            res = server_pool_helper.upsert_node_to_server_pool(node_doc)
-            if not res:
-                exception = f"Cannot upsert node {ipaddr} with node-connectivity-2 checks to server pool"
-                self.set_subtask_exception(exception)
-
-            self.logger.info(f"Document for node {ipaddr} with node-connectivity-2 checks upserted to server pool successfuly")
-
-        except Exception as e:
-            exception = f"Cannot upsert node {ipaddr} with node-connectivity-2 checks to server pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(node_doc, tags)
+        self.tags_buffer.add(node_doc["doc_key"],
+                             self._tags_details(node_doc, ["connection_check", "connection_check_err"]),
+                             tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["connection_check"] = node_doc["tags"]["details"]["connection_check"]
         if "connection_check_err" in node_doc["tags"]["details"]:
             task_result.result_json["connection_check_err"] = node_doc["tags"]["details"]["connection_check_err"]
 
+    @uses_resource("sdk_kv")
     def field_consistency_sub_task(self, task_result, params):
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -190,13 +191,6 @@ class NodeHealthMonitorTask(Task):
 
         ipaddr = node_doc["ipaddr"]
 
-        try:
-            server_pool_helper = ServerPoolSDKHelper()
-            self.logger.info(f"Connection to Server Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Server Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         self._initialize_tags(node_doc)
         tags = ["no_fields_consistency"]
         self._flush_tags_list(node_doc, tags)
@@ -229,22 +223,15 @@ class NodeHealthMonitorTask(Task):
             if len(fields_extra) > 0:
                 node_doc["tags"]["details"]["field_consistency"]["fields_extra"] = fields_extra
 
-        try:
-            res = server_pool_helper.upsert_node_to_server_pool(node_doc)
-            if not res:
-                exception = f"Cannot upsert node {ipaddr} with field_consistency checks to server pool"
-                self.set_subtask_exception(exception)
-
-            self.logger.info(f"Document for node {ipaddr} with field_consistency checks upserted to server pool successfuly")
-
-        except Exception as e:
-            exception = f"Cannot upsert node {ipaddr} with field_consistency checks to server pool : {e}"
-            self.set_subtask_exception(exception)
-
+        tags_added, tags_removed = self._tags_changes(node_doc, tags)
+        self.tags_buffer.add(node_doc["doc_key"],
+                             self._tags_details(node_doc, ["field_consistency"]),
+                             tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["field_consistency"] = node_doc["tags"]["details"]["field_consistency"]
 
+    @uses_resource("ssh")
     def node_stats_match_sub_task(self, task_result, params):
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -260,13 +247,6 @@ class NodeHealthMonitorTask(Task):
             exception = f"The node is unreachable, cannot perform os version checks for {ipaddr}"
             self.set_subtask_exception(exception)
 
-        try:
-            server_pool_helper = ServerPoolSDKHelper()
-            self.logger.info(f"Connection to Server Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Server Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         self._initialize_tags(node_doc)
         tags = ["mac_address_node_mismatch", "memory_node_mismatch", "os_node_mismatch"]
         self._flush_tags_list(node_doc, tags)
@@ -328,23 +308,17 @@ class NodeHealthMonitorTask(Task):
             }
             node_doc["tags"]["list"].append("os_node_mismatch")
 
-        try:
-            res = server_pool_helper.upsert_node_to_server_pool(node_doc)
-            if not res:
-                exception = f"Cannot upsert node {ipaddr} with node-stats-consistency checks to server pool"
-                self.set_subtask_exception(exception)
-
-            self.logger.info(f"Document for node {ipaddr} with node-stats-consistency checks upserted to server pool successfuly")
-
-        except Exception as e:
-            exception = f"Cannot upsert node {ipaddr} with node-stats-consistency checks to server pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(node_doc, tags)
+        self.tags_buffer.add(node_doc["doc_key"],
+                             self._tags_details(node_doc, ["mac_address_node_check", "memory_node_check", "os_node_check"]),
+                             tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["mac_address_node_match"] = node_doc["tags"]["details"]["mac_address_node_check"]
         task_result.result_json["memory_node_match"] = node_doc["tags"]["details"]["memory_node_check"]
         task_result.result_json["os_node_match"] = node_doc["tags"]["details"]["os_node_check"]
 
+    @uses_resource("sdk_query")
     def host_pool_check_sub_task(self, task_result, params):
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -359,13 +333,6 @@ class NodeHealthMonitorTask(Task):
             exception = f"Cannot connect to Host Pool using SDK : {e}"
             self.set_subtask_exception(exception)
 
-        try:
-            server_pool_helper = ServerPoolSDKHelper()
-            self.logger.info(f"Connection to Server Pool successful")
-        except Exception as e:
-            exception = f"Cannot connect to Server Pool using SDK : {e}"
-            self.set_subtask_exception(exception)
-
         self._initialize_tags(node_doc)
         tags = ["ip_not_in_host_pool", "origin_host_pool_mismatch", "vm_name_host_pool_mismatch", "os_host_pool_mismatch"]
         self._flush_tags_list(node_doc, tags)
@@ -424,17 +391,10 @@ class NodeHealthMonitorTask(Task):
                     "os_version_host_pool" : vm["os_version"]
                 }
 
-        try:
-            res = server_pool_helper.upsert_node_to_server_pool(node_doc)
-            if not res:
-                exception = f"Cannot upsert node {ipaddr} with host-pool-consistency checks to server pool"
-                self.set_subtask_exception(exception)
-
-            self.logger.info(f"Document for node {ipaddr} with host-pool-consistency checks upserted to server pool successfuly")
-
-        except Exception as e:
-            exception = f"Cannot upsert node {ipaddr} with host-pool-consistency checks to server pool : {e}"
-            self.set_subtask_exception(exception)
+        tags_added, tags_removed = self._tags_changes(node_doc, tags)
+        self.tags_buffer.add(node_doc["doc_key"],
+                             self._tags_details(node_doc, ["ip_in_host_pool", "origin_host_pool", "vm_name_host_pool", "os_version_host_pool"]),
+                             tags_added, tags_removed)
 
         task_result.result_json = {}
         task_result.result_json["ip_in_host_pool"] = node_doc["tags"]["details"]["ip_in_host_pool"]
@@ -443,6 +403,9 @@ class NodeHealthMonitorTask(Task):
             task_result.result_json["vm_name_host_pool"] = node_doc["tags"]["details"]["vm_name_host_pool"]
             task_result.result_json["os_version_host_pool"] = node_doc["tags"]["details"]["os_version_host_pool"]
 
+    def tags_done_sub_task(self, task_result: TaskResult, params: dict) -> None:
+        self.tags_buffer.done(params["node"]["doc_key"])
+
     def __init__(self, params, max_workers=None):
         """
             Initialize a NodeHealthMonitorTask with the given params.
@@ -516,27 +479,61 @@ class NodeHealthMonitorTask(Task):
             row[server_pool_helper.server_pool_collection]["doc_key"] = row["id"]
             docs.append(row["_default"])
 
-        for sub_task_name in self.sub_task_names:
-            sub_tasks = []
+        # The checks of a node share the node doc and run concurrently, except that the two connectivity checks both
+        # set the unreachable tag and details.connection_check, so check_connectivity2_sub_task runs after
+        # check_connectivity_sub_task and its outcome wins, and the node stats check, which opens its own SSH session
+        # to the node, waits for the connectivity checks of the node. The outcomes of the checks are buffered and the
+        # node doc is written once all its checks are done, in batches with the other node docs, instead of once per
+        # check
+        self.tags_buffer = TagsWriteBuffer(server_pool_helper.update_nodes_tags)
+        self.write_buffers.append(self.tags_buffer)
+        connectivity_sub_task_names = ["check_connectivity_sub_task", "check_connectivity2_sub_task"]
+        sub_tasks = []
+        tags_done_subtask_ids = []
+        try:
             for doc in docs:
+                self._initialize_tags(doc)
                 params = {"node" : doc}
-                sub_task = getattr(self, sub_task_name)
-                subtaskid = self.add_sub_task(sub_task, params)
-                sub_tasks.append([doc["doc_key"], subtaskid])
-            for doc_key, subtask_id in sub_tasks:
-                task_result = self.get_sub_task_result(subtask_id=subtask_id)
-                if doc_key not in self.task_result.subtasks:
-                    self.task_result.subtasks[doc_key] = {}
-                self.task_result.subtasks[doc_key][sub_task_name] = task_result
+                connectivity_subtask_ids = []
+                node_subtask_ids = []
+                sub_task_names = [name for name in connectivity_sub_task_names if name in self.sub_task_names] + \
+                                 [name for name in self.sub_task_names if name not in connectivity_sub_task_names]
+                for sub_task_name in sub_task_names:
+                    sub_task_function = getattr(self, sub_task_name)
+                    depends_on = None
+                    if sub_task_name == "node_stats_match_sub_task":
+                        depends_on = connectivity_subtask_ids
+                    elif sub_task_name in connectivity_sub_task_names:
+                        depends_on = connectivity_subtask_ids[-1:]
+                    subtask_id = self.add_sub_task(sub_task_function, params,
+                                                   depends_on=depends_on,
+                                                   checkpoint_key=f"{doc['doc_key']}::{sub_task_name}",
+                                                   result_path=[doc["doc_key"], sub_task_name])
+                    if sub_task_name in connectivity_sub_task_names:
+                        connectivity_subtask_ids.append(subtask_id)
+                    node_subtask_ids.append(subtask_id)
+                    sub_tasks.append(subtask_id)
+                tags_done_subtask_ids.append(self.add_sub_task(self.tags_done_sub_task, params,
+                                                               depends_on=node_subtask_ids))
+
+            for subtask_id in sub_tasks:
+                self.get_sub_task_result(subtask_id=subtask_id)
+            for subtask_id in tags_done_subtask_ids:
+                self.get_sub_task_result(subtask_id=subtask_id)
+        finally:
+            self.flush_write_buffers()
 
         self.complete_task(result=True)
 
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return super().generate_json_result(timeout=timeout)
         TaskResult.generate_json_result(self.task_result)
         for doc_key in self.task_result.result_json:
            for sub_task_name in self.task_result.result_json[doc_key]:
                res = TaskResult.generate_json_result(self.task_result.subtasks[doc_key][sub_task_name])
                self.task_result.result_json[doc_key][sub_task_name] = res
+        self.add_write_results(self.task_result.result_json)
 
         if self.store_results:
             self.add_task_result_to_db()
@@ -1,6 +1,7 @@
 import copy
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
 from util.ssh_util.node_infra_helper.remote_connection_factory import RemoteConnectionObjectFactory
@@ -8,6 +9,7 @@ from constants.doc_templates import NODE_TEMPLATE
 
 class AddNodesTask(Task):
 
+    @uses_resource("ssh")
     def add_nodes_sub_task(self, task_result: TaskResult, params: dict) -> None:
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -132,11 +134,8 @@ class AddNodesTask(Task):
         for node in self.data:
             params = {"node" : node}
             subtask = self.add_nodes_sub_task
-            subtaskid = self.add_sub_task(subtask, params)
-            sub_tasks.append([node["ipaddr"], subtaskid])
-        for doc_key, subtask_id in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            if doc_key not in self.task_result.subtasks:
-                self.task_result.subtasks[doc_key] = {}
-            self.task_result.subtasks[doc_key] = task_result
+            subtaskid = self.add_sub_task(subtask, params, checkpoint_key=node["ipaddr"], result_path=[node["ipaddr"]])
+            sub_tasks.append(subtaskid)
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
         self.complete_task(result=True)
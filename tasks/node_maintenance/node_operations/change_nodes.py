@@ -1,11 +1,13 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from tasks.node_maintenance.node_operations.add_nodes import AddNodesTask
 from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
 
 class ChangeNodesTask(Task):
 
+    @uses_resource("sdk_kv")
     def change_nodes_sub_task(self, task_result: TaskResult, params: dict) -> None:
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -71,6 +73,8 @@ class ChangeNodesTask(Task):
         self.add_nodes_task = AddNodesTask(params)
 
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return super().generate_json_result(timeout=timeout)
         self.task_result.result_json = []
         for node in self.data:
             res = {}
@@ -88,12 +92,12 @@ class ChangeNodesTask(Task):
         for node in self.data:
             params = {"node" : node}
             subtask = self.change_nodes_sub_task
-            subtaskid = self.add_sub_task(subtask, params)
-            sub_tasks.append([node["old_ipaddr"], subtaskid])
-        for old_ipaddr, subtask_id in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            self.task_result.subtasks[old_ipaddr] = task_result
+            subtaskid = self.add_sub_task(subtask, params, result_path=[node["old_ipaddr"]])
+            sub_tasks.append(subtaskid)
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
+        self.add_nodes_task.set_result_sink(self.result_sink)
         self.add_nodes_task.execute()
 
         self.complete_task(result=True)
@@ -1,5 +1,6 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
 from helper.jenkins_helper.jenkins_helper_factory import JenkinsHelperFactory
@@ -7,6 +8,7 @@ from constants.jenkins import JENKINS_URLS
 
 class RemoveNodesTask(Task):
 
+    @uses_resource("sdk_kv")
     def remove_node_from_server_pool(self, task_result: TaskResult, params: dict) -> None:
         if "node" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -71,11 +73,8 @@ class RemoveNodesTask(Task):
         for node in self.data:
             params = {"node" : node}
             subtask = self.remove_node_from_server_pool
-            subtaskid = self.add_sub_task(subtask, params)
-            sub_tasks.append([node["ipaddr"], subtaskid])
-        for doc_key, subtask_id in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            if doc_key not in self.task_result.subtasks:
-                self.task_result.subtasks[doc_key] = {}
-            self.task_result.subtasks[doc_key] = task_result
+            subtaskid = self.add_sub_task(subtask, params, result_path=[node["ipaddr"]])
+            sub_tasks.append(subtaskid)
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
         self.complete_task(result=True)
@@ -0,0 +1,83 @@
+import os
+import logging
+import threading
+import concurrent.futures
+from tasks.task_scheduler import TaskScheduler
+from util.deadline_util.deadline import DeadlineExceeded, remaining_time
+
+class TaskProcessPool:
+    """
+        Process wide pool of worker processes for the pure CPU stages of tasks, e.g. flattening and writing out
+        exported documents, so that they use other cores instead of competing for the GIL with the I/O threads.
+        The number of processes is TASK_PROCESS_POOL_WORKERS (default : number of CPUs), with 0 the stages run
+        inline on the calling thread. The processes are started on first use by a forkserver, never forked from
+        this multithreaded process.
+        Stages are module level functions of modules which are cheap to import. Their arguments and results are
+        pickled, so a stage should take its documents once and write its output itself instead of returning it.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(TaskProcessPool, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("tasks")
+                    self.max_workers = int(os.environ.get("TASK_PROCESS_POOL_WORKERS", os.cpu_count() or 1))
+                    self._executor = None
+                    self._executor_lock = threading.Lock()
+                    self._initialized.set()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                import multiprocessing
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers,
+                                                                        mp_context=multiprocessing.get_context(start_method))
+                self.logger.info(f"Process pool with {self.max_workers} {start_method} workers started")
+            return self._executor
+
+    def submit(self, fn, *args):
+        """
+            Submits fn(*args) to a worker process and returns its future
+        """
+        if self.max_workers == 0:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._get_executor().submit(fn, *args)
+
+    def result(self, future):
+        """
+            Waits for the future of a submitted stage, bounded by the deadline of the current context, and
+            returns its result
+        """
+        if not TaskScheduler().wait(future, timeout=remaining_time()):
+            future.cancel()
+            raise DeadlineExceeded("Deadline exceeded while waiting for the process pool")
+        return future.result()
+
+    def run(self, fn, *args):
+        """
+            Runs fn(*args) in a worker process and returns its result
+        """
+        return self.result(self.submit(fn, *args))
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,136 @@
+import logging
+import threading
+import collections
+import concurrent.futures
+from tasks.task_scheduler import copy_future_outcome
+from tasks.task_registry import TaskRegistry
+
+RESOURCE_LIMITS_KEY = "resource_limits"
+
+def uses_resource(resource_class):
+    """
+        Declares the resource class a subtask function uses.
+        Args:
+        resource_class (str or callable, required) : The resource class, e.g. ssh, sdk_kv, sdk_query, xo or jenkins:<url>.
+            A callable is called with the params of the subtask and has to return the resource class
+    """
+    def decorator(function):
+        function.resource_class = resource_class
+        return function
+    return decorator
+
+def jenkins_resource_class(params):
+    """
+        Resource class of a subtask talking to the Jenkins master of a slave : jenkins:<jenkins_host>, with the
+        jenkins_host of the params or of the slave in the params. The subtasks of slaves whose master is not known
+        share the jenkins class.
+    """
+    jenkins_host = params.get("jenkins_host")
+    if jenkins_host is None and isinstance(params.get("slave"), dict):
+        jenkins_host = params["slave"].get("jenkins_host")
+    return f"jenkins:{jenkins_host}" if jenkins_host else "jenkins"
+
+def get_resource_class(subtask, params, resource_class=None):
+    if resource_class is None:
+        resource_class = getattr(subtask, "resource_class", None)
+    if callable(resource_class):
+        resource_class = resource_class(params)
+    return resource_class
+
+class ResourceLimiter:
+    """
+        Process wide concurrency limits per resource class, read from the resource_limits section of tasks.yml.
+        A limit declared for a class name also applies separately to each of its qualified classes,
+        e.g. the jenkins limit applies to every jenkins:<url>, unless jenkins:<url> has a limit of its own.
+        Subtasks of a class without a limit are not limited.
+        Subtasks waiting for a slot are queued without holding a scheduler worker.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ResourceLimiter, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("tasks")
+                    self.limits = self._load_limits()
+                    self._in_use = collections.defaultdict(int)
+                    self._pending = collections.defaultdict(collections.deque)
+                    self._limiter_lock = threading.Lock()
+                    self._initialized.set()
+
+    def _load_limits(self):
+        limits = TaskRegistry().tasks_data.get(RESOURCE_LIMITS_KEY) or {}
+        for resource_class, limit in limits.items():
+            if not isinstance(limit, int) or limit < 1:
+                raise ValueError(f"Limit for resource class {resource_class} has to be a positive integer : {limit}")
+        self.logger.info(f"Resource limits loaded : {limits}")
+        return limits
+
+    def get_limit(self, resource_class):
+        if resource_class is None:
+            return None
+        if resource_class in self.limits:
+            return self.limits[resource_class]
+        return self.limits.get(resource_class.split(":", 1)[0])
+
+    def submit(self, resource_class, submit):
+        """
+            Calls submit, which has to return a future, as soon as the resource class has a free slot.
+            Returns a future with the outcome of the submitted work.
+        """
+        limit = self.get_limit(resource_class)
+        if limit is None:
+            return submit()
+
+        with self._limiter_lock:
+            if self._in_use[resource_class] >= limit:
+                future_instance = concurrent.futures.Future()
+                self._pending[resource_class].append((submit, future_instance))
+                return future_instance
+            self._in_use[resource_class] += 1
+        return self._start(resource_class, submit)
+
+    def _start(self, resource_class, submit, future_instance=None):
+        try:
+            submitted_future = submit()
+        except Exception as e:
+            self._release(resource_class)
+            if future_instance is None:
+                raise e
+            future_instance.set_exception(e)
+            return future_instance
+
+        submitted_future.add_done_callback(lambda _: self._release(resource_class))
+        if future_instance is None:
+            return submitted_future
+        submitted_future.add_done_callback(lambda done_future: copy_future_outcome(done_future, future_instance))
+        return future_instance
+
+    def _release(self, resource_class):
+        with self._limiter_lock:
+            if len(self._pending[resource_class]) == 0:
+                self._in_use[resource_class] -= 1
+                return
+            submit, future_instance = self._pending[resource_class].popleft()
+        self._start(resource_class, submit, future_instance)
+
+    def stats(self):
+        with self._limiter_lock:
+            stats = {}
+            for resource_class in set(self._in_use) | set(self._pending):
+                stats[resource_class] = {
+                    "limit" : self.get_limit(resource_class),
+                    "in_use" : self._in_use[resource_class],
+                    "pending" : len(self._pending[resource_class])
+                }
+            return stats
@@ -0,0 +1,45 @@
+import json
+import threading
+from tasks.task_result import TaskResult
+
+class JSONLResultSink:
+    """
+        Appends the result of every sub task to a JSON lines file as soon as it completes, instead of keeping it
+        in the result tree of the task until the task completes. Partial results can be followed with tail -f.
+        Each line is a record with the fields task, path, result and result_json, where path is the list of keys
+        under which the result would have been placed in the result tree of the task.
+    """
+    def __init__(self, file_path) -> None:
+        self.file_path = file_path
+        self.results = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._file = open(file_path, "a")
+
+    def write(self, task, path, task_result: TaskResult):
+        record = {
+            "task" : f"{task.task_name}_{task.id}",
+            "path" : list(path),
+            "result" : task_result.result,
+            "result_json" : TaskResult.generate_json_result(task_result)
+        }
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.results += 1
+            if not task_result.result:
+                self.failed += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                "results_file" : self.file_path,
+                "results" : self.results,
+                "failed" : self.failed
+            }
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
@@ -3,6 +3,7 @@ from typing import Optional
 from constants.doc_templates import SLAVE_TEMPLATE
 from constants.jenkins import JENKINS_URLS
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource, jenkins_resource_class
 from tasks.task_result import TaskResult
 from helper.jenkins_helper.jenkins_helper_factory import JenkinsHelperFactory
 from helper.sdk_helper.testdb_helper.slave_pool_helper import SlavePoolSDKHelper
@@ -10,6 +11,7 @@ from util.ssh_util.node_infra_helper.remote_connection_factory import RemoteConn
 
 class AddSlavesTask(Task):
 
+    @uses_resource("ssh")
     def initialize_slave_subtask(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -45,6 +47,7 @@ class AddSlavesTask(Task):
         task_result.result_json = {}
         task_result.result_json["init_slave_res"] = result_init_slave
 
+    @uses_resource(jenkins_resource_class)
     def add_slave_to_jenkins(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -86,6 +89,7 @@ class AddSlavesTask(Task):
         task_result.result_json = {}
         task_result.result_json["add_to_jenkins"] = str(response)
 
+    @uses_resource("ssh")
     def add_slave_to_slave_pool(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -237,21 +241,15 @@ class AddSlavesTask(Task):
     def execute(self):
         self.start_task()
 
-        for sub_task_function in self.sub_task_functions:
-            sub_tasks = []
-            for slave in self.data:
-                params = {"slave" : slave}
-                subtaskid = self.add_sub_task(sub_task_function, params)
-                sub_tasks.append([slave["name"], subtaskid])
-            for doc_key, subtask_id in sub_tasks:
-                task_result = self.get_sub_task_result(subtask_id=subtask_id)
-                if doc_key not in self.task_result.subtasks:
-                    self.task_result.subtasks[doc_key] = {}
-                self.task_result.subtasks[doc_key][sub_task_function.__name__] = task_result
+        sub_tasks = self.add_sub_task_chains(self.sub_task_functions, self.data, params_key="slave", doc_key="name")
+        for doc_key, sub_task_function, subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
 
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return super().generate_json_result(timeout=timeout)
         TaskResult.generate_json_result(self.task_result, timeout=timeout)
         for doc_key in self.task_result.result_json:
            for sub_task_name in self.task_result.result_json[doc_key]:
@@ -1,6 +1,7 @@
 from typing import Optional
 from constants.jenkins import JENKINS_URLS
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource, jenkins_resource_class
 from tasks.task_result import TaskResult
 from tasks.slave_maintenance.slave_operations.remove_slave import RemoveSlavesTask
 from tasks.slave_maintenance.slave_operations.add_slave import AddSlavesTask
@@ -9,6 +10,7 @@ from helper.jenkins_helper.jenkins_helper_factory import JenkinsHelperFactory
 
 class ChangeSlavesTask(Task):
 
+    @uses_resource("sdk_kv")
     def change_slave_properties_in_slave_pool(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -34,13 +36,6 @@ class ChangeSlavesTask(Task):
             exception = f"Cannot connect to Slave Pool using SDK : {e}"
             self.set_subtask_exception(exception)
 
-        try:
-            slave_doc = eval(slave_pool_helper.get_slave_pool_doc(name))
-            self.logger.info(f"Doc with slave name {name} successfully found in slave-pool")
-        except Exception as e:
-            exception = f"Cannot find slave name {name} doc in slave-pool : {e}"
-            self.set_subtask_exception(exception)
-
         if "usage_mode" in slave:
             usage_modes_allowed = ['EXCLUSIVE', 'NORMAL']
             if slave["usage_mode"] not in usage_modes_allowed:
@@ -55,15 +50,15 @@ class ChangeSlavesTask(Task):
                 if " " in label:
                     raise ValueError(f"label {label} consists of a space, not valid")
 
-        for field in changeable_fields:
-            if field in slave:
-                slave_doc[field] = slave[field] if field in slave else slave_doc[field]
+        def _change_fields(slave_doc):
+            for field in changeable_fields:
+                if field in slave:
+                    slave_doc[field] = slave[field]
 
+        # The doc is replaced only if no other writer changed it since it was read, otherwise it is read again and
+        # the fields changed on the new doc, so concurrent changes to the other fields of the slave are not lost
         try:
-            res = slave_pool_helper.upsert_slave_to_slave_pool(slave_doc)
-            if not res:
-                exception = f"Cannot update slave {slave['name']} doc in slave pool"
-                self.set_subtask_exception(exception)
+            slave_doc = slave_pool_helper.update_slave_pool_doc(name, _change_fields)
             self.logger.info(f"Document for slave {slave['name']} updated in slave pool successfuly")
         except Exception as e:
             exception = f"Cannot update slave {slave['name']} doc in slave pool : {e}"
@@ -72,6 +67,7 @@ class ChangeSlavesTask(Task):
         task_result.result_json = {}
         task_result.result_json["new_doc"] = slave_doc
 
+    @uses_resource(jenkins_resource_class)
     def change_slave_properties_in_jenkins(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -205,15 +201,21 @@ class ChangeSlavesTask(Task):
     def execute(self):
         self.start_task()
 
+        jenkins_hosts = {}
+        if self.change_in_jenkins:
+            jenkins_hosts = SlavePoolSDKHelper.fetch_jenkins_hosts([slave["name"] for slave in self.data])
+
         sub_tasks = []
         for slave in self.data:
-            params = {"slave" : slave}
+            params = {"slave" : slave, "jenkins_host" : jenkins_hosts.get(slave["name"])}
             if slave["old_ipaddr"] == slave["new_ipaddr"]:
-                subtaskid = self.add_sub_task(self.change_slave_properties_in_slave_pool, params)
-                sub_tasks.append([slave["name"], subtaskid, self.change_slave_properties_in_slave_pool.__name__])
+                subtaskid = self.add_sub_task(self.change_slave_properties_in_slave_pool, params,
+                                              result_path=[slave["name"], self.change_slave_properties_in_slave_pool.__name__])
+                sub_tasks.append(subtaskid)
                 if self.change_in_jenkins:
-                    subtaskid = self.add_sub_task(self.change_slave_properties_in_jenkins, params)
-                    sub_tasks.append([slave["name"], subtaskid, self.change_slave_properties_in_jenkins.__name__])
+                    subtaskid = self.add_sub_task(self.change_slave_properties_in_jenkins, params,
+                                                  result_path=[slave["name"], self.change_slave_properties_in_jenkins.__name__])
+                    sub_tasks.append(subtaskid)
             else:
                 if "ssh_username" not in slave:
                     exception = ValueError(f"ssh_username missing from slave : {slave}")
@@ -268,15 +270,14 @@ class ChangeSlavesTask(Task):
                 }
                 self.add_slave_task_params["data"].append(slave_data)
 
-        for doc_key, subtask_id, sub_task_name in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            if doc_key not in self.task_result.subtasks:
-                self.task_result.subtasks[doc_key] = {}
-            self.task_result.subtasks[doc_key][sub_task_name] = task_result
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         if self.remove_slave_task_params is not None:
             self.remove_slave_task = RemoveSlavesTask(params=self.remove_slave_task_params)
             self.add_slave_task = AddSlavesTask(params=self.add_slave_task_params)
+            self.remove_slave_task.set_result_sink(self.result_sink)
+            self.add_slave_task.set_result_sink(self.result_sink)
 
             self.remove_slave_task.execute()
             self.add_slave_task.execute()
@@ -284,6 +285,8 @@ class ChangeSlavesTask(Task):
         self.complete_task(result=True)
 
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return super().generate_json_result(timeout=timeout)
         TaskResult.generate_json_result(self.task_result, timeout=timeout)
         for doc_key in self.task_result.result_json:
            for sub_task_name in self.task_result.result_json[doc_key]:
@@ -1,5 +1,6 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource, jenkins_resource_class
 from tasks.task_result import TaskResult
 from constants.jenkins import JENKINS_URLS
 from helper.sdk_helper.testdb_helper.slave_pool_helper import SlavePoolSDKHelper
@@ -7,6 +8,7 @@ from helper.jenkins_helper.jenkins_helper_factory import JenkinsHelperFactory
 
 class ReconnectSlavesTask(Task):
 
+    @uses_resource(jenkins_resource_class)
     def reconnect_slave(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -93,14 +95,15 @@ class ReconnectSlavesTask(Task):
     def execute(self):
         self.start_task()
 
+        jenkins_hosts = SlavePoolSDKHelper.fetch_jenkins_hosts([slave["name"] for slave in self.data])
+
         sub_tasks = []
         for slave in self.data:
-            params = {"slave" : slave}
-            subtaskid = self.add_sub_task(self.reconnect_slave, params)
-            sub_tasks.append([slave["name"], subtaskid])
-        for doc_key, subtask_id in sub_tasks:
-            task_result = self.get_sub_task_result(subtask_id=subtask_id)
-            self.task_result.subtasks[doc_key] = task_result
+            params = {"slave" : slave, "jenkins_host" : jenkins_hosts.get(slave["name"])}
+            subtaskid = self.add_sub_task(self.reconnect_slave, params, result_path=[slave["name"]])
+            sub_tasks.append(subtaskid)
+        for subtask_id in sub_tasks:
+            self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
 
@@ -1,5 +1,6 @@
 from typing import Optional
 from tasks.task import Task
+from tasks.resource_limiter import uses_resource, jenkins_resource_class
 from tasks.task_result import TaskResult
 from helper.sdk_helper.testdb_helper.slave_pool_helper import SlavePoolSDKHelper
 from helper.jenkins_helper.jenkins_helper_factory import JenkinsHelperFactory
@@ -7,6 +8,7 @@ from constants.jenkins import JENKINS_URLS
 
 class RemoveSlavesTask(Task):
 
+    @uses_resource(jenkins_resource_class)
     def remove_slave_from_jenkins(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -49,6 +51,7 @@ class RemoveSlavesTask(Task):
         task_result.result_json = {}
         task_result.result_json["remove_slave_from_jenkins"] = [str(res_jenkins_status), str(res_jenkins_response)]
 
+    @uses_resource("sdk_kv")
     def remove_slave_from_slave_pool(self, task_result: TaskResult, params: dict) -> None:
         if "slave" not in params:
             self.set_subtask_exception(ValueError("Invalid arguments passed"))
@@ -126,21 +129,25 @@ class RemoveSlavesTask(Task):
     def execute(self):
         self.start_task()
 
+        jenkins_hosts = {}
+        if self.delete_from_jenkins:
+            jenkins_hosts = SlavePoolSDKHelper.fetch_jenkins_hosts([slave["name"] for slave in self.data])
+
         for sub_task_function in self.sub_task_functions:
             sub_tasks = []
             for slave in self.data:
-                params = {"slave" : slave}
-                subtaskid = self.add_sub_task(sub_task_function, params)
-                sub_tasks.append([slave["name"], subtaskid])
-            for doc_key, subtask_id in sub_tasks:
-                task_result = self.get_sub_task_result(subtask_id=subtask_id)
-                if doc_key not in self.task_result.subtasks:
-                    self.task_result.subtasks[doc_key] = {}
-                self.task_result.subtasks[doc_key][sub_task_function.__name__] = task_result
+                params = {"slave" : slave, "jenkins_host" : jenkins_hosts.get(slave["name"])}
+                subtaskid = self.add_sub_task(sub_task_function, params,
+                                              result_path=[slave["name"], sub_task_function.__name__])
+                sub_tasks.append(subtaskid)
+            for subtask_id in sub_tasks:
+                self.get_sub_task_result(subtask_id=subtask_id)
 
         self.complete_task(result=True)
 
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return super().generate_json_result(timeout=timeout)
         TaskResult.generate_json_result(self.task_result, timeout=timeout)
         for doc_key in self.task_result.result_json:
            for sub_task_name in self.task_result.result_json[doc_key]:
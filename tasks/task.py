@@ -1,7 +1,19 @@
 import logging
-import concurrent
+import concurrent.futures
+import threading
+import itertools
+import time
 import uuid
 from tasks.task_result import TaskResult
+from tasks.task_scheduler import TaskScheduler, copy_future_outcome
+from tasks.resource_limiter import ResourceLimiter, get_resource_class
+from tasks.task_checkpoint import TaskCheckpoint
+from tasks.task_progress import TaskProgress
+from tasks.task_profiler import TaskProfiler
+from util.deadline_util.deadline import Deadline, DeadlineExceeded, get_deadline, set_deadline, reset_deadline, \
+    no_deadline
+from util.trace_util.tracer import Tracer, traced
+from util.secret_util.secret_params import redact_secrets
 from helper.sdk_helper.testdb_helper.task_pool_helper import TaskPoolSDKHelper
 class Task:
     def __init__(self, task_name, max_workers, store_results=False):
@@ -10,8 +22,20 @@ class Task:
         self.logger = logging.getLogger("tasks")
         self.task_result = TaskResult()
         self.subtasks = {}
+        self._sub_task_results = {}
+        self._subtask_counter = itertools.count()
         self.store_results = store_results
-        self.executor_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.max_workers = max_workers
+        self.scheduler = TaskScheduler()
+        self.scheduler.reserve(max_workers)
+        self.resource_limiter = ResourceLimiter()
+        self.checkpoint = None
+        self.write_buffers = []
+        self.result_sink = None
+        self.deadline = get_deadline()
+        self.progress = TaskProgress(task_name, self.id, max_workers)
+        self.tracer = Tracer()
+        self.profiler = TaskProfiler()
 
         try:
             self.task_pool_helper = TaskPoolSDKHelper()
@@ -26,10 +50,42 @@ class Task:
             except Exception as e:
                 exception = f"Cannot create task document and add to task pool using SDK : {e}"
                 raise Exception(exception)
+            # The buffered writes of the checkpointed subtasks are written before their checkpoint
+            self.checkpoint = TaskCheckpoint(self.id, self.task_pool_helper, before_write=self.flush_write_buffers)
+
+    def save_params(self, task_key, params):
+        """
+            Stores the tasks.yml key and the params the task was built with in the task document,
+            so that the task can be built again to resume it. Passwords and other secrets are not stored
+        """
+        if self.store_results:
+            try:
+                self.task_pool_helper.update_task_params(self.id, task_key, redact_secrets(params))
+            except Exception as e:
+                exception = f"Cannot add task params to task document using SDK : {e}"
+                raise Exception(exception)
+
+    def resume_from(self, task_id):
+        """
+            Skips the sub tasks, added with a checkpoint key, which were completed by the task with id task_id.
+            Their results are taken from the checkpoints of that task.
+        """
+        if self.checkpoint is None:
+            raise ValueError(f"Task {self.task_name} does not store results and cannot be resumed")
+        self.logger.info(f"Resuming task {self.task_name}_{self.id} from task {task_id}")
+        self.checkpoint.load(task_id)
+
+    def set_result_sink(self, result_sink):
+        """
+            Streams the results of the sub tasks to result_sink as they complete, instead of keeping them
+            in the result tree of the task. The json result of the task is then a summary of the streamed results.
+        """
+        self.result_sink = result_sink
 
     def start_task(self):
         self.logger.info(f"Starting task {self.task_name}_{self.id}")
         self.task_result.start_task()
+        self.progress.task_started()
         if self.store_results:
             try:
                 self.task_pool_helper.update_task_started(self.id, self.task_result.start_time)
@@ -39,12 +95,67 @@ class Task:
 
     def complete_task(self, result):
         self.task_result.complete_task(result)
-        if self.store_results:
+        self.progress.task_completed(result)
+        self.tracer.add_span(self.task_name, "task", self.task_result.start_time, self.task_result.end_time,
+                             {"task_id" : str(self.id), "result" : result})
+        self.flush_write_buffers()
+        self.logger.debug(f"Scheduler stats on completion of {self.task_name}_{self.id} : {self.scheduler.stats()}")
+        # The deadline of the task bounds its sub tasks, not the writes recording how it ended
+        with no_deadline():
+            if self.checkpoint is not None:
+                self.checkpoint.flush()
+            if self.store_results:
+                try:
+                    self.task_pool_helper.update_task_completed(self.id, self.task_result.end_time, result)
+                except Exception as e:
+                    exception = f"Cannot create task document and add to task pool using SDK : {e}"
+                    raise Exception(exception)
+
+    def flush_write_buffers(self):
+        """
+            Writes what is left in the write buffers of the task. Called before every checkpoint write and on
+            completion, whatever the result, and safe to call more than once
+        """
+        for write_buffer in self.write_buffers:
             try:
-                self.task_pool_helper.update_task_completed(self.id, self.task_result.end_time, result)
+                with no_deadline():
+                    errors = write_buffer.flush()
+                if len(errors) > 0:
+                    self.logger.error(f"Buffered writes of {len(errors)} documents failed in {self.task_name}_{self.id}")
+                self.logger.debug(f"Write buffer stats of {self.task_name}_{self.id} : {write_buffer.stats()}")
             except Exception as e:
-                exception = f"Cannot create task document and add to task pool using SDK : {e}"
-                raise Exception(exception)
+                self.logger.error(f"Cannot flush write buffer of {self.task_name}_{self.id} : {e}")
+
+    def write_stats(self):
+        """
+            Returns the stats of the write buffers of the task, summed over the buffers
+        """
+        stats = {}
+        for write_buffer in self.write_buffers:
+            for stat, value in write_buffer.stats().items():
+                stats[stat] = stats.get(stat, 0) + value
+        return stats
+
+    def write_errors(self):
+        """
+            Returns the errors of the documents whose buffered write failed, by key, over the write buffers of the task
+        """
+        errors = {}
+        for write_buffer in self.write_buffers:
+            errors.update(write_buffer.errors())
+        return errors
+
+    def add_write_results(self, result_json):
+        """
+            Adds the stats of the write buffers of the task to result_json, and the documents whose buffered write
+            failed with their error as write_errors, as their checks passed without the write being done
+        """
+        if len(self.write_buffers) == 0:
+            return
+        result_json["write_stats"] = self.write_stats()
+        write_errors = self.write_errors()
+        if len(write_errors) > 0:
+            result_json["write_errors"] = write_errors
 
     def set_exception(self, exception):
         self.task_result.set_exception(exception)
@@ -52,41 +163,259 @@ class Task:
         self.complete_task(result=False)
         raise self.task_result.exception
 
+    def cancel(self):
+        """
+            Cancels the task. Queued sub tasks are not started anymore and sub tasks still running are marked
+            as failed when their result is collected.
+        """
+        self.logger.warning(f"Cancelling task {self.task_name}_{self.id}")
+        if self.deadline is None:
+            self.deadline = Deadline()
+        self.deadline.cancel()
+
+    def _call_with_deadline(self, subtask, task_result, params, checkpoint_key=None):
+        """
+            Runs the subtask with the deadline of the task set in its context, unless the deadline has passed
+            while the subtask was queued. The result is checkpointed before the future of the subtask is done,
+            so that it is part of the flush done on completion of the task.
+        """
+        if self.deadline is not None:
+            try:
+                self.deadline.check()
+            except DeadlineExceeded:
+                self.progress.subtask_abandoned()
+                raise
+        start_time = self.progress.subtask_started()
+        body_start_time = time.time()
+        self.tracer.add_span(f"{subtask.__name__} queued", "queue", task_result.start_time, body_start_time)
+        # Set even without a deadline, the subtask may run inline on a thread waiting under the deadline of another task
+        token = set_deadline(self.deadline)
+        try:
+            if self.profiler.enabled:
+                result = self.profiler.run(subtask, task_result, params)
+            else:
+                result = subtask(task_result, params)
+        except Exception:
+            self.progress.subtask_finished(start_time, failed=True)
+            raise
+        finally:
+            reset_deadline(token)
+            self.tracer.add_span(subtask.__name__, "subtask", body_start_time, time.time(), {"task" : self.task_name})
+        self.progress.subtask_finished(start_time)
+        if checkpoint_key is not None and self.checkpoint is not None:
+            self._checkpoint_sub_task(checkpoint_key, task_result)
+        return result
+
     def set_subtask_exception(self, exception: str | Exception):
         if not isinstance(exception, Exception):
             exception = Exception(exception)
         self.logger.error(exception)
         raise exception
 
-    def add_sub_task(self, subtask, params):
+    @traced("task", "add_sub_task")
+    def add_sub_task(self, subtask, params, depends_on=None, resource_class=None, checkpoint_key=None,
+                     result_path=None):
+        """
+            Adds a sub task for execution and returns its subtask id
+            Args:
+            subtask (callable, required) : The function to be run, called with (task_result, params)
+            params (dict, required) : The params passed to the subtask
+            depends_on (list, optional) : List of subtask ids which have to finish before this subtask starts.
+                The subtask is run once all of them have finished, irrespective of their result
+            resource_class (str, optional) : The resource class whose concurrency limit applies to the subtask.
+                Defaults to the one declared on the subtask with uses_resource
+            checkpoint_key (str, optional) : Key identifying the subtask across runs of the task.
+                The result of the subtask is checkpointed on success and the subtask is skipped when resuming
+                a task in which it was completed
+            result_path (list, optional) : The nested keys under which the result of the subtask is added to the
+                result of the task. With a result sink the result is written as soon as the subtask completes,
+                otherwise it is added to the result tree when collected with get_sub_task_result
+        """
         self.logger.debug(f"Sub task {subtask.__name__} added for execution")
-        subtask_id = f'{subtask.__name__}_{uuid.uuid4()}'
+        subtask_id = f'{subtask.__name__}_{next(self._subtask_counter)}'
         task_result = TaskResult()
         task_result.start_task()
-        future_instance = self.executor_pool.submit(subtask, task_result, params)
-        self.subtasks[subtask_id] = (future_instance, task_result)
+
+        if checkpoint_key is not None and self.checkpoint is not None:
+            if self.checkpoint.is_completed(checkpoint_key):
+                self.logger.debug(f"Sub task {subtask.__name__} for {checkpoint_key} completed in a previous run, skipping")
+                task_result.result_json = self.checkpoint.completed[checkpoint_key]
+                future_instance = concurrent.futures.Future()
+                future_instance.set_result(None)
+                self._register_sub_task(subtask_id, future_instance, task_result, result_path)
+                self.progress.subtask_skipped()
+                return subtask_id
+
+        dependencies = []
+        if depends_on:
+            for dependency_id in depends_on:
+                if dependency_id not in self.subtasks:
+                    raise ValueError(f"Dependency {dependency_id} of {subtask_id} is not a pending sub task")
+                dependencies.append(self.subtasks[dependency_id][0])
+
+        resource_class = get_resource_class(subtask, params, resource_class)
+        self.progress.subtask_submitted()
+
+        def _submit():
+            return self.resource_limiter.submit(resource_class,
+                                                lambda: self.scheduler.submit(self._call_with_deadline, subtask, task_result, params,
+                                                                              checkpoint_key))
+
+        if len(dependencies) == 0:
+            future_instance = _submit()
+        else:
+            future_instance = concurrent.futures.Future()
+            self._submit_after(dependencies, future_instance, _submit)
+        self._register_sub_task(subtask_id, future_instance, task_result, result_path)
         return subtask_id
 
-    def get_sub_task_result(self, subtask_id):
-        try:
-            exception = self.subtasks[subtask_id][0].exception()
+    def _register_sub_task(self, subtask_id, future_instance, task_result, result_path):
+        self.subtasks[subtask_id] = (future_instance, task_result)
+        sub_task_result = (result_path, threading.Lock(), [False])
+        self._sub_task_results[subtask_id] = sub_task_result
+        if result_path is not None and self.result_sink is not None:
+            future_instance.add_done_callback(lambda _: self._finish_sub_task(subtask_id, future_instance, task_result,
+                                                                              sub_task_result))
+
+    def _finish_sub_task(self, subtask_id, future_instance, task_result, sub_task_result, exception=None):
+        """
+            Completes the result of the sub task and writes it to the result sink, once, whether called from the
+            completion callback of the sub task or from get_sub_task_result
+        """
+        result_path, lock, finished = sub_task_result
+        with lock:
+            if finished[0]:
+                return
+            finished[0] = True
+            if exception is None:
+                try:
+                    exception = future_instance.exception()
+                except concurrent.futures.CancelledError as e:
+                    exception = e
+                if exception:
+                    self.logger.critical(f"Exception in {subtask_id}: {exception}")
             if exception:
-                self.logger.critical(f"Exception in {subtask_id}: {exception}")
-                self.subtasks[subtask_id][1].set_exception(exception)
+                task_result.set_exception(exception)
             else:
-                result = self.subtasks[subtask_id][0].result()
-                self.subtasks[subtask_id][1].complete_task(result=True)
+                task_result.complete_task(result=True)
+            TaskResult.generate_json_result(task_result)
+            if result_path is not None and self.result_sink is not None:
+                self.result_sink.write(self, result_path, task_result)
+
+    def _checkpoint_sub_task(self, checkpoint_key, task_result):
+        result_json = task_result.result_json
+        if result_json is None:
+            result_json = {}
+            for sub_task in task_result.subtasks:
+                if isinstance(task_result.subtasks[sub_task], TaskResult):
+                    result_json[sub_task] = TaskResult.generate_json_result(task_result.subtasks[sub_task])
+                else:
+                    result_json[sub_task] = task_result.subtasks[sub_task]
+        self.checkpoint.record(checkpoint_key, result_json)
+
+    def _submit_after(self, dependencies, future_instance, submit):
+        """
+            Calls submit once all the dependencies are done and mirrors the outcome of the submitted future
+            into future_instance. No worker is held while the dependencies are pending.
+        """
+        pending = [len(dependencies)]
+        lock = threading.Lock()
+
+        def _on_dependency_done(_):
+            with lock:
+                pending[0] -= 1
+                if pending[0] > 0:
+                    return
+            try:
+                submitted_future = submit()
+            except Exception as e:
+                future_instance.set_exception(e)
+                return
+            submitted_future.add_done_callback(lambda done_future: copy_future_outcome(done_future, future_instance))
+
+        for dependency in dependencies:
+            dependency.add_done_callback(_on_dependency_done)
+
+    def add_sub_task_chains(self, sub_task_functions, docs, params_key, doc_key):
+        """
+            Adds the sub tasks for every document as an independent chain.
+            For each document the sub tasks run in the given order, each one starting as soon as the previous one
+            on the same document has finished, while documents make progress independently of each other.
+            Args:
+            sub_task_functions (list, required) : Ordered list of subtask functions to be run for every document
+            docs (list, required) : List of documents
+            params_key (str, required) : The key with which the document is passed in the params of the subtask
+            doc_key (str, required) : The field of the document used to identify it in the result and in the checkpoints.
+                The result of each sub task is added under [doc[doc_key], sub_task_function.__name__]
+            Returns a list of [doc_key, sub_task_function, subtask_id]
+        """
+        sub_tasks = []
+        for doc in docs:
+            params = {params_key : doc}
+            previous_subtask_id = None
+            for sub_task_function in sub_task_functions:
+                depends_on = [previous_subtask_id] if previous_subtask_id else None
+                subtask_id = self.add_sub_task(sub_task_function, params,
+                                               depends_on=depends_on,
+                                               checkpoint_key=f"{doc[doc_key]}::{sub_task_function.__name__}",
+                                               result_path=[doc[doc_key], sub_task_function.__name__])
+                sub_tasks.append([doc[doc_key], sub_task_function, subtask_id])
+                previous_subtask_id = subtask_id
+        return sub_tasks
+
+    def get_sub_task_result(self, subtask_id):
+        future_instance, task_result = self.subtasks[subtask_id]
+        exception = None
+        try:
+            timeout = self.deadline.remaining() if self.deadline is not None else None
+            if not self.scheduler.wait(future_instance, timeout=timeout):
+                raise DeadlineExceeded(f"{subtask_id} did not complete before the deadline of task {self.task_name}_{self.id}")
         except Exception as e:
             self.logger.warning(f"{subtask_id} has not run properly and has ended abruptly : {e}")
-            self.subtasks[subtask_id][1].set_exception(e)
+            exception = e
 
-        task_result = self.subtasks[subtask_id][1]
-        TaskResult.generate_json_result(task_result)
+        sub_task_result = self._sub_task_results.pop(subtask_id)
+        self._finish_sub_task(subtask_id, future_instance, task_result, sub_task_result, exception=exception)
+        result_path = sub_task_result[0]
+        if result_path is not None and self.result_sink is None:
+            self._add_to_result_tree(result_path, task_result)
         self.subtasks.pop(subtask_id, None)
         return task_result
 
+    def add_sub_task_result(self, path, task_result):
+        """
+            Adds the result of a sub task to the result tree of the task under the nested keys in path,
+            or writes it to the result sink when results are streamed
+        """
+        if self.result_sink is not None:
+            self.result_sink.write(self, path, task_result)
+            return
+        self._add_to_result_tree(path, task_result)
+
+    def _add_to_result_tree(self, path, task_result):
+        subtasks = self.task_result.subtasks
+        for key in path[:-1]:
+            if key not in subtasks:
+                subtasks[key] = {}
+            subtasks = subtasks[key]
+        subtasks[path[-1]] = task_result
+
     def generate_json_result(self, timeout=3600):
+        if self.result_sink is not None:
+            return self._generate_streamed_json_result(timeout=timeout)
         TaskResult.generate_json_result(self.task_result, timeout=timeout)
+        self.add_write_results(self.task_result.result_json)
+        if self.store_results:
+            self.add_task_result_to_db()
+        return self.task_result.result_json
+
+    def _generate_streamed_json_result(self, timeout=3600):
+        if not self.task_result.wait_for_completion(timeout=timeout):
+            return None
+        self.task_result.result_json = self.result_sink.summary()
+        if not self.task_result.result:
+            self.task_result.result_json["exception"] = str(self.task_result.exception)
+        self.add_write_results(self.task_result.result_json)
         if self.store_results:
             self.add_task_result_to_db()
         return self.task_result.result_json
@@ -96,7 +425,8 @@ class Task:
 
     def add_task_result_to_db(self):
         try:
-            self.task_pool_helper.add_results_to_task(self.id, self.task_result.result_json)
+            with no_deadline():
+                self.task_pool_helper.add_results_to_task(self.id, self.task_result.result_json)
         except Exception as e:
             exception = f"Cannot add task result to task pool : {e}"
             self.set_exception(exception)
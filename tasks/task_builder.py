@@ -1,6 +1,4 @@
-import os
-import yaml
-import importlib.util
+from tasks.task_registry import TaskRegistry
 
 class TaskBuilder:
     @staticmethod
@@ -11,31 +9,26 @@ class TaskBuilder:
             params (dict, required): The dictionary with the required fields for the task
             task_name (str, required) : The task name of the task to be fetched
         """
-        # Fetch tasks.yml
-        script_dir = os.path.dirname(os.path.realpath(__file__))
-        tasks_file_path = os.path.join(script_dir, "tasks.yml")
-        with open(tasks_file_path, 'r') as file:
-            tasks_data = yaml.safe_load(file)
-
-        if task_name not in tasks_data:
-            raise ValueError(f"Task {task_name} not found")
-
-        task = tasks_data[task_name]
-
-        if "class" not in task:
-            raise ValueError(f"Class for the task {task_name} not found")
-        class_name = task["class"]
-
-        if "path" not in task:
-            raise ValueError(f"Path for the task {task_name} not found")
-        path = os.path.join(script_dir, "..", task["path"])
+        class_object = TaskRegistry().get_task_class(task_name)
+        instance = class_object(params)
+        instance.save_params(task_name, params)
+        return instance
 
-        if not os.path.exists(path):
-            raise ValueError(f"Path for the task {task_name} not found : {path}")
+    @staticmethod
+    def resume_task(task_id):
+        """
+            Creates the task again from the params stored for the task with the given id and fetches it,
+            with the sub tasks completed by that task skipped. Secrets are not stored with the params, they are
+            taken from the environment, e.g. SSH_PASSWORD for ssh_password
+            Args:
+            task_id (str, required) : The id of the task to be resumed
+        """
+        from helper.sdk_helper.testdb_helper.task_pool_helper import TaskPoolSDKHelper
+        task_doc = TaskPoolSDKHelper().fetch_task_doc(task_id)
+        if not task_doc.get("task_key"):
+            raise ValueError(f"Params for the task {task_id} not found, it cannot be resumed")
 
-        spec = importlib.util.spec_from_file_location(class_name, path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        class_object = getattr(module, class_name)
-        instance = class_object(params)
+        from util.secret_util.secret_params import restore_secrets
+        instance = TaskBuilder.fetch_task(task_doc["task_key"], restore_secrets(task_doc["params"]))
+        instance.resume_from(task_id)
         return instance
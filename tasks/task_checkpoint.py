@@ -0,0 +1,83 @@
+import logging
+import threading
+
+class TaskCheckpoint:
+    """
+        Records the results of completed subtasks of a task in the task pool, so that a task which did not finish
+        can be resumed without running them again.
+        Results are buffered and written as append only checkpoint documents holding at most batch_size results,
+        with pending results written at the latest flush_interval seconds after they were recorded.
+        before_write is called before every checkpoint document is written, to write what the recorded subtasks
+        left in write buffers first : a subtask is only skipped on resume once its writes are done.
+    """
+    def __init__(self, task_id, task_pool_helper, batch_size=100, flush_interval=5, before_write=None) -> None:
+        self.task_id = task_id
+        self.task_pool_helper = task_pool_helper
+        self.before_write = before_write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger("tasks")
+        self.completed = {}
+        self._buffer = {}
+        self._seq = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self, task_id):
+        """
+            Loads the results of the subtasks completed by the task with id task_id and carries them over to the
+            checkpoints of this task, so that a resumed task can be resumed again.
+        """
+        try:
+            checkpoints = self.task_pool_helper.fetch_task_checkpoints(task_id)
+        except Exception as e:
+            exception = f"Cannot fetch checkpoints of task {task_id} from task pool : {e}"
+            raise Exception(exception)
+
+        for checkpoint in sorted(checkpoints, key=lambda checkpoint: checkpoint["seq"]):
+            self.completed.update(checkpoint["completed"])
+        self.logger.info(f"Loaded {len(self.completed)} completed sub tasks from checkpoints of task {task_id}")
+
+        for checkpoint_key, result_json in self.completed.items():
+            self.record(checkpoint_key, result_json)
+
+    def is_completed(self, checkpoint_key):
+        return checkpoint_key in self.completed
+
+    def record(self, checkpoint_key, result_json):
+        batch = None
+        with self._lock:
+            self._buffer[checkpoint_key] = result_json
+            if len(self._buffer) >= self.batch_size:
+                batch = self._take_batch()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._write(*batch)
+
+    def flush(self):
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._write(*batch)
+
+    def _take_batch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if len(self._buffer) == 0:
+            return None
+        batch = (self._seq, self._buffer)
+        self._seq += 1
+        self._buffer = {}
+        return batch
+
+    def _write(self, seq, completed):
+        if self.before_write is not None:
+            self.before_write()
+        try:
+            self.task_pool_helper.add_checkpoint_to_task(self.task_id, seq, completed)
+        except Exception as e:
+            self.logger.error(f"Cannot add checkpoint {seq} of task {self.task_id} to task pool : {e}")
@@ -1,40 +1,275 @@
-import concurrent.futures
+import os
+import json
+import time
+import queue
+import socket
 import logging
+import itertools
+import threading
+import socketserver
+import concurrent.futures
 from tasks.task import Task
+from tasks.task_builder import TaskBuilder
+from tasks.result_sink import JSONLResultSink
+from tasks.task_progress import TaskProgress
+from util.deadline_util.deadline import Deadline, set_deadline, reset_deadline
+from util.retry_util.retry_policy import RetryMetrics
+from util.rate_limit_util.rate_limiter import RateLimiter
+from util.sdk_util.cluster_registry import ClusterRegistry
+from constants.task_states import TaskStates
+
+DEFAULT_SOCKET_PATH = os.environ.get("TASK_MANAGER_SOCKET", "/tmp/qe_infra_task_manager.sock")
+DEFAULT_PRIORITY = 10
+# Seconds for which a finished task, with its result, is kept for clients which have not fetched its result yet
+DEFAULT_RETENTION = int(os.environ.get("TASK_MANAGER_RETENTION", 3600))
 
 class TaskManager:
-    def __init__(self, max_workers) -> None:
-        self.task_executor_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    """
+        Runs tasks concurrently under priorities inside one long running process.
+        Tasks with a lower priority value are started first. The helper singletons, and with them the SDK, REST
+        and SSH connections, are created once by warm_up and reused by every task run by the manager.
+        A task is forgotten once its result is fetched, or retention seconds after it finished.
+    """
+    def __init__(self, max_workers, retention=DEFAULT_RETENTION) -> None:
+        self.task_queue = queue.PriorityQueue()
         self.running_tasks = {}
+        self.retention = retention
+        self._finished_times = {}
         self.logger = logging.getLogger("task_manager")
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        for count in range(max_workers):
+            worker = threading.Thread(target=self._worker,
+                                      name=f"TaskManager_{count + 1}",
+                                      daemon=True)
+            worker.start()
+
+    def warm_up(self):
+        """
+            Creates the SDK, Jenkins and Xen Orchestra helper singletons concurrently so that their connections
+            are ready before the first task is submitted. The SDK helpers share one bootstrap of the testdb cluster
+            and open their buckets concurrently. Failures are logged and the helper is created again
+            on first use by a task.
+        """
+        from helper.sdk_helper.testdb_helper.host_pool_helper import HostSDKHelper
+        from helper.sdk_helper.testdb_helper.server_pool_helper import ServerPoolSDKHelper
+        from helper.sdk_helper.testdb_helper.slave_pool_helper import SlavePoolSDKHelper
+        from helper.sdk_helper.testdb_helper.task_pool_helper import TaskPoolSDKHelper
+        from helper.jenkins_helper.jenkins_helper_factory import JenkinsHelperFactory
+        from helper.xen_orchestra_helper.xen_orchestra_factory import XenOrchestraObjectFactory
+        import constants.jenkins as jenkins_constants
+
+        helpers = {
+            "host_pool" : HostSDKHelper,
+            "server_pool" : ServerPoolSDKHelper,
+            "slave_pool" : SlavePoolSDKHelper,
+            "task_pool" : TaskPoolSDKHelper,
+            "qa_jenkins" : lambda: JenkinsHelperFactory.fetch_helper(jenkins_constants.QA_JENKINS),
+            "qe_jenkins" : lambda: JenkinsHelperFactory.fetch_helper(jenkins_constants.QE_JENKINS),
+            "xen_orchestra" : XenOrchestraObjectFactory.fetch_helper
+        }
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(helpers)) as executor_pool:
+            futures = {name: executor_pool.submit(helper) for name, helper in helpers.items()}
+        for name, future in futures.items():
+            exception = future.exception()
+            if exception:
+                self.logger.error(f"Unable to warm up {name} helper : {exception}")
+            else:
+                self.logger.info(f"Helper {name} warmed up")
+
+    def _task_finished(self, task_id):
+        with self._lock:
+            if task_id in self.running_tasks:
+                self._finished_times[task_id] = time.monotonic()
+
+    def _evict_finished_tasks(self):
+        with self._lock:
+            expired_task_ids = [task_id for task_id, finished_time in self._finished_times.items()
+                                if time.monotonic() - finished_time > self.retention]
+            for task_id in expired_task_ids:
+                self._finished_times.pop(task_id)
+                self.running_tasks.pop(task_id, None)
+        for task_id in expired_task_ids:
+            self.logger.info(f"Task {task_id} finished more than {self.retention}s ago, evicted")
 
-    def add_task(self, task: Task):
-        future_instance = self.task_executor_pool.submit(task.execute)
-        self.running_tasks[task.id] = [future_instance, task]
+    def add_task(self, task: Task, priority=DEFAULT_PRIORITY):
+        self._evict_finished_tasks()
+        task_id = str(task.id)
+        future_instance = concurrent.futures.Future()
+        with self._lock:
+            self.running_tasks[task_id] = [future_instance, task]
+        future_instance.add_done_callback(lambda _: self._task_finished(task_id))
+        self.task_queue.put((priority, next(self._sequence), task, future_instance))
+        self.logger.info(f"Task {task.task_name}_{task.id} queued with priority {priority}")
+        return future_instance
 
-    def get_task_result(self, task_id: str = None, task: Task = None):
+    def submit_task(self, task_name, params, priority=DEFAULT_PRIORITY, results_file=None, deadline=None):
+        token = set_deadline(Deadline(deadline) if deadline is not None else None)
+        try:
+            task = TaskBuilder.fetch_task(task_name, params)
+        finally:
+            reset_deadline(token)
+        if results_file is not None:
+            task.set_result_sink(JSONLResultSink(results_file))
+        self.add_task(task, priority)
+        return str(task.id)
+
+    def _worker(self):
+        while True:
+            priority, _, task, future_instance = self.task_queue.get()
+            if not future_instance.set_running_or_notify_cancel():
+                continue
+            self.logger.info(f"Running task {task.task_name}_{task.id} with priority {priority}")
+            token = set_deadline(task.deadline)
+            try:
+                task.execute()
+                future_instance.set_result(task.generate_json_result())
+            except BaseException as e:
+                future_instance.set_exception(e)
+            finally:
+                reset_deadline(token)
+                if task.result_sink is not None:
+                    task.result_sink.close()
+
+    def get_task_status(self, task_id: str):
+        with self._lock:
+            if task_id not in self.running_tasks:
+                raise ValueError(f"Task {task_id} not found")
+            future_instance, task = self.running_tasks[task_id]
+        if future_instance.done():
+            return TaskStates.COMPLETED
+        if future_instance.running():
+            return TaskStates.RUNNING
+        return TaskStates.CREATED
+
+    def cancel_task(self, task_id: str):
+        with self._lock:
+            if task_id not in self.running_tasks:
+                raise ValueError(f"Task {task_id} not found")
+            future_instance, task = self.running_tasks[task_id]
+        if not future_instance.cancel():
+            task.cancel()
+
+    def get_task_result(self, task_id: str = None, task: Task = None, timeout=None):
         if task_id is None and task is None:
             raise ValueError("Both task and task_id are None, cannot fetch result")
         elif task is not None:
-            task_id = task.id
+            task_id = str(task.id)
+
+        with self._lock:
+            if task_id not in self.running_tasks:
+                raise ValueError(f"Task {task_id} not found")
+            future_instance, task = self.running_tasks[task_id]
 
         try:
-            exception = self.running_tasks[task_id][0].exception()
+            exception = future_instance.exception(timeout=timeout)
             if exception:
                 self.logger.critical(f"Exception in {task_id}: {exception}")
-                self.running_tasks[task_id][1].set_exception(exception)
+                task.task_result.set_exception(exception)
+                result_json = str(exception)
             else:
-                result = self.running_tasks[task_id][0].result()
-                self.running_tasks[task_id][1].complete_task(result=True)
+                result_json = future_instance.result()
+        except concurrent.futures.TimeoutError:
+            raise
         except Exception as e:
             self.logger.warning(f"{task_id} has not run properly and has ended abruptly : {e}")
-            self.subtasks[task_id][1].set_exception(e)
+            task.task_result.set_exception(e)
+            result_json = str(e)
+
+        with self._lock:
+            self.running_tasks.pop(task_id, None)
+            self._finished_times.pop(task_id, None)
+        return result_json
+
+    def handle_request(self, request: dict):
+        self._evict_finished_tasks()
+        action = request.get("action")
+        if action == "submit":
+            task_id = self.submit_task(request["task_name"],
+                                       request.get("params", {}),
+                                       request.get("priority", DEFAULT_PRIORITY),
+                                       request.get("results_file", None),
+                                       request.get("deadline", None))
+            return {"task_id" : task_id}
+        elif action == "cancel":
+            self.cancel_task(request["task_id"])
+            return {"task_id" : request["task_id"]}
+        elif action == "status":
+            return {"state" : self.get_task_status(request["task_id"])}
+        elif action == "result":
+            return {"result" : self.get_task_result(task_id=request["task_id"],
+                                                    timeout=request.get("timeout", None))}
+        elif action == "list":
+            with self._lock:
+                task_ids = list(self.running_tasks.keys())
+            return {"tasks" : {task_id: self.get_task_status(task_id) for task_id in task_ids}}
+        elif action == "progress":
+            progress = TaskProgress.get(request["task_id"])
+            if progress is None:
+                raise ValueError(f"Progress of task {request['task_id']} not found")
+            return {"progress" : progress.snapshot()}
+        elif action == "metrics":
+            return {"retries" : RetryMetrics().snapshot(), "rate_limits" : RateLimiter().stats(),
+                    "sdk_connections" : ClusterRegistry().stats()}
+        else:
+            raise ValueError(f"Invalid action {action}")
+
+    def serve(self, socket_path=DEFAULT_SOCKET_PATH):
+        """
+            Accepts requests on a local Unix socket until interrupted.
+            Each request and response is a single line of json.
+            Requests :
+                - {"action": "submit", "task_name": str, "params": dict, "priority": int, "results_file": str,
+                   "deadline": float} -> {"task_id": str}
+                - {"action": "cancel", "task_id": str} -> {"task_id": str}
+                - {"action": "status", "task_id": str} -> {"state": str}
+                - {"action": "result", "task_id": str, "timeout": float} -> {"result": ...}
+                - {"action": "list"} -> {"tasks": {task_id: state}}
+                - {"action": "progress", "task_id": str} -> {"progress": dict}
+                - {"action": "metrics"} -> {"retries": {policy_name: counters}, "rate_limits": {endpoint: stats},
+                   "sdk_connections": {"clusters": int, "buckets": int, "collections": int, "bootstraps": int}}
+        """
+        task_manager = self
 
-        task_result = self.running_tasks[task_id][1].task_result
-        self.running_tasks[task_id][1].generate_json_result()
-        self.running_tasks.pop(task_id, None)
-        return task_result
+        class _RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = task_manager.handle_request(json.loads(line))
+                        response["status"] = "ok"
+                    except Exception as e:
+                        task_manager.logger.error(f"Request {line} failed : {e}")
+                        response = {"status" : "error", "error" : str(e)}
+                    self.wfile.write((json.dumps(response) + "\n").encode())
+                    self.wfile.flush()
 
-        
+        if os.path.exists(socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Left behind by a task manager which did not shut down cleanly
+                    os.remove(socket_path)
+                else:
+                    raise Exception(f"A task manager is already serving on {socket_path}")
+        with socketserver.ThreadingUnixStreamServer(socket_path, _RequestHandler) as server:
+            server.daemon_threads = True
+            self.logger.info(f"Task manager listening on {socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                os.remove(socket_path)
 
-        
+    @staticmethod
+    def send_request(request: dict, socket_path=DEFAULT_SOCKET_PATH):
+        """
+            Sends a request to a task manager serving on socket_path and returns its response
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall((json.dumps(request) + "\n").encode())
+            with client.makefile("rb") as response_file:
+                response = json.loads(response_file.readline())
+        if response["status"] != "ok":
+            raise Exception(f"Request {request['action']} to task manager failed : {response['error']}")
+        return response
@@ -0,0 +1,145 @@
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import collections
+
+class TaskProfiler:
+    """
+        Process wide profiler of a run : cProfile data of the whole run and wall and CPU times of every sub task,
+        summarized per sub task function.
+        Before Python 3.12 cProfile only profiles the thread it is enabled in, so every thread running sub tasks
+        gets its own profile, merged with the one of the main thread on stop. From Python 3.12 one profile covers
+        all the threads.
+        The times of a sub task include the ones of the sub tasks it ran while waiting for its own sub tasks.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(TaskProfiler, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("tasks")
+                    self.enabled = False
+                    self.per_thread = sys.version_info < (3, 12)
+                    self._main_profile = None
+                    self._thread_profiles = []
+                    self._local = threading.local()
+                    self._timings = collections.defaultdict(list)
+                    self._profiler_lock = threading.Lock()
+                    self._initialized.set()
+
+    def start(self):
+        self._main_profile = cProfile.Profile()
+        self._main_profile.enable()
+        self.enabled = True
+
+    def _get_thread_profile(self):
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = cProfile.Profile()
+            self._local.profile = profile
+            self._local.depth = 0
+            with self._profiler_lock:
+                self._thread_profiles.append(profile)
+        return profile
+
+    def run(self, subtask, task_result, params):
+        """
+            Runs the subtask and records its wall and CPU times under its function name
+        """
+        profile = None
+        if self.per_thread and threading.current_thread() is not threading.main_thread():
+            profile = self._get_thread_profile()
+            # Sub tasks run while waiting for another one are already covered by its profile
+            if self._local.depth == 0:
+                profile.enable()
+            self._local.depth += 1
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            return subtask(task_result, params)
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.thread_time() - cpu_start
+            if profile is not None:
+                self._local.depth -= 1
+                if self._local.depth == 0:
+                    profile.disable()
+            with self._profiler_lock:
+                self._timings[subtask.__name__].append((wall_time, cpu_time))
+
+    @staticmethod
+    def _percentile(sorted_values, percentile):
+        index = max(0, int(round(percentile / 100 * len(sorted_values))) - 1)
+        return sorted_values[index]
+
+    def subtask_stats(self):
+        """
+            Returns {subtask function: count, total, p50, p95 and max of its wall and CPU times in seconds}
+        """
+        with self._profiler_lock:
+            timings = {name: list(values) for name, values in self._timings.items()}
+        stats = {}
+        for name, values in timings.items():
+            stats[name] = {"count" : len(values)}
+            for index, kind in enumerate(["wall", "cpu"]):
+                times = sorted(value[index] for value in values)
+                stats[name][kind] = {
+                    "total" : sum(times),
+                    "p50" : self._percentile(times, 50),
+                    "p95" : self._percentile(times, 95),
+                    "max" : times[-1]
+                }
+        return dict(sorted(stats.items(), key=lambda item: item[1]["wall"]["total"], reverse=True))
+
+    def stop(self):
+        """
+            Stops profiling and returns the merged pstats.Stats of the run
+        """
+        self.enabled = False
+        self._main_profile.disable()
+        stats = pstats.Stats(self._main_profile)
+        with self._profiler_lock:
+            thread_profiles = list(self._thread_profiles)
+        for profile in thread_profiles:
+            try:
+                stats.add(profile)
+            except TypeError:
+                # A profile of a thread which never ran a sub task has no data
+                continue
+        return stats
+
+    def write(self, pstats_file_path, report_file_path, subtask_stats_file_path, top=50):
+        """
+            Stops profiling and writes the raw cProfile data, a report of the top functions by cumulative time
+            and the per sub task statistics
+        """
+        stats = self.stop()
+        stats.dump_stats(pstats_file_path)
+
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+        with open(report_file_path, "w") as report_file:
+            report_file.write(report.getvalue())
+
+        with open(subtask_stats_file_path, "w") as subtask_stats_file:
+            json.dump(self.subtask_stats(), subtask_stats_file, indent=2)
+        self.logger.info(f"Profile of the run written to {pstats_file_path}, {report_file_path} and {subtask_stats_file_path}")
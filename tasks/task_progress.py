@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import logging
+import weakref
+import datetime
+import threading
+import collections
+
+class TaskProgress:
+    """
+        Live counters of the sub tasks of a task. The ETA is estimated from the durations of the recently finished
+        sub tasks, assuming the remaining ones run max_workers at a time.
+        The progress of every task of the process is registered, and reported by ProgressReporter, until the task is
+        garbage collected.
+    """
+
+    _tasks = weakref.WeakValueDictionary()
+    _tasks_lock = threading.Lock()
+
+    def __init__(self, task_name, task_id, max_workers, recent_durations=1000) -> None:
+        self.task_name = task_name
+        self.task_id = str(task_id)
+        self.max_workers = max_workers
+        self.state = "created"
+        self.submitted = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.start_time = None
+        self.end_time = None
+        self._durations = collections.deque(maxlen=recent_durations)
+        self._lock = threading.Lock()
+        with TaskProgress._tasks_lock:
+            TaskProgress._tasks[self.task_id] = self
+
+    def task_started(self):
+        with self._lock:
+            self.state = "running"
+            self.start_time = time.monotonic()
+
+    def task_completed(self, result):
+        with self._lock:
+            self.state = "completed" if result else "failed"
+            self.end_time = time.monotonic()
+
+    def subtask_submitted(self):
+        with self._lock:
+            self.submitted += 1
+
+    def subtask_skipped(self):
+        with self._lock:
+            self.submitted += 1
+            self.skipped += 1
+
+    def subtask_abandoned(self):
+        """
+            Counts a sub task which failed before it started running, like one whose deadline passed while queued
+        """
+        with self._lock:
+            self.failed += 1
+
+    def subtask_started(self):
+        """
+            Returns the start time to be passed to subtask_finished
+        """
+        with self._lock:
+            self.running += 1
+        return time.monotonic()
+
+    def subtask_finished(self, start_time, failed=False):
+        duration = time.monotonic() - start_time
+        with self._lock:
+            self.running -= 1
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self._durations.append(duration)
+
+    def snapshot(self):
+        with self._lock:
+            finished = self.completed + self.failed + self.skipped
+            remaining = self.submitted - finished
+            elapsed = None
+            throughput = None
+            if self.start_time is not None:
+                elapsed = (self.end_time or time.monotonic()) - self.start_time
+                throughput = (self.completed + self.failed) / elapsed if elapsed > 0 else None
+            average_duration = sum(self._durations) / len(self._durations) if self._durations else None
+            eta = None
+            if average_duration is not None and self.state == "running":
+                eta = remaining * average_duration / max(1, min(self.max_workers, remaining))
+            return {
+                "task_name" : self.task_name,
+                "state" : self.state,
+                "submitted" : self.submitted,
+                "pending" : remaining - self.running,
+                "running" : self.running,
+                "completed" : self.completed,
+                "failed" : self.failed,
+                "skipped" : self.skipped,
+                "elapsed_seconds" : elapsed,
+                "throughput_per_second" : throughput,
+                "average_subtask_seconds" : average_duration,
+                "eta_seconds" : eta
+            }
+
+    @classmethod
+    def get(cls, task_id):
+        with cls._tasks_lock:
+            return cls._tasks.get(str(task_id))
+
+    @classmethod
+    def snapshot_all(cls):
+        with cls._tasks_lock:
+            progresses = list(cls._tasks.values())
+        return {progress.task_id: progress.snapshot() for progress in progresses}
+
+class ProgressReporter:
+    """
+        Reports the progress of the tasks of the process, by rewriting file_path every interval seconds
+        and, when port is given, on GET requests to a local HTTP endpoint
+        Args:
+        file_path (str, optional) : Path of the progress file
+        port (int, optional) : Port of the HTTP endpoint, bound to localhost
+        interval (float, optional) : Seconds between two rewrites of the progress file
+    """
+    def __init__(self, file_path=None, port=None, interval=5) -> None:
+        self.file_path = file_path
+        self.port = port
+        self.interval = interval
+        self.logger = logging.getLogger("tasks")
+        self._stopped = threading.Event()
+        self._writer_thread = None
+        self._server = None
+
+    @staticmethod
+    def report():
+        return {
+            "updated_at" : datetime.datetime.now().isoformat(),
+            "tasks" : TaskProgress.snapshot_all()
+        }
+
+    def write(self):
+        temp_file_path = f"{self.file_path}.tmp"
+        try:
+            with open(temp_file_path, "w") as progress_file:
+                json.dump(self.report(), progress_file, indent=2)
+            os.replace(temp_file_path, self.file_path)
+        except Exception as e:
+            self.logger.error(f"Cannot write progress to {self.file_path} : {e}")
+
+    def _write_periodically(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def start(self):
+        if self.file_path is not None:
+            self._writer_thread = threading.Thread(target=self._write_periodically, name="ProgressReporter", daemon=True)
+            self._writer_thread.start()
+
+        if self.port is not None:
+            # http.server is only imported when the endpoint is enabled
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class _ProgressHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = json.dumps(ProgressReporter.report(), default=str).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _ProgressHandler)
+            threading.Thread(target=self._server.serve_forever, name="ProgressServer", daemon=True).start()
+            self.logger.info(f"Serving progress on http://127.0.0.1:{self.port}/")
+
+    def stop(self):
+        self._stopped.set()
+        if self._writer_thread is not None:
+            self._writer_thread.join()
+            self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
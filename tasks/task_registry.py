@@ -0,0 +1,69 @@
+import os
+import yaml
+import logging
+import importlib
+import threading
+
+class TaskRegistry:
+    """
+        Process wide registry of the tasks declared in tasks.yml.
+        tasks.yml is parsed once and the module of a task is imported on the first fetch of its class, as a regular
+        package module, so it is shared with every other import of it.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(TaskRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("tasks")
+                    self.script_dir = os.path.dirname(os.path.realpath(__file__))
+                    tasks_file_path = os.path.join(self.script_dir, "tasks.yml")
+                    with open(tasks_file_path, 'r') as file:
+                        self.tasks_data = yaml.safe_load(file)
+                    self._task_classes = {}
+                    self._registry_lock = threading.Lock()
+                    self._initialized.set()
+
+    def get_task(self, task_name):
+        """
+            Returns the definition of the task with the given name in tasks.yml
+        """
+        if task_name not in self.tasks_data:
+            raise ValueError(f"Task {task_name} not found")
+        task = self.tasks_data[task_name]
+        if not isinstance(task, dict) or "class" not in task:
+            raise ValueError(f"Class for the task {task_name} not found")
+        if "path" not in task:
+            raise ValueError(f"Path for the task {task_name} not found")
+        return task
+
+    def get_task_class(self, task_name):
+        """
+            Returns the class of the task with the given name, importing its module on first use
+        """
+        if task_name in self._task_classes:
+            return self._task_classes[task_name]
+
+        with self._registry_lock:
+            if task_name not in self._task_classes:
+                task = self.get_task(task_name)
+                path = os.path.join(self.script_dir, "..", task["path"])
+                if not os.path.exists(path):
+                    raise ValueError(f"Path for the task {task_name} not found : {path}")
+
+                module_name = os.path.splitext(os.path.normpath(task["path"]))[0].replace(os.sep, ".")
+                module = importlib.import_module(module_name)
+                self._task_classes[task_name] = getattr(module, task["class"])
+                self.logger.debug(f"Task {task_name} loaded from {module_name}")
+            return self._task_classes[task_name]
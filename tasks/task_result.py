@@ -1,15 +1,38 @@
 import time
+import threading
 from constants.task_states import TaskStates
 
 class TaskResult:
+    """
+        Result of a task or a subtask.
+        Large fan-outs create one TaskResult per subtask, so the instances are slotted, and the subtasks dict
+        and the completion event are only created once they are used.
+    """
+    __slots__ = ("exception", "start_time", "end_time", "result", "state", "result_json", "_subtasks", "_completed")
+
+    # Creating the completion event is serialized per instance with a lock out of a small set, so that waiters
+    # on different instances rarely share a lock
+    _completed_locks = tuple(threading.Lock() for _ in range(64))
+
     def __init__(self) -> None:
         self.exception = None
         self.start_time = None
         self.end_time = None
         self.result = False
         self.state = TaskStates.CREATED
-        self.subtasks = {}
         self.result_json = None
+        self._subtasks = None
+        self._completed = None
+
+    @property
+    def subtasks(self):
+        if self._subtasks is None:
+            self._subtasks = {}
+        return self._subtasks
+
+    @subtasks.setter
+    def subtasks(self, subtasks):
+        self._subtasks = subtasks
 
     def start_task(self):
         self.start_time = time.time()
@@ -25,27 +48,45 @@ class TaskResult:
         self.complete_task(result=False)
 
     def complete_task(self, result):
-        self.state = TaskStates.COMPLETED
         self.end_time = time.time()
         self.set_result(result=result)
+        # The state is set last, a waiter which sees it completed also sees the result
+        self.state = TaskStates.COMPLETED
+        # No lock : a waiter publishes its event before checking the state, so either the event is seen here
+        # or the waiter sees the state completed
+        completed = self._completed
+        if completed is not None:
+            completed.set()
+
+    def wait_for_completion(self, timeout=None):
+        """
+            Blocks until the task is marked completed or the timeout expires
+            Returns True if the task completed, False on timeout
+        """
+        if self.state == TaskStates.COMPLETED:
+            return True
+        with TaskResult._completed_locks[(id(self) >> 4) % len(TaskResult._completed_locks)]:
+            if self._completed is None:
+                self._completed = threading.Event()
+            completed = self._completed
+        if self.state == TaskStates.COMPLETED:
+            return True
+        return completed.wait(timeout=timeout)
 
     @staticmethod
     def generate_json_result(task_result, timeout=3600):
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if task_result.state != TaskStates.COMPLETED:
-                time.sleep(10)
-                continue
-            if task_result.result:
-                if task_result.result_json is not None:
-                    return task_result.result_json
-                task_result.result_json = {}
-                for sub_task in task_result.subtasks:
-                    if isinstance(task_result.subtasks[sub_task], TaskResult):
-                        task_result.result_json[sub_task] = TaskResult.generate_json_result(task_result.subtasks[sub_task])
-                    else:
-                        task_result.result_json[sub_task] = task_result.subtasks[sub_task]
+        if not task_result.wait_for_completion(timeout=timeout):
+            return None
+        if task_result.result:
+            if task_result.result_json is not None:
                 return task_result.result_json
-            elif task_result:
-                task_result.result_json = str(task_result.exception)
-                return task_result.result_json
\ No newline at end of file
+            task_result.result_json = {}
+            for sub_task in task_result._subtasks or ():
+                if isinstance(task_result.subtasks[sub_task], TaskResult):
+                    task_result.result_json[sub_task] = TaskResult.generate_json_result(task_result.subtasks[sub_task])
+                else:
+                    task_result.result_json[sub_task] = task_result.subtasks[sub_task]
+            return task_result.result_json
+        elif task_result:
+            task_result.result_json = str(task_result.exception)
+            return task_result.result_json
@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import threading
+import collections
+import concurrent.futures
+
+class _WorkItem:
+    def __init__(self, future, fn, args):
+        self.future = future
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.fn(*self.args)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+
+class TaskScheduler:
+    """
+        Process wide scheduler shared by all tasks and their nested subtasks.
+        The total number of threads is capped at TASK_SCHEDULER_MAX_WORKERS (default 2000).
+        A worker that waits for a subtask through wait() keeps running queued work until the subtask is done,
+        so nested submissions to the same scheduler never starve or deadlock it.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(TaskScheduler, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("tasks")
+                    self.max_workers_limit = int(os.environ.get("TASK_SCHEDULER_MAX_WORKERS", 2000))
+                    self.max_workers = 0
+                    self._condition = threading.Condition()
+                    self._work_queue = collections.deque()
+                    self._local = threading.local()
+                    self._num_workers = 0
+                    self._idle_workers = 0
+                    self._running = 0
+                    self._submitted = 0
+                    self._completed = 0
+                    self._run_while_waiting = 0
+                    self._max_queue_depth = 0
+                    self._initialized.set()
+
+    def reserve(self, max_workers):
+        """
+            Raises the number of threads the scheduler may start to max_workers,
+            bounded by TASK_SCHEDULER_MAX_WORKERS
+        """
+        with self._condition:
+            self.max_workers = min(self.max_workers_limit, max(self.max_workers, max_workers))
+
+    def submit(self, fn, *args):
+        future = concurrent.futures.Future()
+        work_item = _WorkItem(future, fn, args)
+        with self._condition:
+            self._work_queue.append(work_item)
+            self._submitted += 1
+            self._max_queue_depth = max(self._max_queue_depth, len(self._work_queue))
+            if self._idle_workers == 0 and self._num_workers < max(self.max_workers, 1):
+                self._start_worker()
+            self._condition.notify()
+        return future
+
+    def _start_worker(self):
+        self._num_workers += 1
+        worker = threading.Thread(target=self._worker,
+                                  name=f"TaskScheduler_{self._num_workers}",
+                                  daemon=True)
+        worker.start()
+
+    def _worker(self):
+        self._local.is_worker = True
+        while True:
+            with self._condition:
+                while len(self._work_queue) == 0:
+                    self._idle_workers += 1
+                    self._condition.wait()
+                    self._idle_workers -= 1
+                work_item = self._work_queue.popleft()
+                self._running += 1
+            self._run(work_item)
+
+    def _run(self, work_item):
+        try:
+            work_item.run()
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._completed += 1
+
+    def wait(self, future, timeout=None):
+        """
+            Waits for the future to be done. Returns True if it is done, False on timeout.
+            When called from a scheduler worker, queued work is run on the calling thread while waiting
+            instead of blocking the worker slot.
+        """
+        if not getattr(self._local, "is_worker", False):
+            concurrent.futures.wait([future], timeout=timeout)
+            return future.done()
+
+        end_time = None if timeout is None else time.monotonic() + timeout
+        future.add_done_callback(self._notify_all)
+        while not future.done():
+            with self._condition:
+                if future.done():
+                    break
+                if len(self._work_queue) == 0:
+                    remaining = None if end_time is None else end_time - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._condition.wait(timeout=remaining)
+                    continue
+                # Newest work first, it is the most likely to be what this thread is waiting on
+                work_item = self._work_queue.pop()
+                self._running += 1
+                self._run_while_waiting += 1
+            self._run(work_item)
+        return future.done()
+
+    def _notify_all(self, _):
+        with self._condition:
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "max_workers" : self.max_workers,
+                "max_workers_limit" : self.max_workers_limit,
+                "workers" : self._num_workers,
+                "idle_workers" : self._idle_workers,
+                "running" : self._running,
+                "queue_depth" : len(self._work_queue),
+                "max_queue_depth" : self._max_queue_depth,
+                "submitted" : self._submitted,
+                "completed" : self._completed,
+                "run_while_waiting" : self._run_while_waiting
+            }
+
+def copy_future_outcome(source, destination):
+    """
+        Mirrors the outcome of the done future source into the pending future destination
+    """
+    if source.cancelled():
+        destination.cancel()
+        return
+    exception = source.exception()
+    if exception:
+        destination.set_exception(exception)
+    else:
+        destination.set_result(source.result())
@@ -0,0 +1,52 @@
+import os
+import sys
+# Adding project path into the sys paths for scanning all the modules
+script_dir = os.path.dirname(os.path.realpath(__file__))
+project_path = os.path.join(script_dir, "..")
+if project_path not in sys.path:
+    sys.path.append(project_path)
+
+import threading
+import pytest
+from tasks.task_scheduler import TaskScheduler
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """
+        A TaskScheduler of its own for the test, capped at 2 threads, in place of the process wide one
+    """
+    monkeypatch.setenv("TASK_SCHEDULER_MAX_WORKERS", "2")
+    monkeypatch.setattr(TaskScheduler, "_instance", None)
+    monkeypatch.setattr(TaskScheduler, "_initialized", threading.Event())
+    scheduler = TaskScheduler()
+    scheduler.reserve(2)
+    return scheduler
+
+class FakeTaskPoolSDKHelper:
+    """
+        Task pool keeping the checkpoints written by tasks in memory, every other call succeeds without doing anything
+    """
+    def __init__(self) -> None:
+        self.checkpoints = {}
+        self.events = []
+
+    def add_checkpoint_to_task(self, task_id, seq, completed):
+        self.events.append(("checkpoint", sorted(completed)))
+        self.checkpoints.setdefault(task_id, []).append({"seq" : seq, "completed" : dict(completed)})
+        return True
+
+    def fetch_task_checkpoints(self, task_id):
+        return self.checkpoints.get(task_id, [])
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: True
+
+@pytest.fixture
+def task_pool(monkeypatch, scheduler):
+    """
+        The task pool of the tasks created in the test, shared by all of them
+    """
+    import tasks.task
+    task_pool = FakeTaskPoolSDKHelper()
+    monkeypatch.setattr(tasks.task, "TaskPoolSDKHelper", lambda: task_pool)
+    return task_pool
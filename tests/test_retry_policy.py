@@ -0,0 +1,63 @@
+import uuid
+import pytest
+from util.retry_util.retry_policy import RetryBudget, RetryMetrics, RetryPolicy
+
+class FailingCall:
+    def __init__(self, exception) -> None:
+        self.exception = exception
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        raise self.exception
+
+def new_policy(**kwargs):
+    return RetryPolicy(f"test_{uuid.uuid4()}", base_delay=0, **kwargs)
+
+def test_budget_withdraws_initial_tokens_then_deposits():
+    budget = RetryBudget(ratio=0.5, min_retries=2)
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+def test_budget_is_capped():
+    budget = RetryBudget(ratio=1, min_retries=1, max_tokens=2)
+    for _ in range(10):
+        budget.deposit()
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+def test_exhausted_budget_stops_retries():
+    policy = new_policy(max_attempts=5, budget=RetryBudget(ratio=0, min_retries=1))
+
+    call = FailingCall(ConnectionError("refused"))
+    with pytest.raises(ConnectionError):
+        policy.run(call)
+    assert call.calls == 2
+
+    call = FailingCall(ConnectionError("refused"))
+    with pytest.raises(ConnectionError):
+        policy.run(call)
+    assert call.calls == 1
+
+    counters = RetryMetrics().snapshot()[policy.name]
+    assert counters["calls"] == 2
+    assert counters["retries"] == 1
+    assert counters["failed_budget_exhausted"] == 2
+
+def test_fatal_errors_do_not_use_the_budget():
+    budget = RetryBudget(ratio=0, min_retries=1)
+    policy = new_policy(max_attempts=5, budget=budget, classifier=lambda e: not isinstance(e, ValueError))
+
+    call = FailingCall(ValueError("bad request"))
+    with pytest.raises(ValueError):
+        policy.run(call)
+    assert call.calls == 1
+    assert budget.withdraw()
+    assert RetryMetrics().snapshot()[policy.name]["failed_fatal"] == 1
@@ -0,0 +1,89 @@
+import copy
+import threading
+from couchbase.exceptions import CasMismatchException, DocumentNotFoundException
+from helper.sdk_helper.sdk_helper import SDKHelper
+
+class FakeClient:
+    """
+        SDKClient with the sub-document calls of the tag updates, on documents kept in memory.
+        before_write is called before every mutate_in, to change the document in between its read and write
+    """
+    def __init__(self, docs) -> None:
+        self.docs = docs
+        self.cas = {key: 1 for key in docs}
+        self.writes = []
+        self.before_write = None
+        self._lock = threading.Lock()
+
+    def lookup_in(self, key, paths, retries=0):
+        with self._lock:
+            if key not in self.docs:
+                raise DocumentNotFoundException()
+            return {path: copy.deepcopy(self.docs[key].get(path)) for path in paths}, self.cas[key]
+
+    def mutate_in(self, key, mutations, retries=0, cas=None):
+        if self.before_write is not None:
+            self.before_write(key)
+        with self._lock:
+            if cas is not None and cas != self.cas[key]:
+                raise CasMismatchException()
+            for _, path, value in mutations:
+                *parents, name = path.split(".")
+                doc = self.docs[key]
+                for parent in parents:
+                    doc = doc.setdefault(parent, {})
+                doc[name] = value
+            self.cas[key] += 1
+            self.writes.append(key)
+            return True
+
+def test_merge_tags_removes_then_adds():
+    tags = {"details" : {"ssh" : "ok"}, "list" : ["a", "b"]}
+    merged = SDKHelper()._merge_tags(tags, {"cpu" : 90}, ["b", "c"], ["a"])
+
+    assert merged == {"details" : {"ssh" : "ok", "cpu" : 90}, "list" : ["b", "c"]}
+    assert tags == {"details" : {"ssh" : "ok"}, "list" : ["a", "b"]}
+
+def test_merge_tags_without_tags():
+    assert SDKHelper()._merge_tags(None, {"ssh" : "ok"}, ["a"], ["b"]) == {"details" : {"ssh" : "ok"}, "list" : ["a"]}
+
+def test_unchanged_documents_are_not_written(scheduler):
+    client = FakeClient({
+        "node1" : {"tags" : {"details" : {"ssh" : "ok"}, "list" : ["a"]}},
+        "node2" : {"tags" : {"details" : {"ssh" : "ok"}, "list" : ["a"]}}
+    })
+    updates = {
+        "node1" : ({"ssh" : "ok"}, ["a"], ["b"]),
+        "node2" : ({"ssh" : "failed"}, ["b"], ["a"])
+    }
+    results, errors = SDKHelper().update_tags_multi(client, updates, "bucket", "scope", "collection")
+
+    assert results == {"node1" : False, "node2" : True}
+    assert errors == {}
+    assert client.writes == ["node2"]
+    assert client.docs["node2"]["tags"] == {"details" : {"ssh" : "failed"}, "list" : ["b"]}
+
+def test_failed_documents_do_not_fail_the_others(scheduler):
+    client = FakeClient({"node1" : {"tags" : {}}})
+    updates = {
+        "node1" : ({}, ["a"], []),
+        "node2" : ({}, ["a"], [])
+    }
+    results, errors = SDKHelper().update_tags_multi(client, updates, "bucket", "scope", "collection")
+
+    assert results == {"node1" : True}
+    assert isinstance(errors["node2"], DocumentNotFoundException)
+
+def test_concurrent_write_is_merged_again(scheduler):
+    client = FakeClient({"node1" : {"tags" : {"details" : {}, "list" : ["a"]}, "name" : "node1"}})
+
+    def concurrent_write(key):
+        client.before_write = None
+        client.mutate_in(key, [("upsert", "tags.list", ["a", "other"])])
+
+    client.before_write = concurrent_write
+    results, errors = SDKHelper().update_tags_multi(client, {"node1" : ({"ssh" : "ok"}, ["b"], [])},
+                                                    "bucket", "scope", "collection")
+
+    assert results == {"node1" : True}
+    assert client.docs["node1"] == {"tags" : {"details" : {"ssh" : "ok"}, "list" : ["a", "other", "b"]}, "name" : "node1"}
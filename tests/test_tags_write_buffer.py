@@ -0,0 +1,80 @@
+from helper.sdk_helper.tags_write_buffer import TagsWriteBuffer
+
+class FakeWriter:
+    """
+        write_multi of the buffer, recording the batches and failing the keys in fail
+    """
+    def __init__(self, fail=None) -> None:
+        self.batches = []
+        self.fail = set(fail or [])
+
+    def __call__(self, batch):
+        self.batches.append({key: (dict(details), list(tags_added), list(tags_removed))
+                             for key, (details, tags_added, tags_removed) in batch.items()})
+        results = {key: True for key in batch if key not in self.fail}
+        errors = {key: Exception(f"write of {key} failed") for key in batch if key in self.fail}
+        return results, errors
+
+def test_later_update_wins():
+    writer = FakeWriter()
+    buffer = TagsWriteBuffer(writer)
+    buffer.add("node1", {"ssh" : "ok", "cpu" : 10}, ["ssh_failed"], ["cpu_high"])
+    buffer.add("node1", {"cpu" : 90}, ["cpu_high"], ["ssh_failed"])
+    buffer.add("node1", {}, ["mem_high"], [])
+    buffer.flush()
+
+    assert writer.batches == [{"node1" : ({"ssh" : "ok", "cpu" : 90}, ["cpu_high", "mem_high"], ["ssh_failed"])}]
+
+def test_done_writes_full_batches_only():
+    writer = FakeWriter()
+    buffer = TagsWriteBuffer(writer, batch_size=2)
+    for key in ["node1", "node2", "node3"]:
+        buffer.add(key, {"check" : key}, [], [])
+
+    buffer.done("node1")
+    assert writer.batches == []
+    buffer.done("node2")
+    assert [sorted(batch) for batch in writer.batches] == [["node1", "node2"]]
+    assert buffer.stats()["pending"] == 1
+
+    buffer.flush()
+    assert [sorted(batch) for batch in writer.batches] == [["node1", "node2"], ["node3"]]
+    assert buffer.stats()["pending"] == 0
+
+def test_update_after_done_is_merged_into_the_done_document():
+    writer = FakeWriter()
+    buffer = TagsWriteBuffer(writer, batch_size=2)
+    buffer.add("node1", {"ssh" : "ok"}, ["ssh_ok"], [])
+    buffer.done("node1")
+    buffer.add("node1", {"cpu" : 90}, ["cpu_high"], ["ssh_ok"])
+    buffer.add("node2", {}, [], [])
+    buffer.done("node2")
+
+    assert writer.batches == [{"node1" : ({"ssh" : "ok", "cpu" : 90}, ["cpu_high"], ["ssh_ok"]),
+                               "node2" : ({}, [], [])}]
+
+def test_flush_returns_errors_until_written():
+    writer = FakeWriter(fail=["node2"])
+    buffer = TagsWriteBuffer(writer)
+    buffer.add("node1", {}, ["a"], [])
+    buffer.add("node2", {}, ["b"], [])
+
+    assert list(buffer.flush()) == ["node2"]
+    assert buffer.errors() == {"node2" : "write of node2 failed"}
+    assert list(buffer.flush()) == ["node2"]
+
+    writer.fail.clear()
+    buffer.add("node2", {}, ["b"], [])
+    assert buffer.flush() == {}
+    assert buffer.stats()["errors"] == 0
+
+def test_failed_write_multi_fails_every_document():
+    def write_multi(batch):
+        raise Exception("cluster down")
+
+    buffer = TagsWriteBuffer(write_multi)
+    buffer.add("node1", {}, ["a"], [])
+    buffer.add("node2", {}, ["b"], [])
+
+    assert sorted(buffer.flush()) == ["node1", "node2"]
+    assert buffer.stats()["batches"] == 1
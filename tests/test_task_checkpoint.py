@@ -0,0 +1,80 @@
+from helper.sdk_helper.tags_write_buffer import TagsWriteBuffer
+from tasks.task import Task
+from tasks.task_checkpoint import TaskCheckpoint
+
+class CheckTask(Task):
+    """
+        Runs check once per node, recording the node checked in the result of the sub task
+    """
+    def __init__(self, nodes) -> None:
+        super().__init__("check_task", 2, store_results=True)
+        self.nodes = nodes
+        self.checked = []
+
+    def check(self, task_result, params):
+        self.checked.append(params["node"])
+        task_result.result_json = {"checked" : params["node"]}
+
+    def execute(self):
+        subtask_ids = {node: self.add_sub_task(self.check, {"node" : node}, checkpoint_key=f"{node}::check")
+                       for node in self.nodes}
+        return {node: self.get_sub_task_result(subtask_id).result_json for node, subtask_id in subtask_ids.items()}
+
+def test_resumed_task_skips_completed_sub_tasks(task_pool):
+    task = CheckTask(["node1", "node2"])
+    task.execute()
+    task.complete_task(True)
+    assert sorted(task.checked) == ["node1", "node2"]
+
+    resumed_task = CheckTask(["node1", "node2", "node3"])
+    resumed_task.resume_from(task.id)
+    results = resumed_task.execute()
+    resumed_task.complete_task(True)
+
+    assert resumed_task.checked == ["node3"]
+    assert results == {node: {"checked" : node} for node in ["node1", "node2", "node3"]}
+    # The checkpoints of the resumed task hold the sub tasks it skipped, so that it can be resumed in turn
+    completed = {}
+    for checkpoint in task_pool.fetch_task_checkpoints(resumed_task.id):
+        completed.update(checkpoint["completed"])
+    assert sorted(completed) == ["node1::check", "node2::check", "node3::check"]
+
+def test_load_applies_checkpoints_in_order(task_pool):
+    task_pool.checkpoints["previous"] = [
+        {"seq" : 1, "completed" : {"node1::check" : {"checked" : "second"}}},
+        {"seq" : 0, "completed" : {"node1::check" : {"checked" : "first"}, "node2::check" : {}}}
+    ]
+    checkpoint = TaskCheckpoint("current", task_pool)
+    checkpoint.load("previous")
+
+    assert checkpoint.is_completed("node2::check")
+    assert not checkpoint.is_completed("node3::check")
+    assert checkpoint.completed["node1::check"] == {"checked" : "second"}
+
+def test_buffered_writes_are_written_before_their_checkpoint(task_pool):
+    def write_multi(batch):
+        task_pool.events.append(("tags", sorted(batch)))
+        return {key: True for key in batch}, {}
+
+    task = CheckTask(["node1", "node2", "node3", "node4"])
+    task.checkpoint.batch_size = 2
+    tags_buffer = TagsWriteBuffer(write_multi, batch_size=10)
+    task.write_buffers.append(tags_buffer)
+    check = task.check
+
+    def check_and_tag(task_result, params):
+        check(task_result, params)
+        tags_buffer.add(params["node"], {"checked" : True}, [], [])
+    check_and_tag.__name__ = "check"
+    task.check = check_and_tag
+
+    task.execute()
+    task.complete_task(True)
+
+    checkpointed = [key for event, keys in task_pool.events if event == "checkpoint" for key in keys]
+    assert sorted(checkpointed) == ["node1::check", "node2::check", "node3::check", "node4::check"]
+    for index, (event, keys) in enumerate(task_pool.events):
+        if event == "checkpoint":
+            written = {key for previous_event, previous_keys in task_pool.events[:index] if previous_event == "tags"
+                       for key in previous_keys}
+            assert {key.split("::")[0] for key in keys} <= written
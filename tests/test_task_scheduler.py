@@ -0,0 +1,34 @@
+import concurrent.futures
+
+def test_nested_wait_does_not_deadlock_with_few_workers(scheduler):
+    def fan_out(depth):
+        if depth == 0:
+            return 1
+        futures = [scheduler.submit(fan_out, depth - 1) for _ in range(3)]
+        for future in futures:
+            assert scheduler.wait(future, timeout=10)
+        return sum(future.result() for future in futures)
+
+    future = scheduler.submit(fan_out, 3)
+    assert scheduler.wait(future, timeout=30)
+    assert future.result() == 27
+
+    stats = scheduler.stats()
+    assert stats["workers"] <= 2
+    assert stats["run_while_waiting"] > 0
+    assert stats["submitted"] == 1 + 3 + 9 + 27
+
+def test_wait_from_worker_times_out_on_empty_queue(scheduler):
+    never_done = concurrent.futures.Future()
+
+    future = scheduler.submit(lambda: scheduler.wait(never_done, timeout=0.1))
+    assert scheduler.wait(future, timeout=10)
+    assert future.result() is False
+
+def test_wait_propagates_exception(scheduler):
+    def fail():
+        raise ValueError("failed")
+
+    future = scheduler.submit(fail)
+    assert scheduler.wait(future, timeout=10)
+    assert isinstance(future.exception(), ValueError)
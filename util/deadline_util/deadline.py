@@ -0,0 +1,92 @@
+import time
+import threading
+import contextlib
+import contextvars
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class Deadline:
+    """
+        Point in time by which a task and everything it runs have to finish, and a flag to cancel them earlier.
+        A deadline without a timeout never expires but can still be cancelled.
+    """
+    def __init__(self, timeout=None) -> None:
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def expired(self):
+        if self.cancelled:
+            return True
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def remaining(self):
+        """
+            Returns the seconds left before the deadline, 0 once it is expired or cancelled,
+            or None if it has no timeout
+        """
+        if self.cancelled:
+            return 0
+        if self.expires_at is None:
+            return None
+        return max(0, self.expires_at - time.monotonic())
+
+    def check(self):
+        if self.cancelled:
+            raise DeadlineExceeded("Cancelled before completion")
+        if self.expired():
+            raise DeadlineExceeded("Deadline exceeded")
+
+_current_deadline = contextvars.ContextVar("deadline", default=None)
+
+def get_deadline():
+    return _current_deadline.get()
+
+def set_deadline(deadline):
+    """
+        Sets the deadline of the current context and returns a token to restore the previous one with reset_deadline
+    """
+    return _current_deadline.set(deadline)
+
+def reset_deadline(token):
+    _current_deadline.reset(token)
+
+@contextlib.contextmanager
+def no_deadline():
+    """
+        Runs its body without a deadline in the context, for the bookkeeping of a task which has to be written
+        whether the task completed, ran out of time or was cancelled
+    """
+    token = _current_deadline.set(None)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+def check_deadline():
+    """
+        Raises DeadlineExceeded if the deadline of the current context is expired or cancelled
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+def remaining_time(default=None):
+    """
+        Returns the timeout to use for a blocking call in the current context : default bounded by the time left
+        before the deadline. Returns default when there is no deadline.
+    """
+    deadline = _current_deadline.get()
+    remaining = None if deadline is None else deadline.remaining()
+    if remaining is None:
+        return default
+    if default is None:
+        return remaining
+    return min(default, remaining)
@@ -0,0 +1,170 @@
+import time
+import asyncio
+import logging
+import threading
+from constants.rate_limits import RATE_LIMITS
+from util.deadline_util.deadline import DeadlineExceeded, check_deadline, remaining_time
+from util.trace_util.tracer import Tracer
+
+class TokenBucket:
+    """
+        Token bucket refilled at rate tokens per second up to burst tokens.
+        A caller finding the bucket empty reserves the next token and waits for it, so waiting callers
+        are served in order.
+    """
+    def __init__(self, rate, burst) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+            Takes a token and returns the seconds to wait before using it
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+    def release(self):
+        """
+            Gives back a reserved token which is not going to be used
+        """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    @property
+    def tokens(self):
+        """
+            Tokens available now, negative while callers are waiting for reserved tokens
+        """
+        with self._lock:
+            return min(self.burst, self._tokens + (time.monotonic() - self._last_refill) * self.rate)
+
+class RateLimiter:
+    """
+        Process wide token bucket rate limits per endpoint, e.g. jenkins:<url>, xo or sdk_query:<ip>,
+        configured in constants/rate_limits.py
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(RateLimiter, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("util")
+                    self.limits = self._load_limits()
+                    self._buckets = {}
+                    self._stats = {}
+                    self._limiter_lock = threading.Lock()
+                    self._initialized.set()
+
+    def _load_limits(self):
+        for endpoint, limit in RATE_LIMITS.items():
+            if limit.get("rate", 0) <= 0 or limit.get("burst", 0) < 1:
+                raise ValueError(f"Rate limit for endpoint {endpoint} needs a positive rate and burst : {limit}")
+        return RATE_LIMITS
+
+    def get_limit(self, endpoint):
+        if endpoint in self.limits:
+            return self.limits[endpoint]
+        return self.limits.get(endpoint.split(":", 1)[0])
+
+    def _get_bucket(self, endpoint):
+        if endpoint in self._buckets:
+            return self._buckets[endpoint]
+        with self._limiter_lock:
+            if endpoint not in self._buckets:
+                limit = self.get_limit(endpoint)
+                self._buckets[endpoint] = None if limit is None else TokenBucket(limit["rate"], limit["burst"])
+                self._stats[endpoint] = {"requests" : 0, "delayed" : 0, "wait_seconds" : 0.0, "abandoned" : 0}
+            return self._buckets[endpoint]
+
+    def _reserve(self, endpoint):
+        """
+            Takes a token for a request to the endpoint and returns the seconds to wait before making it
+        """
+        bucket = self._get_bucket(endpoint)
+        if bucket is None:
+            return 0
+        wait_time = bucket.reserve()
+        with self._limiter_lock:
+            stats = self._stats[endpoint]
+            stats["requests"] += 1
+            if wait_time > 0:
+                stats["delayed"] += 1
+                stats["wait_seconds"] += wait_time
+        return wait_time
+
+    def _release(self, endpoint):
+        """
+            Gives back the token reserved for a request to the endpoint which is not made, so that it does not
+            delay the next callers
+        """
+        self._get_bucket(endpoint).release()
+        with self._limiter_lock:
+            self._stats[endpoint]["abandoned"] += 1
+
+    def acquire(self, endpoint):
+        """
+            Blocks until a request can be made to the endpoint, at the latest until the deadline of the current context.
+            Raises DeadlineExceeded, without keeping the reserved token, when the deadline comes first
+        """
+        check_deadline()
+        wait_time = self._reserve(endpoint)
+        if wait_time > 0:
+            start_time = time.time()
+            sleep_time = remaining_time(wait_time)
+            try:
+                time.sleep(sleep_time)
+            except BaseException:
+                self._release(endpoint)
+                raise
+            Tracer().add_span(f"rate limit {endpoint}", "rate_limit", start_time, time.time())
+            if sleep_time < wait_time:
+                self._release(endpoint)
+                raise DeadlineExceeded(f"Deadline exceeded while waiting for the rate limit of {endpoint}")
+
+    async def acquire_async(self, endpoint):
+        """
+            Coroutine counterpart of acquire, waits without blocking the event loop
+        """
+        check_deadline()
+        wait_time = self._reserve(endpoint)
+        if wait_time > 0:
+            start_time = time.time()
+            sleep_time = remaining_time(wait_time)
+            try:
+                await asyncio.sleep(sleep_time)
+            except BaseException:
+                self._release(endpoint)
+                raise
+            Tracer().add_span(f"rate limit {endpoint}", "rate_limit", start_time, time.time())
+            if sleep_time < wait_time:
+                self._release(endpoint)
+                raise DeadlineExceeded(f"Deadline exceeded while waiting for the rate limit of {endpoint}")
+
+    def stats(self):
+        with self._limiter_lock:
+            stats = {}
+            for endpoint, bucket in self._buckets.items():
+                if bucket is None:
+                    continue
+                stats[endpoint] = dict(self._stats[endpoint], rate=bucket.rate, burst=bucket.burst, tokens=bucket.tokens)
+            return stats
@@ -1,8 +1,23 @@
 import base64
 import logging
-import requests
+from util.deadline_util.deadline import remaining_time
+from util.retry_util.retry_policy import RetryPolicy, RetryBudget
+from util.trace_util.tracer import Tracer
+from util.rate_limit_util.rate_limiter import RateLimiter
 from enum import Enum
 
+def is_retryable_rest_error(exception):
+    """
+        HTTP errors are only retried for timeouts, throttling and server errors, client errors are fatal
+    """
+    response = getattr(exception, "response", None)
+    if response is None:
+        return True
+    return response.status_code in (408, 429) or response.status_code >= 500
+
+REST_RETRY_POLICY = RetryPolicy("rest", max_attempts=5, base_delay=1, max_delay=30,
+                                classifier=is_retryable_rest_error, budget=RetryBudget())
+
 
 class RestMethods(Enum):
     DELETE = "DELETE"
@@ -13,11 +28,20 @@ class RestMethods(Enum):
 
 class RestClient:
 
-    def __init__(self, base_url, username, password):
+    def __init__(self, base_url, username, password, rate_limit_key=None):
+        """
+            Args:
+            rate_limit_key (str, optional) : The endpoint whose rate limit applies to the requests of the client,
+                defaults to rest:<base_url>
+        """
+        # requests is imported on first use, it is not needed by tasks without REST calls
+        import requests
         self.session = requests.Session()
         self.base_url = base_url
         self.username = username
         self.password = password
+        self.rate_limit_key = rate_limit_key or f"rest:{base_url}"
+        self.rate_limiter = RateLimiter()
         self.logger = logging.getLogger("rest_api")
 
     def _create_header(self, content_type='application/json', header_params=None):
@@ -50,26 +74,24 @@ class RestClient:
 
         url = self.base_url + endpoint
 
-        for retry in range(1, retries+1):
+        def _request():
+            self.rate_limiter.acquire(self.rate_limit_key)
+            response = self.session.request(method=method,
+                                            url=url,
+                                            data=params,
+                                            headers=header,
+                                            verify=verify,
+                                            timeout=remaining_time())
+            response.raise_for_status()
             try:
-                response = self.session.request(method=method,
-                                                url=url,
-                                                data=params,
-                                                headers=header,
-                                                verify=verify)
-                response.raise_for_status()
-                try:
-                    content = response.json()
-                    return response.status_code, content
-                except ValueError as e:
-                    self.logger.error(f"Parsing content to json failed {e}")
-                    return response.status_code, response.content
-            except Exception as e:
-                self.logger.error(f"Error trying to connect to {url} : {e}")
-                if retry == retries:
-                        raise e
-
-
-
+                content = response.json()
+                return response.status_code, content
+            except ValueError as e:
+                self.logger.error(f"Parsing content to json failed {e}")
+                return response.status_code, response.content
 
+        def _log_error(exception, attempt):
+            self.logger.error(f"Error trying to connect to {url} : {exception}")
 
+        with Tracer().span("RestClient.request", "rest", method=method, endpoint=endpoint):
+            return REST_RETRY_POLICY.run(_request, max_attempts=retries, on_error=_log_error)
@@ -0,0 +1,189 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from util.deadline_util.deadline import DeadlineExceeded, check_deadline, remaining_time
+
+class RetryMetrics:
+    """
+        Process wide counters of the calls made through retry policies, per policy name
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    COUNTERS = ["calls", "retries", "succeeded_after_retry", "failed_fatal", "failed_attempts_exhausted",
+                "failed_budget_exhausted"]
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(RetryMetrics, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self._counters = {}
+                    self._counters_lock = threading.Lock()
+                    self._initialized.set()
+
+    def increment(self, policy_name, counter):
+        with self._counters_lock:
+            if policy_name not in self._counters:
+                self._counters[policy_name] = dict.fromkeys(self.COUNTERS, 0)
+            self._counters[policy_name][counter] += 1
+
+    def snapshot(self):
+        with self._counters_lock:
+            return {policy_name: dict(counters) for policy_name, counters in self._counters.items()}
+
+class RetryBudget:
+    """
+        Token bucket limiting retries to a fraction of the calls made, so that retries cannot multiply the load
+        on a service which is failing for every caller.
+        Every call deposits ratio tokens and every retry withdraws one. The bucket starts with, and is capped at,
+        min_retries tokens plus the deposits.
+        Args:
+        ratio (float, optional) : Retries allowed per call once the initial tokens are used
+        min_retries (int, optional) : Retries allowed irrespective of the number of calls
+        max_tokens (int, optional) : Maximum number of tokens saved up while calls succeed
+    """
+    def __init__(self, ratio=0.2, min_retries=10, max_tokens=100) -> None:
+        self.ratio = ratio
+        self.max_tokens = max(max_tokens, min_retries)
+        self._tokens = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+class RetryPolicy:
+    """
+        Runs a call, retrying it on retryable errors with exponential backoff and jitter.
+        Retries stop when max_attempts is reached, the error is fatal, the retry budget is exhausted or the
+        deadline of the current context passes. The delay before attempt n+1 is
+        min(max_delay, base_delay * multiplier ** (n - 1)), of which a fraction jitter is randomized.
+        Args:
+        name (str, required) : Name under which the retries are counted in RetryMetrics
+        max_attempts (int, optional) : Default number of attempts, including the first one
+        base_delay (float, optional) : Delay in seconds before the first retry
+        max_delay (float, optional) : Maximum delay in seconds between two attempts
+        multiplier (float, optional) : Growth factor of the delay between consecutive retries
+        jitter (float, optional) : Fraction, between 0 and 1, of the delay which is randomized
+        classifier (callable, optional) : Called with the exception of a failed attempt, returns whether it is
+            retryable. All errors are retryable by default
+        budget (RetryBudget, optional) : Budget shared by all the calls made through the policy
+    """
+    def __init__(self, name, max_attempts=3, base_delay=0.5, max_delay=30, multiplier=2, jitter=1.0,
+                 classifier=None, budget=None) -> None:
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.classifier = classifier
+        self.budget = budget
+        self.metrics = RetryMetrics()
+        self.logger = logging.getLogger("util")
+
+    def is_retryable(self, exception):
+        if isinstance(exception, DeadlineExceeded):
+            return False
+        if self.classifier is None:
+            return True
+        return self.classifier(exception)
+
+    def backoff(self, attempt):
+        """
+            Returns the delay in seconds before the attempt following attempt
+        """
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+
+    def _start(self, max_attempts):
+        if max_attempts is None:
+            max_attempts = self.max_attempts
+        self.metrics.increment(self.name, "calls")
+        if self.budget is not None:
+            self.budget.deposit()
+        return max_attempts
+
+    def _succeeded(self, attempt):
+        if attempt > 1:
+            self.metrics.increment(self.name, "succeeded_after_retry")
+
+    def _failed(self, exception, attempt, max_attempts, on_error):
+        """
+            Raises the exception of the failed attempt if the call cannot be retried, returns the delay before
+            the next attempt otherwise
+        """
+        if on_error is not None:
+            on_error(exception, attempt)
+        if not self.is_retryable(exception):
+            self.metrics.increment(self.name, "failed_fatal")
+            raise exception
+        if attempt >= max_attempts:
+            self.metrics.increment(self.name, "failed_attempts_exhausted")
+            raise exception
+        if self.budget is not None and not self.budget.withdraw():
+            self.metrics.increment(self.name, "failed_budget_exhausted")
+            self.logger.error(f"Retry budget of {self.name} exhausted, not retrying")
+            raise exception
+
+        delay = remaining_time(self.backoff(attempt))
+        self.metrics.increment(self.name, "retries")
+        self.logger.warning(f"{self.name} attempt {attempt} / {max_attempts} failed : {exception}, retrying in {delay:.2f}s")
+        return delay
+
+    def run(self, func, max_attempts=None, on_error=None):
+        """
+            Calls func until it succeeds and returns its result, raises the error of the last attempt otherwise
+            Args:
+            func (callable, required) : The call to be made, without arguments
+            max_attempts (int, optional) : Number of attempts for this call, defaults to the one of the policy
+            on_error (callable, optional) : Called with the exception and the attempt number of every failed attempt
+        """
+        max_attempts = self._start(max_attempts)
+        attempt = 1
+        while True:
+            check_deadline()
+            try:
+                result = func()
+                self._succeeded(attempt)
+                return result
+            except Exception as e:
+                delay = self._failed(e, attempt, max_attempts, on_error)
+                time.sleep(delay)
+                attempt += 1
+
+    async def run_async(self, func, max_attempts=None, on_error=None):
+        """
+            Coroutine counterpart of run, func is a coroutine function without arguments and the delays
+            between attempts do not block the event loop
+        """
+        max_attempts = self._start(max_attempts)
+        attempt = 1
+        while True:
+            check_deadline()
+            try:
+                result = await func()
+                self._succeeded(attempt)
+                return result
+            except Exception as e:
+                delay = self._failed(e, attempt, max_attempts, on_error)
+                await asyncio.sleep(delay)
+                attempt += 1
@@ -0,0 +1,114 @@
+from datetime import timedelta
+import logging
+from util.deadline_util.deadline import remaining_time
+from util.trace_util.tracer import traced
+from util.rate_limit_util.rate_limiter import RateLimiter
+from util.sdk_util.sdk_client import SDK_RETRY_POLICY
+
+class AsyncSDKClient:
+    """
+        asyncio counterpart of SDKClient on the acouchbase API, with the same upsert, get, query and delete_doc
+        calls as coroutines. Calls share the event loop instead of blocking a thread each.
+        The client is bound to the event loop it is connected on, create it with
+        await AsyncSDKClient.connect(...) from a coroutine running on that loop.
+        Retries go through the same policy and budget as SDKClient, and rate limits are shared with it.
+    """
+    def __init__(self, ip_addr, username, password, bucket, scope=None, collection=None, tls_enabled=False) -> None:
+        self.ip_addr = ip_addr
+        self.username = username
+        self.password = password
+        self.bucket = bucket
+        self.scope = scope if scope else "_default"
+        self.collection = collection if collection else "_default"
+        self.tls_enabled = tls_enabled
+
+        self.logger = logging.getLogger("util")
+        self.rate_limiter = RateLimiter()
+        self.cluster = None
+        self.bucket_connection = None
+        self.collection_connection = None
+
+    @classmethod
+    async def connect(cls, ip_addr, username, password, bucket, scope=None, collection=None, tls_enabled=False):
+        client = cls(ip_addr, username, password, bucket, scope=scope, collection=collection, tls_enabled=tls_enabled)
+        await client._connect()
+        return client
+
+    async def _connect(self):
+        # The couchbase SDK is imported when the first client is connected, not when the module is imported
+        from couchbase.auth import PasswordAuthenticator
+        from couchbase.options import ClusterOptions
+        from acouchbase.cluster import Cluster
+
+        auth = PasswordAuthenticator(
+            self.username,
+            self.password,
+        )
+        if self.tls_enabled:
+            self.cluster = await Cluster.connect(f'couchbases://{self.ip_addr}', ClusterOptions(auth))
+        else:
+            self.cluster = await Cluster.connect(f'couchbase://{self.ip_addr}', ClusterOptions(auth))
+
+        await self.cluster.wait_until_ready(timedelta(seconds=remaining_time(60)))
+
+        self.bucket_connection = self.cluster.bucket(self.bucket)
+        await self.bucket_connection.on_connect()
+
+        self.collection_connection = self.bucket_connection.scope(self.scope).collection(self.collection)
+
+    @traced("sdk")
+    async def upsert(self, key, doc, retries=0):
+        from couchbase.options import UpsertOptions
+        async def _upsert():
+            await self.rate_limiter.acquire_async(f"sdk_kv:{self.ip_addr}")
+            res = await self.collection_connection.upsert(key, doc, UpsertOptions(timeout=timedelta(seconds=remaining_time(60))))
+            return res.success
+        try:
+            return await SDK_RETRY_POLICY.run_async(_upsert, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Upsert failed even after all retries with error {e}")
+            raise e
+
+    @traced("sdk")
+    async def get(self, key, retries=0):
+        from couchbase.options import GetOptions
+        async def _get():
+            await self.rate_limiter.acquire_async(f"sdk_kv:{self.ip_addr}")
+            result = await self.collection_connection.get(key, GetOptions(timeout=timedelta(seconds=remaining_time(60))))
+            return result.content_as[str]
+        try:
+            return await SDK_RETRY_POLICY.run_async(_get, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Get failed even after all retries with error {e}")
+            raise e
+
+    @traced("sdk")
+    async def query(self, query, retries=0):
+        from couchbase.options import QueryOptions
+        async def _query():
+            await self.rate_limiter.acquire_async(f"sdk_query:{self.ip_addr}")
+            query_result = self.cluster.query(query, QueryOptions(timeout=timedelta(seconds=remaining_time(75))))
+            return [row async for row in query_result.rows()]
+        try:
+            return await SDK_RETRY_POLICY.run_async(_query, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Query failed even after all retries with error {e}")
+            raise e
+
+    @traced("sdk")
+    async def delete_doc(self, key, retries=0):
+        from couchbase.options import RemoveOptions
+        async def _delete_doc():
+            await self.rate_limiter.acquire_async(f"sdk_kv:{self.ip_addr}")
+            res = await self.collection_connection.remove(key, RemoveOptions(timeout=timedelta(seconds=remaining_time(60))))
+            return res.success
+        try:
+            return await SDK_RETRY_POLICY.run_async(_delete_doc, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Delete doc failed even after all retries with error {e}")
+            return e
+
+    async def close(self):
+        if self.cluster is not None:
+            await self.cluster.close()
+            self.cluster = None
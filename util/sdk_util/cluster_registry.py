@@ -0,0 +1,99 @@
+from datetime import timedelta
+import logging
+import threading
+from util.deadline_util.deadline import remaining_time
+
+class ClusterRegistry:
+    """
+        Process wide registry of SDK connections. SDKClients to the same address with the same credentials and TLS
+        setting share one Cluster, bootstrapped once, and cached bucket and collection handles.
+        Every cluster and bucket has its own lock, so bootstraps of different clusters, and the opening of
+        different buckets of a cluster, run concurrently. A failed bootstrap is not cached.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ClusterRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("util")
+                    self._clusters = {}
+                    self._buckets = {}
+                    self._collections = {}
+                    self._key_locks = {}
+                    self._bootstraps = 0
+                    self._registry_lock = threading.Lock()
+                    self._initialized.set()
+
+    def _get_key_lock(self, key):
+        with self._registry_lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _get_or_create(self, cache, key, create):
+        if key in cache:
+            return cache[key]
+        with self._get_key_lock(key):
+            if key not in cache:
+                cache[key] = create()
+            return cache[key]
+
+    def get_cluster(self, ip_addr, username, password, tls_enabled=False):
+        """
+            Returns the Cluster for the address, credentials and TLS setting, bootstrapping it on first use
+        """
+        cluster_key = (ip_addr, username, password, tls_enabled)
+        return self._get_or_create(self._clusters, cluster_key,
+                                   lambda: self._bootstrap(ip_addr, username, password, tls_enabled))
+
+    def _bootstrap(self, ip_addr, username, password, tls_enabled):
+        # The couchbase SDK is imported when the first cluster is bootstrapped, not when the module is imported
+        from couchbase.auth import PasswordAuthenticator
+        from couchbase.cluster import Cluster
+        from couchbase.options import ClusterOptions
+
+        auth = PasswordAuthenticator(
+            username,
+            password,
+        )
+        if tls_enabled:
+            cluster = Cluster(f'couchbases://{ip_addr}', ClusterOptions(auth))
+        else:
+            cluster = Cluster(f'couchbase://{ip_addr}', ClusterOptions(auth))
+
+        cluster.wait_until_ready(timedelta(seconds=remaining_time(60)))
+        with self._registry_lock:
+            self._bootstraps += 1
+        self.logger.info(f"Cluster {ip_addr} bootstrapped")
+        return cluster
+
+    def get_bucket(self, ip_addr, username, password, bucket, tls_enabled=False):
+        cluster = self.get_cluster(ip_addr, username, password, tls_enabled)
+        bucket_key = (ip_addr, username, password, tls_enabled, bucket)
+        return self._get_or_create(self._buckets, bucket_key, lambda: cluster.bucket(bucket))
+
+    def get_collection(self, ip_addr, username, password, bucket, scope, collection, tls_enabled=False):
+        bucket_connection = self.get_bucket(ip_addr, username, password, bucket, tls_enabled)
+        collection_key = (ip_addr, username, password, tls_enabled, bucket, scope, collection)
+        return self._get_or_create(self._collections, collection_key,
+                                   lambda: bucket_connection.scope(scope).collection(collection))
+
+    def stats(self):
+        with self._registry_lock:
+            return {
+                "clusters" : len(self._clusters),
+                "buckets" : len(self._buckets),
+                "collections" : len(self._collections),
+                "bootstraps" : self._bootstraps
+            }
@@ -1,9 +1,35 @@
-from couchbase.auth import PasswordAuthenticator
-from couchbase.cluster import Cluster
-from couchbase.options import ClusterOptions, UpsertOptions, GetOptions, RemoveOptions
-
 from datetime import timedelta
 import logging
+from util.deadline_util.deadline import remaining_time
+from util.retry_util.retry_policy import RetryPolicy, RetryBudget
+from util.trace_util.tracer import traced
+from util.rate_limit_util.rate_limiter import RateLimiter
+from util.sdk_util.cluster_registry import ClusterRegistry
+
+def is_retryable_sdk_error(exception):
+    """
+        Errors which cannot succeed on another attempt : missing or existing documents, bad credentials,
+        missing keyspaces and invalid requests
+    """
+    from couchbase.exceptions import (AuthenticationException, BucketNotFoundException, CasMismatchException,
+                                      CollectionNotFoundException, DocumentExistsException, DocumentNotFoundException,
+                                      InvalidArgumentException, KeyspaceNotFoundException, ParsingFailedException,
+                                      ScopeNotFoundException)
+    return not isinstance(exception, (AuthenticationException, BucketNotFoundException, CasMismatchException,
+                                      CollectionNotFoundException, DocumentExistsException, DocumentNotFoundException,
+                                      InvalidArgumentException, KeyspaceNotFoundException, ParsingFailedException,
+                                      ScopeNotFoundException))
+
+SDK_RETRY_POLICY = RetryPolicy("sdk", base_delay=0.2, max_delay=10,
+                               classifier=is_retryable_sdk_error, budget=RetryBudget())
+
+def is_cas_mismatch(exception):
+    from couchbase.exceptions import CasMismatchException
+    return isinstance(exception, CasMismatchException)
+
+# Retries a read-merge-write of a document which was changed by another writer between the read and the write
+CAS_RETRY_POLICY = RetryPolicy("cas", max_attempts=10, base_delay=0.01, max_delay=0.5, classifier=is_cas_mismatch)
+
 class SDKClient:
     def __init__(self, ip_addr, username, password, bucket, scope=None, collection=None, tls_enabled=False) -> None:
         self.ip_addr = ip_addr
@@ -15,73 +41,246 @@ class SDKClient:
         self.collection = collection
 
         self.logger = logging.getLogger("util")
-
-        auth = PasswordAuthenticator(
-            self.username,
-            self.password,
-        )
-        if tls_enabled:
-            self.cluster = Cluster(f'couchbases://{self.ip_addr}', ClusterOptions(auth))
-        else:
-            self.cluster = Cluster(f'couchbase://{self.ip_addr}', ClusterOptions(auth))
-
-        self.cluster.wait_until_ready(timedelta(seconds=60))
-
-        self.bucket_connection = self.cluster.bucket(self.bucket)
+        self.rate_limiter = RateLimiter()
 
         if not scope:
             self.scope = "_default"
         if not collection:
             self.collection = "_default"
 
-        self.collection_connection = self.bucket_connection.scope(self.scope).collection(self.collection)
+        # Clients of the same cluster share its connection, bucket and collection handles
+        registry = ClusterRegistry()
+        self.cluster = registry.get_cluster(self.ip_addr, self.username, self.password, tls_enabled)
+        self.bucket_connection = registry.get_bucket(self.ip_addr, self.username, self.password, self.bucket,
+                                                     tls_enabled)
+        self.collection_connection = registry.get_collection(self.ip_addr, self.username, self.password, self.bucket,
+                                                             self.scope, self.collection, tls_enabled)
 
+    @traced("sdk")
     def upsert(self, key, doc, retries=0):
-        while retries >= 0:
-            try:
-                res = self.collection_connection.upsert(key, doc, UpsertOptions(timeout=timedelta(seconds=60)))
-                return res.success
-            except Exception as e:
-                self.logger.error("Upsert failed, retrying ...")
-                retries -= 1
-                if retries < 0 :
-                    self.logger.error(f"Upsert failed even after all retries with error {e}")
-                    raise e
-
+        from couchbase.options import UpsertOptions
+        def _upsert():
+            self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+            res = self.collection_connection.upsert(key, doc, UpsertOptions(timeout=timedelta(seconds=remaining_time(60))))
+            return res.success
+        try:
+            return SDK_RETRY_POLICY.run(_upsert, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Upsert failed even after all retries with error {e}")
+            raise e
 
+    @traced("sdk")
     def get(self, key, retries=0):
-        while retries >= 0:
-            try:
-                result = self.collection_connection.get(key, GetOptions(timeout=timedelta(seconds=60)))
-                return result.content_as[str]
-            except Exception as e:
-                retries -= 1
-                self.logger.error("Get failed, retrying ...")
-                if retries < 0:
-                    self.logger.error(f"Get failed even after all retries with error {e}")
-                    raise e
+        from couchbase.options import GetOptions
+        def _get():
+            self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+            result = self.collection_connection.get(key, GetOptions(timeout=timedelta(seconds=remaining_time(60))))
+            return result.content_as[str]
+        try:
+            return SDK_RETRY_POLICY.run(_get, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Get failed even after all retries with error {e}")
+            raise e
 
+    @traced("sdk")
+    def get_with_cas(self, key, retries=0):
+        """
+            Returns the document as a string and its CAS, to be passed to replace or mutate_in
+        """
+        from couchbase.options import GetOptions
+        def _get_with_cas():
+            self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+            result = self.collection_connection.get(key, GetOptions(timeout=timedelta(seconds=remaining_time(60))))
+            return result.content_as[str], result.cas
+        try:
+            return SDK_RETRY_POLICY.run(_get_with_cas, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Get with CAS failed even after all retries with error {e}")
+            raise e
 
-    def query(self, query, retries=0):
-        while retries >= 0:
-            try:
-                query_result = self.cluster.query(query)
-                return query_result.rows()
-            except Exception as e:
-                retries -= 1
-                self.logger.error("Query failed, retrying ...")
-                if retries < 0:
-                    self.logger.error(f"Query failed even after all retries with error {e}")
-                    raise e
+    @traced("sdk")
+    def replace(self, key, doc, cas, retries=0):
+        """
+            Replaces the document if it is unchanged since it was read with the given CAS,
+            raises CasMismatchException otherwise
+        """
+        from couchbase.options import ReplaceOptions
+        def _replace():
+            self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+            res = self.collection_connection.replace(key, doc, ReplaceOptions(cas=cas, timeout=timedelta(seconds=remaining_time(60))))
+            return res.success
+        try:
+            return SDK_RETRY_POLICY.run(_replace, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Replace failed even after all retries with error {e}")
+            raise e
+
+    @traced("sdk")
+    def lookup_in(self, key, paths, retries=0):
+        """
+            Returns ({path: value, None for a missing path}, CAS) for the given paths of the document, at most 16
+        """
+        import couchbase.subdocument as SD
+        from couchbase.options import LookupInOptions
+        specs = [SD.get(path) for path in paths]
+        def _lookup_in():
+            self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+            result = self.collection_connection.lookup_in(key, specs, LookupInOptions(timeout=timedelta(seconds=remaining_time(60))))
+            values = {}
+            for index, path in enumerate(paths):
+                values[path] = result.content_as[lambda value: value](index) if result.exists(index) else None
+            return values, result.cas
+        try:
+            return SDK_RETRY_POLICY.run(_lookup_in, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Lookup in failed even after all retries with error {e}")
+            raise e
+
+    @traced("sdk")
+    def query(self, query, retries=0, named_parameters=None):
+        from couchbase.options import QueryOptions
+        def _query():
+            self.rate_limiter.acquire(f"sdk_query:{self.ip_addr}")
+            options = QueryOptions(timeout=timedelta(seconds=remaining_time(75)))
+            if named_parameters is not None:
+                options = QueryOptions(timeout=timedelta(seconds=remaining_time(75)), named_parameters=named_parameters)
+            query_result = self.cluster.query(query, options)
+            return query_result.rows()
+        try:
+            return SDK_RETRY_POLICY.run(_query, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Query failed even after all retries with error {e}")
+            raise e
+
+    @traced("sdk")
+    def mutate_in(self, key, mutations, retries=0, cas=None):
+        """
+            Applies sub-document mutations to an existing document, sending only the mutated paths
+            Args:
+            key (str, required) : Key of the document
+            mutations (list, required) : (operation, path, value) tuples, at most 16, with operation one of
+                upsert, remove (value is ignored) and array_add_unique. Missing parents of a path are created
+            cas (int, optional) : CAS the document was read with. The mutations are only applied if the document
+                is unchanged since, CasMismatchException is raised otherwise
+        """
+        import couchbase.subdocument as SD
+        from couchbase.options import MutateInOptions
+        specs = []
+        for operation, path, value in mutations:
+            if operation == "upsert":
+                specs.append(SD.upsert(path, value, create_parents=True))
+            elif operation == "remove":
+                specs.append(SD.remove(path))
+            elif operation == "array_add_unique":
+                specs.append(SD.array_addunique(path, value, create_parents=True))
+            else:
+                raise ValueError(f"Invalid sub-document operation {operation} for path {path}")
+        def _mutate_in():
+            self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+            options = MutateInOptions(timeout=timedelta(seconds=remaining_time(60)))
+            if cas is not None:
+                options = MutateInOptions(cas=cas, timeout=timedelta(seconds=remaining_time(60)))
+            res = self.collection_connection.mutate_in(key, specs, options)
+            return res.success
+        try:
+            return SDK_RETRY_POLICY.run(_mutate_in, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Mutate in failed even after all retries with error {e}")
+            raise e
 
+    @traced("sdk")
     def delete_doc(self, key, retries=0):
-        while retries >= 0:
+        from couchbase.options import RemoveOptions
+        def _delete_doc():
+            self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+            res = self.collection_connection.remove(key, RemoveOptions(timeout=timedelta(seconds=remaining_time(60))))
+            return res.success
+        try:
+            return SDK_RETRY_POLICY.run(_delete_doc, max_attempts=retries + 1)
+        except Exception as e:
+            self.logger.error(f"Delete doc failed even after all retries with error {e}")
+            return e
+
+    def _run_multi(self, operation, keys, retries, max_in_flight):
+        """
+            Runs operation, a bulk operation of the collection called with a list of keys, on windows of at most
+            max_in_flight keys, so that at most max_in_flight operations are pipelined at a time.
+            Keys failing with a retryable error are retried with the retry policy of the client.
+            Returns (results, errors) : the SDK results and the exceptions of the keys, by key
+        """
+        results = {}
+        errors = {}
+        keys = list(keys)
+        for start in range(0, len(keys), max_in_flight):
+            pending = keys[start:start + max_in_flight]
+
+            def _run_window():
+                nonlocal pending
+                self.rate_limiter.acquire(f"sdk_kv:{self.ip_addr}")
+                multi_result = operation(pending)
+                results.update(multi_result.results)
+                retryable_keys = []
+                for key, exception in multi_result.exceptions.items():
+                    errors[key] = exception
+                    if SDK_RETRY_POLICY.is_retryable(exception):
+                        retryable_keys.append(key)
+                for key in multi_result.results:
+                    errors.pop(key, None)
+                pending = retryable_keys
+                if len(retryable_keys) > 0:
+                    raise errors[retryable_keys[0]]
+
             try:
-                res = self.collection_connection.remove(key, RemoveOptions(timeout=timedelta(seconds=60)))
-                return res.success
+                SDK_RETRY_POLICY.run(_run_window, max_attempts=retries + 1)
             except Exception as e:
-                retries -= 1
-                self.logger.error("Delete doc failed, retrying ...")
-                if retries < 0:
-                    self.logger.error(f"Delete doc failed even after all retries with error {e}")
-                    return e
\ No newline at end of file
+                self.logger.error(f"Bulk operation failed for {len(pending)} keys even after all retries with error {e}")
+                for key in pending:
+                    errors.setdefault(key, e)
+        return results, errors
+
+    @traced("sdk")
+    def upsert_multi(self, docs, retries=0, max_in_flight=500):
+        """
+            Upserts the documents, with at most max_in_flight upserts in flight at a time
+            Args:
+            docs (dict, required) : The documents to be upserted, by key
+            retries (int, optional) : Number of retries of the keys failing with a retryable error
+            max_in_flight (int, optional) : Maximum number of upserts pipelined at a time
+            Returns (results, errors) : {key: True} for the upserted documents and {key: exception} for the others
+        """
+        from couchbase.options import UpsertMultiOptions
+        def _upsert_multi(keys):
+            return self.collection_connection.upsert_multi({key: docs[key] for key in keys},
+                                                           UpsertMultiOptions(timeout=timedelta(seconds=remaining_time(60)),
+                                                                              return_exceptions=True))
+        results, errors = self._run_multi(_upsert_multi, docs.keys(), retries, max_in_flight)
+        return {key: result.success for key, result in results.items()}, errors
+
+    @traced("sdk")
+    def get_multi(self, keys, retries=0, max_in_flight=500):
+        """
+            Fetches the documents with the given keys, with at most max_in_flight gets in flight at a time
+            Returns (results, errors) : {key: content as str, as returned by get} for the fetched documents
+            and {key: exception} for the others
+        """
+        from couchbase.options import GetMultiOptions
+        def _get_multi(keys):
+            return self.collection_connection.get_multi(keys,
+                                                        GetMultiOptions(timeout=timedelta(seconds=remaining_time(60)),
+                                                                        return_exceptions=True))
+        results, errors = self._run_multi(_get_multi, keys, retries, max_in_flight)
+        return {key: result.content_as[str] for key, result in results.items()}, errors
+
+    @traced("sdk")
+    def remove_multi(self, keys, retries=0, max_in_flight=500):
+        """
+            Removes the documents with the given keys, with at most max_in_flight removes in flight at a time
+            Returns (results, errors) : {key: True} for the removed documents and {key: exception} for the others
+        """
+        from couchbase.options import RemoveMultiOptions
+        def _remove_multi(keys):
+            return self.collection_connection.remove_multi(keys,
+                                                           RemoveMultiOptions(timeout=timedelta(seconds=remaining_time(60)),
+                                                                              return_exceptions=True))
+        results, errors = self._run_multi(_remove_multi, keys, retries, max_in_flight)
+        return {key: result.success for key, result in results.items()}, errors
@@ -0,0 +1,41 @@
+import os
+
+REDACTED = "<redacted>"
+
+def is_secret_param(name):
+    """
+        Passwords, tokens and secrets, e.g. ssh_password or xen_password
+    """
+    name = str(name).lower()
+    return name.endswith("password") or "secret" in name or "token" in name or name.endswith("api_key")
+
+def redact_secrets(params):
+    """
+        Returns a copy of params, nested dicts and lists included, with the values of the secret params
+        replaced by REDACTED
+    """
+    if isinstance(params, dict):
+        return {name: REDACTED if is_secret_param(name) else redact_secrets(value) for name, value in params.items()}
+    if isinstance(params, list):
+        return [redact_secrets(value) for value in params]
+    return params
+
+def restore_secrets(params):
+    """
+        Returns a copy of params with the REDACTED values replaced by the value of the environment variable named
+        after the param in upper case, e.g. SSH_PASSWORD for ssh_password. Raises ValueError when it is not set
+    """
+    if isinstance(params, dict):
+        restored_params = {}
+        for name, value in params.items():
+            if value == REDACTED:
+                if str(name).upper() not in os.environ:
+                    raise ValueError(f"The value of the param {name} was not stored, set it in the environment "
+                                     f"variable {str(name).upper()}")
+                restored_params[name] = os.environ[str(name).upper()]
+            else:
+                restored_params[name] = restore_secrets(value)
+        return restored_params
+    if isinstance(params, list):
+        return [restore_secrets(value) for value in params]
+    return params
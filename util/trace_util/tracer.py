@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import inspect
+import logging
+import functools
+import threading
+import contextlib
+
+class Tracer:
+    """
+        Process wide recorder of timed spans, exported in the Chrome trace event format which can be opened
+        in Perfetto or chrome://tracing.
+        Tracing is disabled until enable is called, spans then cost a time read and an append each.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+    _initialized = threading.Event()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(Tracer, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if not self._initialized.is_set():
+            with self._lock:
+                if not self._initialized.is_set():
+                    self.logger = logging.getLogger("util")
+                    self.enabled = False
+                    self._events = []
+                    self._thread_names = {}
+                    self._initialized.set()
+
+    def enable(self):
+        self.enabled = True
+
+    def add_span(self, name, category, start_time, end_time, args=None):
+        """
+            Records a span between two time.time() timestamps
+        """
+        if not self.enabled:
+            return
+        thread_id = threading.get_ident()
+        if thread_id not in self._thread_names:
+            self._thread_names[thread_id] = threading.current_thread().name
+        event = {
+            "name" : name,
+            "cat" : category,
+            "ph" : "X",
+            "ts" : int(start_time * 1_000_000),
+            "dur" : int((end_time - start_time) * 1_000_000),
+            "pid" : os.getpid(),
+            "tid" : thread_id
+        }
+        if args:
+            event["args"] = args
+        self._events.append(event)
+
+    @contextlib.contextmanager
+    def _span(self, name, category, args):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start_time, time.time(), args)
+
+    def span(self, name, category, **args):
+        """
+            Context manager recording a span around its body
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._span(name, category, args)
+
+    def write(self, file_path):
+        pid = os.getpid()
+        metadata = [{"name" : "thread_name", "ph" : "M", "pid" : pid, "tid" : thread_id, "args" : {"name" : thread_name}}
+                    for thread_id, thread_name in list(self._thread_names.items())]
+        with open(file_path, "w") as trace_file:
+            json.dump({"traceEvents" : metadata + list(self._events), "displayTimeUnit" : "ms"}, trace_file)
+        self.logger.info(f"{len(self._events)} spans written to {file_path}")
+
+def traced(category, name=None):
+    """
+        Decorator recording a span around every call of the function when tracing is enabled.
+        The span of a coroutine function covers the call until the coroutine returns
+        Args:
+        category (str, required) : Category of the spans, like sdk or xo
+        name (str, optional) : Name of the spans, defaults to the qualified name of the function
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+        tracer = Tracer()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer._span(span_name, category, None):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer._span(span_name, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator